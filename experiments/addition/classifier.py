@@ -2,21 +2,22 @@ import tensorflow as tf
 import einops as E
 import numpy as np
 
+import plia
 from plia import PInt
 from keras.layers import *
 
 
 class SumClassifier(tf.keras.Model):
 
-    def __init__(self, encoding):
+    def __init__(self, encoding, checkpoint_every=None):
         super(SumClassifier, self).__init__()
         self.encoding = encoding
 
         self.neural_model = DigitClassifier()
         if encoding == "sum":
-            self.addition_model = MultiAddition()
+            self.addition_model = MultiAddition(checkpoint_every)
         elif encoding == "carry":
-            self.addition_model = CarryAddition()
+            self.addition_model = CarryAddition(checkpoint_every)
         else:
             raise NotImplementedError("Encoding must be either 'sum' or 'carry'")
 
@@ -55,9 +56,14 @@ class DigitClassifier(tf.keras.Model):
 
 
 class MultiAddition(tf.keras.Model):
+    """
+    Sums the digits of two numbers weighted by their powers of ten. With checkpoint_every, the digit pairs are
+    summed in checkpointed segments of checkpoint_every digits, whose partial sums are then summed.
+    """
 
-    def __init__(self):
+    def __init__(self, checkpoint_every=None):
         super(MultiAddition, self).__init__()
+        self.checkpoint_every = checkpoint_every
 
     def call(self, inputs, training=None, mask=None):
         digits_per_number = len(inputs) // 2
@@ -65,31 +71,57 @@ class MultiAddition(tf.keras.Model):
         c1 = inputs[:digits_per_number]
         c2 = inputs[digits_per_number:]
 
-        number1 = 0
-        number2 = 0
+        terms = []
         for i in range(1, digits_per_number + 1):
-            number1 = number1 + c1[-i] * 10 ** (i - 1)
-            number2 = number2 + c2[-i] * 10 ** (i - 1)
-        return number1 + number2
+            terms.append(c1[-i] * 10 ** (i - 1))
+            terms.append(c2[-i] * 10 ** (i - 1))
+        if self.checkpoint_every is None:
+            return plia.sum(terms)
+
+        segment = plia.checkpoint(plia.sum)
+        step = 2 * self.checkpoint_every
+        return plia.sum(
+            [segment(terms[i : i + step]) for i in range(0, len(terms), step)]
+        )
+
+
+def add_digits(carry, c1, c2):
+    """Adds the digits c1 and c2 (least significant first) and the carry, returning the carry and the digits."""
+    result = []
+    for d1, d2 in zip(c1, c2):
+        s = d1 + d2 + carry
+        carry, digit = divmod(s, 10)
+        result.append(digit)
+    return carry, result
 
 
 class CarryAddition(tf.keras.Model):
+    """
+    Adds two numbers digit by digit, propagating the carry. With checkpoint_every, the chain is split into
+    checkpointed segments of checkpoint_every digits, such that the tape only keeps the carries between the
+    segments, at the cost of recomputing every segment once during the backward pass.
+    """
 
-    def __init__(self):
+    def __init__(self, checkpoint_every=None):
         super(CarryAddition, self).__init__()
+        self.checkpoint_every = checkpoint_every
 
     def call(self, inputs, training=None, mask=None):
         digits_per_number = len(inputs) // 2
 
-        c1 = inputs[:digits_per_number]
-        c2 = inputs[digits_per_number:]
+        c1 = inputs[:digits_per_number][::-1]
+        c2 = inputs[digits_per_number:][::-1]
+
+        step = self.checkpoint_every or digits_per_number
+        segment = (
+            add_digits if self.checkpoint_every is None else plia.checkpoint(add_digits)
+        )
 
         carry = 0
         result = []
-        for i in range(1, digits_per_number + 1):
-            s = c1[-i] + c2[-i] + carry
-            result.append(s % 10)
-            carry = s // 10
+        for i in range(0, digits_per_number, step):
+            carry, digits = segment(carry, c1[i : i + step], c2[i : i + step])
+            result += digits
         carry.logits = tf.pad(carry.logits, [[0, 0], [0, 8]], constant_values=-np.inf)
         result.append(carry)
         return result
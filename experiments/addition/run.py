@@ -14,7 +14,6 @@ from experiments.addition.data.generation import create_loader
 from trainer import Trainer
 from evaluate import sum_accuracy, cary_sum_accuracy
 
-
 os.environ["CUDA_VISIBLE_DEVICES"] = "3"
 os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
 
@@ -27,6 +26,7 @@ def train(
     N_epochs,
     encoding,
     seed,
+    checkpoint_every=None,
 ):
     wandb.init(
         mode="disabled",
@@ -40,10 +40,11 @@ def train(
             "epochs": N_epochs,
             "encoding": encoding,
             "seed": seed,
+            "checkpoint_every": checkpoint_every,
         },
     )
 
-    model = SumClassifier(encoding)
+    model = SumClassifier(encoding, checkpoint_every)
 
     optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate)
     loss_object = tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True)
@@ -83,6 +84,7 @@ if __name__ == "__main__":
     parser.add_argument("--N_runs", default=1, type=int)
     parser.add_argument("--encoding", default="carry", type=str)
     parser.add_argument("--N_workers", default=1, type=int)
+    parser.add_argument("--checkpoint_every", default=None, type=int)
     args = parser.parse_args()
 
     multiprocess_runs = args.N_runs // args.N_workers
@@ -100,6 +102,7 @@ if __name__ == "__main__":
                     args.N_epochs,
                     args.encoding,
                     args.N_workers * seed + i,
+                    args.checkpoint_every,
                 )
                 for i in range(args.N_workers)
             ],
@@ -0,0 +1,711 @@
+import os
+import sys
+import math
+import time
+import argparse
+import tracemalloc
+import subprocess
+from pathlib import Path
+import yaml
+import numpy as np
+
+PARENT_DIR = Path(__file__).resolve().parent
+sys.path.append(str(PARENT_DIR / "../.."))
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+import tensorflow as tf
+
+GPUS = tf.config.experimental.list_physical_devices("GPU")
+
+import plia
+import plia.numpy
+from plia import PInt
+from plia.arithmetics import (
+    CONVOLUTION_COSTS,
+    PRECISIONS,
+    Compilation,
+    log_convolution,
+    direct_log_convolution,
+    fft_log_convolution,
+    fft_log_convolution_forward,
+    fft_multi_log_convolution,
+    fft_multi_log_convolution_forward,
+    overlap_add_log_convolution,
+    fft_length,
+    multi_log_convolution,
+)
+
+
+def time_convolution(convolution, card1, card2, batch, repeats):
+    """Times a compiled convolution, so that Python dispatch overhead does not drown out the kernels."""
+    p1 = tf.nn.log_softmax(tf.random.uniform((batch, card1)), axis=-1)
+    p2 = tf.nn.log_softmax(tf.random.uniform((batch, card2)), axis=-1)
+    signal_length = card1 + card2 - 1
+
+    convolution = tf.function(convolution)
+    convolution(p1, p2, signal_length)
+    start_time = time.time()
+    for _ in range(repeats):
+        convolution(p1, p2, signal_length)
+    tf.test.experimental.sync_devices()
+    return (time.time() - start_time) / repeats
+
+
+def fit(features, times):
+    """Least squares fit of time = overhead + cost * feature."""
+    A = np.stack(
+        [np.ones(len(features)), np.array(features, dtype=np.float64)], axis=-1
+    )
+    (overhead, cost), *_ = np.linalg.lstsq(A, np.array(times), rcond=None)
+    return max(float(overhead), 0.0), max(float(cost), 0.0)
+
+
+def calibrate(max_bitwidth, batch, repeats):
+    small_cards = [1, 2, 5, 10, 20, 50]
+    large_cards = [2**bitwidth for bitwidth in range(1, max_bitwidth + 1)]
+
+    direct_features, direct_times = [], []
+    fft_features, fft_times = [], []
+    for card2 in small_cards:
+        for card1 in large_cards:
+            t_direct = time_convolution(
+                direct_log_convolution, card1, card2, batch, repeats
+            )
+            t_fft = time_convolution(fft_log_convolution, card1, card2, batch, repeats)
+
+            n = fft_length(card1 + card2 - 1)
+            direct_features.append(batch * card1 * card2)
+            direct_times.append(t_direct)
+            fft_features.append(batch * 3 * n * max(1.0, math.log2(n)))
+            fft_times.append(t_fft)
+
+            winner = "direct" if t_direct < t_fft else "fft"
+            print(
+                "card1: %8i card2: %4i direct: %.6fs fft: %.6fs (%s)"
+                % (card1, card2, t_direct, t_fft, winner)
+            )
+
+    direct_overhead, direct = fit(direct_features, direct_times)
+    fft_overhead, fft = fit(fft_features, fft_times)
+    return {
+        "direct": direct,
+        "direct_overhead": direct_overhead,
+        "fft": fft,
+        "fft_overhead": fft_overhead,
+    }
+
+
+def asymmetric(max_bitwidth, batch, repeats, small_card=1000):
+    """Compares the full-length FFT with the blocked overlap-add convolution for a large plus a small PInt."""
+    times = {"fft": [], "overlap_add": []}
+    for bitwidth in range(14, max_bitwidth + 1):
+        t_fft = time_convolution(
+            fft_log_convolution, 2**bitwidth, small_card, batch, repeats
+        )
+        t_ola = time_convolution(
+            overlap_add_log_convolution, 2**bitwidth, small_card, batch, repeats
+        )
+        times["fft"].append(t_fft)
+        times["overlap_add"].append(t_ola)
+        print("bitwidth: %2i fft: %.6fs overlap-add: %.6fs" % (bitwidth, t_fft, t_ola))
+    return times
+
+
+def precision(max_bitwidth, batch, repeats, small_card=100):
+    """Times every precision policy and measures its worst log-probability error on a long tailed PMF."""
+    results = {policy: {"time": [], "error": []} for policy in PRECISIONS}
+    for bitwidth in range(12, max_bitwidth + 1):
+        card1 = 2**bitwidth
+        l1 = -np.linspace(0, 80, card1) + np.random.normal(0, 0.5, card1)
+        l2 = np.random.normal(0, 1, small_card)
+        reference = np.log(np.convolve(np.exp(l1 - l1.max()), np.exp(l2 - l2.max())))
+        reference = reference + l1.max() + l2.max()
+        p1 = tf.constant(l1[None], dtype=tf.float32)
+        p2 = tf.constant(l2[None], dtype=tf.float32)
+
+        line = "bitwidth: %2i" % bitwidth
+        for policy in PRECISIONS:
+            convolution = lambda p1, p2, n: log_convolution(p1, p2, n, policy)
+            t = time_convolution(convolution, card1, small_card, batch, repeats)
+            logp = log_convolution(p1, p2, card1 + small_card - 1, policy)
+            error = np.abs(logp.numpy()[0] - reference)[reference > -80].max()
+            results[policy]["time"].append(t)
+            results[policy]["error"].append(float(error))
+            line += " %s: %.6fs (%.1e)" % (policy, t, error)
+        print(line)
+    return results
+
+
+def compiled(n_queries, batch, max_bitwidth):
+    """
+    Times a stream of additions and expectations of PInts with random cardinalities and lower bounds, eagerly and
+    with shape-bucketed compiled kernels (with and without XLA). The first (cold) pass includes the tracing cost.
+    """
+    cardinalities = np.random.randint(2, 2**max_bitwidth, size=(n_queries, 2))
+    lowers = np.random.randint(-100, 100, size=(n_queries, 2))
+    queries = [
+        [PInt(tf.random.uniform((batch, int(c))), int(l)) for c, l in zip(cs, ls)]
+        for cs, ls in zip(cardinalities, lowers)
+    ]
+
+    def run():
+        for x, y in queries:
+            plia.log_expectation(x + y)
+        tf.test.experimental.sync_devices()
+
+    results = {}
+    for mode in ["eager", "compiled", "xla"]:
+        compilation = Compilation(jit_compile=mode == "xla")
+        times = []
+        for _ in range(2):
+            start_time = time.time()
+            if mode == "eager":
+                run()
+            else:
+                with compilation:
+                    run()
+            times.append(time.time() - start_time)
+        results[mode] = {"cold": times[0], "warm": times[1], **compilation.report()}
+        print(mode, results[mode])
+    return results
+
+
+def queries(n_queries, max_bitwidth):
+    """
+    Times many small independent queries x + y < c with random supports, looping over the queries and with the
+    batched executor that groups them by padded size.
+    """
+    cardinalities = np.random.randint(1, 2**max_bitwidth, size=(n_queries, 2))
+    lowers = np.random.randint(-100, 100, size=(n_queries, 2))
+    thresholds = np.random.randint(-100, 100 + 2**max_bitwidth, size=n_queries)
+    batch = [
+        [PInt(tf.random.uniform((int(c),)), int(l)) for c, l in zip(cs, ls)]
+        + [int(threshold)]
+        for cs, ls, threshold in zip(cardinalities, lowers, thresholds)
+    ]
+    program = lambda x, y, c: x + y < c
+
+    start_time = time.time()
+    for query in batch:
+        plia.log_expectation(program(*query))
+    t_loop = time.time() - start_time
+
+    start_time = time.time()
+    for result in plia.execute(program, batch):
+        plia.log_expectation(result)
+    t_batched = time.time() - start_time
+
+    print("queries: %i loop: %.4fs batched: %.4fs" % (n_queries, t_loop, t_batched))
+    return {"loop": t_loop, "batched": t_batched}
+
+
+def time_comparison(comparison, bitwidth, repeats):
+    x = PInt(tf.random.uniform((2**bitwidth,)), 0)
+    y = PInt(tf.random.uniform((2**bitwidth,)), 2**bitwidth // 2)
+    comparison(x, y)
+    start_time = time.time()
+    for _ in range(repeats):
+        comparison(x, y)
+    tf.test.experimental.sync_devices()
+    return (time.time() - start_time) / repeats
+
+
+def comparison(max_bitwidth, repeats):
+    """
+    Compares the linear-time kernels for X < Y and X == Y with reducing the logits of the difference X - Y, which
+    requires a convolution.
+    """
+    kernels = {
+        "lt": lambda x, y: plia.log_expectation(x < y),
+        "lt_convolution": lambda x, y: tf.reduce_logsumexp((x < y).logits, axis=-1),
+        "eq": lambda x, y: plia.log_expectation(x == y),
+        "eq_convolution": lambda x, y: tf.reduce_logsumexp((x == y).logits, axis=-1),
+    }
+    times = {name: [] for name in kernels}
+    for bitwidth in range(1, max_bitwidth + 1):
+        line = "bitwidth: %2i" % bitwidth
+        for name, kernel in kernels.items():
+            t = time_comparison(kernel, bitwidth, repeats)
+            times[name].append(t)
+            line += " %s: %.6fs" % (name, t)
+        print(line)
+    return times
+
+
+def time_sum(summation, n_operands, batch, repeats, card=10):
+    logits = [tf.random.uniform((batch, card)) for _ in range(n_operands)]
+    compiled = tf.function(
+        lambda logits: summation([PInt(l, 0) for l in logits]).logits
+    )
+
+    compiled(logits)
+    start_time = time.time()
+    for _ in range(repeats):
+        compiled(logits)
+    tf.test.experimental.sync_devices()
+    return (time.time() - start_time) / repeats
+
+
+def fold(pints):
+    total = pints[0]
+    for x in pints[1:]:
+        total = total + x
+    return total
+
+
+def spectral_fold(pints):
+    total = pints[0].to_spectral(sum(x.cardinality for x in pints))
+    for x in pints[1:]:
+        total = total + x
+    return total
+
+
+def nary(max_operands, batch, repeats):
+    """
+    Compares a left fold of pairwise additions, a left fold that stays in the Fourier domain and a single n-ary
+    sum of digit PInts.
+    """
+    times = {"fold": [], "spectral": [], "fft": [], "tree": []}
+    n_operands = 2
+    while n_operands <= max_operands:
+        t_fold = time_sum(fold, n_operands, batch, repeats)
+        t_spectral = time_sum(spectral_fold, n_operands, batch, repeats)
+        t_fft = time_sum(
+            lambda x: plia.sum(x, method="fft"), n_operands, batch, repeats
+        )
+        t_tree = time_sum(
+            lambda x: plia.sum(x, method="tree"), n_operands, batch, repeats
+        )
+        times["fold"].append(t_fold)
+        times["spectral"].append(t_spectral)
+        times["fft"].append(t_fft)
+        times["tree"].append(t_tree)
+        print(
+            "operands: %4i fold: %.6fs spectral: %.6fs fft: %.6fs tree: %.6fs"
+            % (n_operands, t_fold, t_spectral, t_fft, t_tree)
+        )
+        n_operands *= 2
+    return times
+
+
+STARTUP = {
+    "numpy": "import plia.numpy; plia.numpy.PInt",
+    "tensorflow": "import plia; plia.PInt",
+}
+
+
+def startup(code, repeats=3):
+    """The wall time and peak resident memory (in MB) of a fresh interpreter running the code."""
+    # VmHWM (in kB) is reset by exec, unlike the maximal resident set size reported by getrusage
+    code += "; print(open('/proc/self/status').read().split('VmHWM:')[1].split()[0])"
+    times, memory = [], 0
+    for _ in range(repeats):
+        start_time = time.time()
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=PARENT_DIR / "../..",
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        times.append(time.time() - start_time)
+        memory = int(output.split()[-1]) / 1024
+    return min(times), memory
+
+
+def time_backend(pint, log_expectation, logits, repeats):
+    x = pint(logits[0], 0)
+    y = pint(logits[1], logits.shape[-1] // 2)
+    log_expectation(x + y < x)
+    start_time = time.time()
+    for _ in range(repeats):
+        log_expectation(x + y < x)
+    return (time.time() - start_time) / repeats
+
+
+def backend(max_bitwidth, batch, repeats):
+    """
+    Compares the startup time and memory of the NumPy and TensorFlow backends, and the throughput of an addition
+    followed by a comparison on both of them.
+    """
+    results = {}
+    for name, code in STARTUP.items():
+        t, memory = startup(code)
+        results[f"{name}_startup"] = t
+        results[f"{name}_memory"] = memory
+        print("%s startup: %.3fs peak memory: %.0fMB" % (name, t, memory))
+
+    results["numpy"], results["tensorflow"] = [], []
+    for bitwidth in range(1, max_bitwidth + 1):
+        logits = np.random.uniform(size=(2, batch, 2**bitwidth))
+        t_numpy = time_backend(
+            plia.numpy.PInt, plia.numpy.log_expectation, logits, repeats
+        )
+        t_tensorflow = time_backend(
+            PInt, plia.log_expectation, tf.constant(logits, dtype=tf.float32), repeats
+        )
+        results["numpy"].append(t_numpy)
+        results["tensorflow"].append(t_tensorflow)
+        print(
+            "bitwidth: %2i numpy: %.6fs tensorflow: %.6fs"
+            % (bitwidth, t_numpy, t_tensorflow)
+        )
+    return results
+
+
+def exact(max_bitwidth, repeats):
+    """
+    Compares the exact NTT convolution with the float FFT convolution of the NumPy backend, reporting the time of
+    both and the largest error of the float probabilities, for PMFs with counts up to 2^20.
+    """
+    results = {"exact": [], "float": [], "error": []}
+    for bitwidth in range(1, max_bitwidth + 1):
+        counts = np.random.randint(0, 2**20, size=2**bitwidth)
+        x = plia.numpy.ExactPInt(counts, 0)
+        y = plia.numpy.PInt(np.log(counts + 1e-300), 0)
+
+        start_time = time.time()
+        for _ in range(repeats):
+            z = x + x
+        t_exact = (time.time() - start_time) / repeats
+
+        start_time = time.time()
+        for _ in range(repeats):
+            w = y + y
+        t_float = (time.time() - start_time) / repeats
+
+        error = z.max_error(w)
+        results["exact"].append(t_exact)
+        results["float"].append(t_float)
+        results["error"].append(error)
+        print(
+            "bitwidth: %2i exact: %.6fs float: %.6fs max error: %.2e"
+            % (bitwidth, t_exact, t_float, error)
+        )
+    return results
+
+
+def time_gradient(kernel, p, arguments):
+    """
+    The time of a training step through kernel, the memory (in MB) its forward pass keeps alive for the backward
+    pass and the peak memory of the step, as reported by the TensorFlow allocator.
+    """
+    tf.config.experimental.reset_memory_stats("CPU:0")
+    before = tf.config.experimental.get_memory_info("CPU:0")["current"]
+    start_time = time.time()
+    with tf.GradientTape() as tape:
+        tape.watch(p)
+        loss = tf.reduce_sum(kernel(*arguments))
+    retained = tf.config.experimental.get_memory_info("CPU:0")["current"] - before
+    tape.gradient(loss, p)
+    t = time.time() - start_time
+    peak = tf.config.experimental.get_memory_info("CPU:0")["peak"] - before
+    return t, retained / 2**20, peak / 2**20
+
+
+def gradient(max_bitwidth, batch):
+    """
+    Compares a forward and backward pass through the FFT convolutions with their custom gradients, and with
+    autodiff through their forward passes.
+    """
+    kernels = {
+        "pair": (fft_log_convolution, fft_log_convolution_forward),
+        "krat": (fft_multi_log_convolution, fft_multi_log_convolution_forward),
+    }
+    results = {}
+    for name, (custom, forward) in kernels.items():
+        for method in ["custom", "autodiff"]:
+            for metric in ["time", "retained", "peak"]:
+                results[f"{name}_{method}_{metric}"] = []
+        for bitwidth in range(1, max_bitwidth + 1):
+            if name == "pair":
+                p = tf.random.normal((batch, 2**bitwidth))
+                arguments = (p, p, 2 ** (bitwidth + 1) - 1)
+            else:
+                p = tf.random.normal((batch, 4, max(1, 2 ** (bitwidth - 2))))
+                arguments = (p, 4 * p.shape[-1] - 3)
+            line = "%s bitwidth: %2i" % (name, bitwidth)
+            for method, kernel in zip(["custom", "autodiff"], [custom, forward]):
+                measurements = time_gradient(kernel, p, arguments)
+                for metric, value in zip(["time", "retained", "peak"], measurements):
+                    results[f"{name}_{method}_{metric}"].append(value)
+                line += " %s: %.3fs retained %.0fMB peak %.0fMB" % (
+                    method,
+                    *measurements,
+                )
+            print(line)
+    return results
+
+
+def checkpointing(max_digits, batch):
+    """
+    Measures the peak memory and time of a training step through the carry addition of two numbers, without and
+    with checkpointed segments of 1 and about sqrt(digits) digits.
+    """
+    from experiments.addition.classifier import CarryAddition
+
+    results = {"digits": []}
+    digits = 1
+    while digits <= max_digits:
+        segments = {"none": None, "1": 1, "sqrt": max(1, round(math.sqrt(digits)))}
+        logits = tf.random.normal((2 * digits, batch, 10))
+        line = "digits: %4i" % digits
+        for name, checkpoint_every in segments.items():
+            model = CarryAddition(checkpoint_every)
+            tf.config.experimental.reset_memory_stats("CPU:0")
+            before = tf.config.experimental.get_memory_info("CPU:0")["current"]
+            start_time = time.time()
+            with tf.GradientTape() as tape:
+                tape.watch(logits)
+                result = model.call([PInt(l, 0) for l in tf.unstack(logits)])
+                loss = tf.add_n([tf.reduce_sum(x.logits[..., 0]) for x in result])
+            tape.gradient(loss, logits)
+            t = time.time() - start_time
+            peak = (
+                tf.config.experimental.get_memory_info("CPU:0")["peak"] - before
+            ) / 2**20
+            results.setdefault(f"{name}_time", []).append(t)
+            results.setdefault(f"{name}_memory", []).append(peak)
+            line += " %s: %.3fs %.1fMB" % (name, t, peak)
+        results["digits"].append(digits)
+        print(line)
+        digits *= 2
+    return results
+
+
+def time_sudoku(kernel, inputs, repeats):
+    """The mean time of a training step through the sums of the constraints of a 9x9 visual sudoku."""
+    start_time = time.time()
+    for _ in range(repeats):
+        with tf.GradientTape() as tape:
+            tape.watch(inputs)
+            result = kernel(inputs)
+        tape.gradient(result, inputs)
+    return (time.time() - start_time) / repeats, result
+
+
+def bernoulli(batch, repeats):
+    """
+    Compares the sums of the Bernoulli constraints of 9x9 visual sudokus with the Poisson-binomial kernel of
+    Krat.sum_reduce and with the FFT of multi_log_convolution, for batches of up to batch sudokus.
+    """
+    from experiments.visudo.classifier import SudokuSolver
+
+    solver = SudokuSolver(9)
+
+    def constraints(inputs):
+        x = solver.binarize(inputs)
+        x = tf.concat(
+            [solver.get_constraints(x, c) for c in ["row", "column", "box"]], 1
+        )
+        return tf.nn.log_softmax(x)
+
+    kernels = {
+        "poisson_binomial": lambda inputs: plia.Krat(constraints(inputs), 0)
+        .sum_reduce()
+        .logits,
+        "fft": lambda inputs: multi_log_convolution(constraints(inputs), 10),
+    }
+    results = {"batch": [], "max_difference": []}
+    size = 1
+    while size <= batch:
+        inputs = tf.nn.softmax(tf.random.normal((size, 9, 9, 9)))
+        line = "batch: %4i" % size
+        logits = {}
+        for name, kernel in kernels.items():
+            t, logits[name] = time_sudoku(kernel, inputs, repeats)
+            results.setdefault(f"{name}_time", []).append(t)
+            line += " %s: %.4fs" % (name, t)
+        difference = tf.reduce_max(
+            tf.abs(tf.exp(logits["poisson_binomial"]) - tf.exp(logits["fft"]))
+        )
+        results["batch"].append(size)
+        results["max_difference"].append(float(difference))
+        print(line + " max difference: %.2e" % difference)
+        size *= 4
+    return results
+
+
+def sharding(max_bitwidth, batch, repeats):
+    """
+    Measures the scaling of batched additions, Krat sums and modulos sharded across 1 to all cores.
+    """
+    x = PInt(tf.random.uniform((batch, 2**max_bitwidth)), 0)
+    k = plia.Krat(tf.random.uniform((batch, 8, 2 ** (max_bitwidth - 3))), 0)
+
+    def run():
+        (x + x).logits
+        k.sum_reduce().logits
+        (x % 1000).logits
+
+    results = {"n_workers": [], "time": [], "speedup": []}
+    for n_workers in range(1, os.cpu_count() + 1):
+        with plia.Sharding(n_workers):
+            run()
+            start_time = time.time()
+            for _ in range(repeats):
+                run()
+            t = (time.time() - start_time) / repeats
+        results["n_workers"].append(n_workers)
+        results["time"].append(t)
+        results["speedup"].append(results["time"][0] / t)
+        print(
+            "workers: %3i time: %.6fs speedup: %.2f"
+            % (n_workers, t, results["speedup"][-1])
+        )
+    return results
+
+
+def available_memory():
+    """The memory (in bytes) available for new allocations without swapping."""
+    with open("/proc/meminfo") as f:
+        return int(f.read().split("MemAvailable:")[1].split()[0]) * 1024
+
+
+def time_peak_memory(f):
+    """The wall time of f and the peak memory (in MB) of the NumPy arrays it allocates."""
+    tracemalloc.start()
+    start_time = time.time()
+    f()
+    t = time.time() - start_time
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return t, peak
+
+
+def streaming(max_bitwidth, memory_budget):
+    """
+    Compares the time and peak memory of the streaming convolution, bounded by memory_budget (in bytes), with
+    those of the in-memory convolution of the NumPy backend. In-memory sums are skipped once they are estimated
+    to exceed the available memory.
+    """
+    results = {
+        "streaming": [],
+        "streaming_memory": [],
+        "memory": [],
+        "memory_memory": [],
+    }
+    in_memory_peak = 0.0
+    for bitwidth in range(1, max_bitwidth + 1):
+        logits = np.zeros(2**bitwidth) - bitwidth * math.log(2)
+        x = plia.numpy.StreamingPInt.from_pint(
+            plia.numpy.PInt(logits, 0), memory_budget
+        )
+        t, peak = time_peak_memory(lambda: x + x)
+        results["streaming"].append(t)
+        results["streaming_memory"].append(peak)
+
+        t_memory, peak_memory = float("nan"), float("nan")
+        if 2.5 * in_memory_peak * 2**20 < available_memory():
+            y = plia.numpy.PInt(logits, 0)
+            t_memory, peak_memory = time_peak_memory(lambda: y + y)
+            in_memory_peak = peak_memory
+        results["memory"].append(t_memory)
+        results["memory_memory"].append(peak_memory)
+        print(
+            "bitwidth: %2i streaming: %.3fs %.0fMB in memory: %.3fs %.0fMB"
+            % (bitwidth, t, peak, t_memory, peak_memory)
+        )
+        del x
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default="cpu", choices=["cpu", "gpu"])
+    parser.add_argument(
+        "--problem",
+        default="calibrate",
+        choices=[
+            "calibrate",
+            "asymmetric",
+            "nary",
+            "precision",
+            "compiled",
+            "queries",
+            "comparison",
+            "backend",
+            "exact",
+            "streaming",
+            "sharding",
+            "gradient",
+            "checkpointing",
+            "bernoulli",
+        ],
+    )
+    parser.add_argument("--max_bitwidth", default=16, type=int)
+    parser.add_argument("--max_operands", default=256, type=int)
+    parser.add_argument("--batch_size", default=10, type=int)
+    parser.add_argument("--repeats", default=10, type=int)
+    parser.add_argument("--n_queries", default=1000, type=int)
+    parser.add_argument("--memory_budget", default=2**28, type=int)
+    parser.add_argument("--max_digits", default=256, type=int)
+
+    args = parser.parse_args()
+
+    if GPUS and args.device == "gpu":
+        tf.config.experimental.set_visible_devices(GPUS[0], "GPU")
+    else:
+        tf.config.experimental.set_visible_devices([], "GPU")
+
+    path = PARENT_DIR / Path("results") / Path(f"{args.device}")
+    os.makedirs(path, exist_ok=True)
+
+    if args.problem == "calibrate":
+        costs = calibrate(args.max_bitwidth, args.batch_size, args.repeats)
+        print("\ndefault costs:", CONVOLUTION_COSTS)
+        print("calibrated costs:", costs)
+        with open(path / "costs.yaml", "w+") as f:
+            yaml.dump(costs, f, default_flow_style=False)
+    elif args.problem == "asymmetric":
+        times = asymmetric(args.max_bitwidth, args.batch_size, args.repeats)
+        with open(path / "asymmetric.yaml", "w+") as f:
+            yaml.dump(times, f, default_flow_style=False)
+    elif args.problem == "nary":
+        times = nary(args.max_operands, args.batch_size, args.repeats)
+        with open(path / "nary.yaml", "w+") as f:
+            yaml.dump(times, f, default_flow_style=False)
+    elif args.problem == "compiled":
+        results = compiled(args.n_queries, args.batch_size, args.max_bitwidth)
+        with open(path / "compiled.yaml", "w+") as f:
+            yaml.dump(results, f, default_flow_style=False)
+    elif args.problem == "queries":
+        times = queries(args.n_queries, args.max_bitwidth)
+        with open(path / "queries.yaml", "w+") as f:
+            yaml.dump(times, f, default_flow_style=False)
+    elif args.problem == "comparison":
+        times = comparison(args.max_bitwidth, args.repeats)
+        with open(path / "comparison.yaml", "w+") as f:
+            yaml.dump(times, f, default_flow_style=False)
+    elif args.problem == "backend":
+        results = backend(args.max_bitwidth, args.batch_size, args.repeats)
+        with open(path / "backend.yaml", "w+") as f:
+            yaml.dump(results, f, default_flow_style=False)
+    elif args.problem == "exact":
+        results = exact(args.max_bitwidth, args.repeats)
+        with open(path / "exact.yaml", "w+") as f:
+            yaml.dump(results, f, default_flow_style=False)
+    elif args.problem == "streaming":
+        results = streaming(args.max_bitwidth, args.memory_budget)
+        with open(path / "streaming.yaml", "w+") as f:
+            yaml.dump(results, f, default_flow_style=False)
+    elif args.problem == "sharding":
+        results = sharding(args.max_bitwidth, args.batch_size, args.repeats)
+        with open(path / "sharding.yaml", "w+") as f:
+            yaml.dump(results, f, default_flow_style=False)
+    elif args.problem == "gradient":
+        results = gradient(args.max_bitwidth, args.batch_size)
+        with open(path / "gradient.yaml", "w+") as f:
+            yaml.dump(results, f, default_flow_style=False)
+    elif args.problem == "checkpointing":
+        results = checkpointing(args.max_digits, args.batch_size)
+        with open(path / "checkpointing.yaml", "w+") as f:
+            yaml.dump(results, f, default_flow_style=False)
+    elif args.problem == "bernoulli":
+        results = bernoulli(args.batch_size, args.repeats)
+        with open(path / "bernoulli.yaml", "w+") as f:
+            yaml.dump(results, f, default_flow_style=False)
+    elif args.problem == "precision":
+        results = precision(args.max_bitwidth, args.batch_size, args.repeats)
+        with open(path / "precision.yaml", "w+") as f:
+            yaml.dump(results, f, default_flow_style=False)
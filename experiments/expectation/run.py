@@ -13,9 +13,9 @@ import tensorflow as tf
 
 GPUS = tf.config.experimental.list_physical_devices("GPU")
 
-from plia import PInt, log_expectation, ifthenelse
+from plia import PInt, PIntMod, log_expectation, piecewise, lazy
 
-PROBLEMS = ["sum", "le", "eq", "luhn"]
+PROBLEMS = ["sum", "le", "eq", "luhn", "chain"]
 
 
 class Timer:
@@ -35,32 +35,35 @@ class Timer:
 def luhn(*identifier):
     check_digit = identifier[0]
     check_value = luhn_checksum(identifier[1:])
-    return check_digit + check_value == 10
+    return check_digit + check_value.to_pint() == 10
 
 
 def luhn_checksum(identifier):
-    check = PInt(tf.convert_to_tensor([0.0]), lower=0)
+    check = PIntMod.from_pint(PInt(tf.convert_to_tensor([0.0]), lower=0), 10)
 
     for i, digit in enumerate(identifier):
         if i % 2 == len(identifier) % 2:
-            digit = ifthenelse(
-                digit,
-                lt=5,
-                tbranch=lambda x: 2 * x,
-                fbranch=lambda x: 2 * x - 9,
-            )
+            # doubling a digit and summing the digits of the result
+            digit = piecewise(digit, [5], [(2, 0), (2, -9)])
             check = check + digit
         else:
             check = check + digit
-        check = check % 10
     return check
 
 
+def chain(*digits):
+    total = digits[0]
+    for digit in digits[1:]:
+        total = total + digit
+    return total <= 4 * len(digits)
+
+
 str2func = {
     "sum": lambda *args: args[0] + args[1],
     "le": lambda *args: args[0] <= args[1],
     "eq": lambda *args: args[0] == args[1],
     "luhn": lambda *args: luhn(*args),
+    "chain": lambda *args: chain(*args),
 }
 
 
@@ -72,7 +75,7 @@ def make_path(device, problem):
     return path
 
 
-def run_expectation(problem, max_bitwidth, device):
+def run_expectation(problem, max_bitwidth, device, evaluate_lazily=False):
     """Start with a dry run to not time TF backend initialisation cost"""
     bitwidth = 1
     number1 = PInt(tf.random.uniform((2**bitwidth,), minval=0, maxval=1), 0)
@@ -88,15 +91,27 @@ def run_expectation(problem, max_bitwidth, device):
         with Timer(times, bitwidth):
             if problem == "luhn":
                 fargs = [PInt(tf.random.uniform((10,)), 0) for _ in range(bitwidth)]
+            elif problem == "chain":
+                fargs = [PInt(tf.random.uniform((10,)), 0) for _ in range(bitwidth)]
+                if evaluate_lazily:
+                    fargs = [lazy(x) for x in fargs]
+
+                result = str2func[problem](*fargs)
+                result = log_expectation(result)
+                tf.test.experimental.sync_devices()
             else:
                 number1 = PInt(tf.random.uniform((2**bitwidth,)), 0)
                 number2 = PInt(tf.random.uniform((2**bitwidth,)), 0)
                 fargs = (number1, number2)
+                if evaluate_lazily:
+                    fargs = (lazy(number1), lazy(number2))
 
                 result = str2func[problem](*fargs)
                 result = log_expectation(result)
                 tf.test.experimental.sync_devices()
 
+    if evaluate_lazily:
+        problem = f"{problem}-lazy"
     with open(make_path(device, problem) / "times.yaml", "w+") as f:
         yaml.dump(times, f, default_flow_style=False)
 
@@ -105,6 +120,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--device", default="cpu", choices=["cpu", "gpu"])
     parser.add_argument("--max_bitwidth", default=24, type=int)
+    parser.add_argument("--lazy", action="store_true")
 
     args = parser.parse_args()
 
@@ -113,4 +129,6 @@ if __name__ == "__main__":
             tf.config.experimental.set_visible_devices(GPUS[0], "GPU")
         else:
             tf.config.experimental.set_visible_devices([], "GPU")
-        run_expectation(p, args.max_bitwidth, args.device)
+        if args.lazy and p == "luhn":
+            continue
+        run_expectation(p, args.max_bitwidth, args.device, args.lazy)
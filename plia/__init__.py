@@ -1,2 +1,67 @@
-from .pint import PInt, PIverson, Krat
-from .inference import ifthenelse, log_expectation, log1mexp
+import os
+import importlib
+
+# The module of every name exported by plia. Modules are imported on first access, such that importing plia
+# (or its NumPy backend plia.numpy) does not import TensorFlow
+MODULES = {
+    "PInt": ".pint",
+    "PIntMod": ".pint",
+    "PIverson": ".pint",
+    "Krat": ".pint",
+    "RaggedKrat": ".pint",
+    "Pruning": ".pint",
+    "SpectralPInt": ".pint",
+    "Precision": ".arithmetics",
+    "Compilation": ".arithmetics",
+    "Sharding": ".arithmetics",
+    "ifthenelse": ".inference",
+    "piecewise": ".inference",
+    "log_expectation": ".inference",
+    "log1mexp": ".inference",
+    "sum": ".inference",
+    "checkpoint": ".inference",
+    "LazyPInt": ".lazy",
+    "LazyIverson": ".lazy",
+    "lazy": ".lazy",
+    "evaluate": ".lazy",
+    "PIntBatch": ".batch",
+    "execute": ".batch",
+    "ExactPInt": ".numpy.exact",
+    "StreamingPInt": ".numpy.streaming",
+}
+
+# The names implemented by the NumPy backend
+NUMPY_NAMES = [
+    "PInt",
+    "PIverson",
+    "Krat",
+    "ifthenelse",
+    "piecewise",
+    "log_expectation",
+    "log1mexp",
+    "sum",
+]
+
+# The backend of the names exported by plia, selected with the PLIA_BACKEND environment variable. With "numpy",
+# the names of NUMPY_NAMES come from plia.numpy and all other names still come from the TensorFlow backend
+BACKEND = os.environ.get("PLIA_BACKEND", "tensorflow")
+if BACKEND not in ("tensorflow", "numpy"):
+    raise ValueError(f"Unknown backend {BACKEND}, use 'tensorflow' or 'numpy'")
+
+__all__ = list(MODULES)
+
+
+def __getattr__(name):
+    if BACKEND == "numpy" and name in NUMPY_NAMES:
+        module = importlib.import_module(".numpy", __name__)
+    elif name in MODULES:
+        module = importlib.import_module(MODULES[name], __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
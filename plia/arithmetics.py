@@ -1,7 +1,21 @@
+import os
+import math
+import functools
+import itertools
+import threading
+import concurrent.futures
 import tensorflow as tf
 import numpy as np
 import einops as E
 
+from .supports import (
+    product_support,
+    product_segments,
+    product_table,
+    affine_targets,
+    survival_window,
+    overlap_slices,
+)
 
 EPSILON = tf.keras.backend.epsilon()
 
@@ -19,82 +33,1130 @@ def logit_pad(logits, lower_padding, upper_padding):
     return tf.pad(logits, padding, mode="CONSTANT", constant_values=-np.inf)
 
 
-def log_convolution(p1, p2, signal_length):
+# Seconds per unit of work, calibrated on CPU with experiments/convolution/run.py
+CONVOLUTION_COSTS = {
+    "direct": 2.5e-10,
+    "direct_overhead": 4.0e-4,
+    "fft": 8.0e-10,
+    "fft_overhead": 3.5e-4,
+    "block_overhead": 1.0e-4,
+}
+
+# Number of values of the larger operand transformed at once by the overlap-add convolution
+BLOCK_LENGTH = 2**13
+
+# Number of values of the larger PMF in each block when blocks are rescaled individually
+RESCALED_BLOCK_LENGTH = 2**10
+
+# Maximal number of (value1, value2) pairs materialised at once when multiplying two probabilistic integers
+PAIR_BLOCK_LENGTH = 2**20
+
+# Number of Bernoulli random variables summed by a single dynamic program, larger Krats are summed in groups of
+# this size whose sums are convolved in a balanced tree
+BERNOULLI_GROUP_LENGTH = 16
+
+# Compute dtype of the transforms, floor added to the probabilities before taking their logarithm and
+# whether every block of the larger operand is rescaled by its own maximum before being transformed.
+# Rescaled blocks bound the round-off error relative to the largest probability within the span of the
+# smaller operand instead of relative to the global maximum (see tests/precision.py for measured bounds).
+# Kernels that transform whole PMFs at once use the EPSILON floor under such policies (transform_floor)
+PRECISIONS = {
+    "float64": (tf.float64, EPSILON, False),
+    "float32": (tf.float32, EPSILON, False),
+    "float32-rescaled": (tf.float32, float(np.finfo(np.float32).tiny), True),
+}
+
+
+class Precision:
+    """
+    Context manager selecting the precision policy (a key of PRECISIONS) of all convolutions inside of it.
+    Outside of any context the "float64" policy is used. Kernels also accept a policy per call.
+    """
+
+    active = "float64"
+
+    def __init__(self, precision):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision policy '{precision}'")
+        self.precision = precision
+
+    def __enter__(self):
+        self.previous = Precision.active
+        Precision.active = self.precision
+        return self
+
+    def __exit__(self, *args):
+        Precision.active = self.previous
+
+
+def precision_policy(precision=None):
+    return PRECISIONS[Precision.active if precision is None else precision]
+
+
+def transform_floor(precision=None):
+    """
+    The floor of the kernels that transform whole PMFs at once. Their round-off error is relative to the global
+    maximum of the PMF, so policies that rescale blocks (which only the overlap-add convolution does) fall back
+    to the EPSILON floor in them.
+    """
+    _, floor, rescale = precision_policy(precision)
+    return EPSILON if rescale else floor
+
+
+def floored_log(p, floor):
+    """Logarithm of probabilities computed by a convolution, clipping negative round-off errors to zero."""
+    return tf.math.log(tf.maximum(p, 0.0) + floor)
+
+
+def bucket_length(cardinality, min_bucket=1):
+    """The padded length of a cardinality, the next power of two that is at least min_bucket."""
+    return max(min_bucket, 2 ** math.ceil(math.log2(cardinality)))
+
+
+class Compilation:
+    """
+    Context manager that executes the convolution kernels (and log-expectations) inside of it through traced
+    functions. The cardinalities of the operands are padded with zero probabilities to the next power of two,
+    such that a function is only traced (and optionally jit-compiled with XLA) once per bucket of cardinalities,
+    batch shape and precision policy. Lower bounds never enter a trace: they are either only used outside of the
+    kernels or passed as tensors. Cache hits and misses are counted in `hits` and `misses`.
+    """
+
+    active = None
+
+    def __init__(self, jit_compile=False, min_bucket=16):
+        self.jit_compile = jit_compile
+        self.min_bucket = min_bucket
+        self.functions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        self.previous = Compilation.active
+        Compilation.active = self
+        return self
+
+    def __exit__(self, *args):
+        Compilation.active = self.previous
+
+    def bucket(self, cardinality):
+        return bucket_length(cardinality, self.min_bucket)
+
+    def run(self, function, ps, buckets, key, tensors=()):
+        """
+        Evaluates function(*ps, *tensors) with every PMF in ps padded to its bucket.
+
+        @param function: The function to trace on a cache miss
+        @param ps: The PMFs, padded along their last axis
+        @param buckets: The padded cardinality of every PMF
+        @param key: The Python values the function depends on, which identify its trace together with the shapes
+        @param tensors: Further inputs that do not identify the trace, such as lower bounds
+        """
+        ps = [logit_pad(p, 0, bucket - p.shape[-1]) for p, bucket in zip(ps, buckets)]
+        shapes = tuple(tuple(p.shape[:-1]) for p in ps)
+        key = (key, tuple(buckets), shapes, Precision.active)
+
+        if key in self.functions:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.functions[key] = tf.function(function, jit_compile=self.jit_compile)
+        return self.functions[key](*ps, *tensors)
+
+    def report(self):
+        return {"hits": self.hits, "misses": self.misses, "traces": len(self.functions)}
+
+
+def compiling():
+    return Compilation.active is not None and tf.executing_eagerly()
+
+
+class Sharding:
+    """
+    Context manager that shards the leading batch dimension of the kernels inside of it across a pool of
+    n_workers threads (all cores by default), which run the TensorFlow ops of their shards concurrently as the
+    ops release the GIL. Operands whose leading dimension is 1 (or that have no batch dimension) are broadcast to
+    every shard. Batches smaller than 2 * min_shard are not sharded. If affinity lists CPU ids, the workers are
+    pinned to them in turn (on Linux). Gradients are computed by the workers as well, recomputing the forward
+    pass of every shard under its own tape. The pool is started on first use and shared by all Shardings with the
+    same n_workers and affinity for the lifetime of the process, such that gradients can still be computed after
+    leaving the context and entering a Sharding again starts no new threads.
+    """
+
+    active = None
+    local = threading.local()
+    pools = {}
+    lock = threading.Lock()
+
+    def __init__(self, n_workers=None, min_shard=1, affinity=None):
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+        self.min_shard = min_shard
+        self.affinity = tuple(affinity) if affinity else None
+
+    def __enter__(self):
+        self.previous = Sharding.active
+        Sharding.active = self
+        return self
+
+    def __exit__(self, *args):
+        Sharding.active = self.previous
+
+    @property
+    def pool(self):
+        key = (self.n_workers, self.affinity)
+        with Sharding.lock:
+            if key not in Sharding.pools:
+                Sharding.pools[key] = concurrent.futures.ThreadPoolExecutor(
+                    self.n_workers,
+                    initializer=initialize_worker,
+                    initargs=(self.affinity, itertools.count()),
+                )
+            return Sharding.pools[key]
+
+    def n_shards(self, ps, event_rank):
+        """The number of shards of the operands ps with event_rank trailing event axes, 1 if not sharded."""
+        if getattr(Sharding.local, "worker", False) or not tf.executing_eagerly():
+            return 1
+        batch, _ = batch_operands(ps, event_rank)
+        return min(self.n_workers, batch // self.min_shard)
+
+    def run(self, function, ps, event_rank=1):
+        """
+        Evaluates function(*ps) as the concatenation of its values on the shards of the leading batch dimension.
+
+        @param function: The kernel, which maps tensors to a single tensor with the same leading batch dimension
+        @param ps: The tensors, of which those with a batch dimension share its size
+        @param event_rank: The number of trailing axes of the tensors that are not batch dimensions
+        """
+        batch, sharded = batch_operands(ps, event_rank)
+        bounds = np.linspace(0, batch, self.n_shards(ps, event_rank) + 1).astype(int)
+
+        def shard(tensors, i):
+            return [
+                t[bounds[i] : bounds[i + 1]] if split else t
+                for t, split in zip(tensors, sharded)
+            ]
+
+        def gradients(i, upstream):
+            inputs = shard(ps, i)
+            with tf.GradientTape() as tape:
+                tape.watch(inputs)
+                output = function(*inputs)
+            grads = tape.gradient(
+                output, inputs, output_gradients=upstream[bounds[i] : bounds[i + 1]]
+            )
+            return [tf.zeros_like(t) if g is None else g for t, g in zip(inputs, grads)]
+
+        @tf.custom_gradient
+        def sharded_function(*ps):
+            shards = range(len(bounds) - 1)
+            outputs = self.pool.map(lambda i: function(*shard(ps, i)), shards)
+
+            def grad(upstream):
+                grads = list(self.pool.map(lambda i: gradients(i, upstream), shards))
+                return [
+                    tf.concat(g, axis=0) if split else tf.add_n(g)
+                    for g, split in zip(zip(*grads), sharded)
+                ]
+
+            return tf.concat(list(outputs), axis=0), grad
+
+        return sharded_function(*ps)
+
+
+def initialize_worker(affinity, started):
+    Sharding.local.worker = True
+    if affinity:
+        os.sched_setaffinity(0, {affinity[next(started) % len(affinity)]})
+
+
+def batch_operands(ps, event_rank):
+    """
+    The size of the leading batch dimension of the operands ps, aligned from their trailing event_rank axes, and
+    whether every operand is split along it. Only operands with all batch dimensions whose leading one has the
+    size of the batch are split, all others are broadcast to every shard.
+    """
+    rank = max(p.shape.rank for p in ps)
+    if rank == event_rank:
+        return 1, [False] * len(ps)
+    batch = max(p.shape[0] for p in ps if p.shape.rank == rank)
+    return batch, [p.shape.rank == rank and p.shape[0] == batch for p in ps]
+
+
+def sharding(ps, event_rank=1):
+    return Sharding.active is not None and Sharding.active.n_shards(ps, event_rank) > 1
+
+
+@functools.lru_cache(maxsize=None)
+def fft_length(signal_length):
+    """
+    Smallest FFT length of at least signal_length whose only prime factors are 2, 3 and 5.
+
+    @param signal_length: The minimal length of the transform
+
+    @return: The FFT length
+    """
+    length = signal_length
+    while True:
+        n = length
+        for factor in (2, 3, 5):
+            while n % factor == 0:
+                n //= factor
+        if n == 1:
+            return length
+        length += 1
+
+
+def batch_size(*ps):
+    shape = functools.reduce(tf.broadcast_static_shape, [p.shape[:-1] for p in ps])
+    return math.prod(d if d is not None else 1 for d in shape)
+
+
+def direct_cost(card1, card2, batch=1):
+    """Estimated time in seconds of a direct convolution of two PMFs of the given cardinalities."""
+    return (
+        CONVOLUTION_COSTS["direct_overhead"]
+        + CONVOLUTION_COSTS["direct"] * batch * card1 * card2
+    )
+
+
+def fft_cost(signal_length, n_transforms=3, batch=1):
+    """Estimated time in seconds of an FFT convolution computing n_transforms real transforms."""
+    n = fft_length(signal_length)
+    cost = CONVOLUTION_COSTS["fft"] * batch * n_transforms * n * max(1.0, math.log2(n))
+    return CONVOLUTION_COSTS["fft_overhead"] + cost
+
+
+def overlap_add_cost(card1, card2, batch=1, rescale=False):
+    """Estimated time in seconds of an overlap-add convolution of two PMFs of the given cardinalities."""
+    card1, card2 = max(card1, card2), min(card1, card2)
+    if rescale:
+        block_length = min(max(RESCALED_BLOCK_LENGTH, card2), card1)
+    else:
+        block_length = min(max(BLOCK_LENGTH, 4 * card2), card1)
+    n_blocks = -(-card1 // block_length)
+    n = fft_length(block_length + card2 - 1)
+    cost = CONVOLUTION_COSTS["fft"] * batch * (2 * n_blocks + 1) * n * math.log2(n)
+    return (
+        CONVOLUTION_COSTS["fft_overhead"]
+        + CONVOLUTION_COSTS["block_overhead"] * n_blocks
+        + cost
+    )
+
+
+def log_convolution(p1, p2, signal_length, precision=None):
+    """
+    Imlementation of summing the PMF of two probilistic integers.
+    Dispatches between a direct, an FFT and an overlap-add convolution based on the cost model in
+    CONVOLUTION_COSTS. The overlap-add convolution is only considered when the larger operand spans
+    several blocks, in which case it also bounds the size of the intermediate buffers, or when the
+    precision policy rescales blocks.
+
+    @param p1: The PMF of the first probabilistic integer
+    @param p2: The PMF of the second probabilistic integer
+    @param signal_length: The length of the outcome space
+    @param precision: The precision policy, defaults to the active one
+
+    @return: The PMF of the sum of the two probabilistic integers
+    """
+    if sharding((p1, p2)):
+        return Sharding.active.run(
+            lambda p1, p2: log_convolution(p1, p2, signal_length, precision), (p1, p2)
+        )
+    if compiling():
+        buckets = [Compilation.active.bucket(p.shape[-1]) for p in (p1, p2)]
+        p = Compilation.active.run(
+            lambda p1, p2: log_convolution(p1, p2, sum(buckets) - 1, precision),
+            (p1, p2),
+            buckets,
+            ("log_convolution", precision),
+        )
+        return p[..., :signal_length]
+
+    card1, card2 = p1.shape[-1], p2.shape[-1]
+    batch = batch_size(p1, p2)
+    _, _, rescale = precision_policy(precision)
+    costs = {direct_log_convolution: direct_cost(card1, card2, batch)}
+    if rescale:
+        costs[overlap_add_log_convolution] = overlap_add_cost(
+            card1, card2, batch, rescale
+        )
+    else:
+        costs[fft_log_convolution] = fft_cost(signal_length, batch=batch)
+        if max(card1, card2) > 2 * max(BLOCK_LENGTH, 4 * min(card1, card2)):
+            costs[overlap_add_log_convolution] = overlap_add_cost(card1, card2, batch)
+    convolution = min(costs, key=costs.get)
+    return convolution(p1, p2, signal_length, precision=precision)
+
+
+def direct_log_convolution(p1, p2, signal_length, precision=None):
+    """
+    Imlementation of summing the PMF of two probilistic integers by directly summing over the shifted windows
+    of the larger PMF. The cost is linear in the product of the cardinalities, making it the fast choice when
+    one of the two probabilistic integers has a small domain.
+
+    @param p1: The PMF of the first probabilistic integer
+    @param p2: The PMF of the second probabilistic integer
+    @param signal_length: The length of the outcome space
+    @param precision: The precision policy, only its floor applies as the sum is computed in float32
+
+    @return: The PMF of the sum of the two probabilistic integers
+    """
+    if p1.shape[-1] < p2.shape[-1]:
+        p1, p2 = p2, p1
+    card = p2.shape[-1]
+    _, floor, _ = precision_policy(precision)
+
+    a1 = tf.math.reduce_max(p1, axis=-1, keepdims=True)
+    a2 = tf.math.reduce_max(p2, axis=-1, keepdims=True)
+
+    p1 = tf.math.exp(p1 - a1)
+    p2 = tf.math.exp(p2 - a2)
+
+    # batch elements become the channels of a single depthwise convolution
+    if p1.shape[:-1] != p2.shape[:-1]:
+        batch_shape = tf.broadcast_dynamic_shape(tf.shape(p1)[:-1], tf.shape(p2)[:-1])
+        p1 = tf.broadcast_to(p1, tf.concat([batch_shape, tf.shape(p1)[-1:]], axis=0))
+        p2 = tf.broadcast_to(p2, tf.concat([batch_shape, tf.shape(p2)[-1:]], axis=0))
+    batch_shape = tf.shape(p1)[:-1]
+    length = p1.shape[-1] + card - 1
+
+    p1 = tf.reshape(p1, [-1, p1.shape[-1]])
+    p1 = tf.pad(
+        p1, [[0, 0], [card - 1, card - 1]], mode="CONSTANT", constant_values=0.0
+    )
+    p1 = tf.transpose(p1)[None, None, :, :]
+    p2 = tf.reshape(p2[..., ::-1], [-1, card])
+    p2 = tf.transpose(p2)[None, :, :, None]
+
+    p = tf.nn.depthwise_conv2d(p1, p2, strides=[1, 1, 1, 1], padding="VALID")
+    p = tf.reshape(tf.transpose(p[0, 0]), tf.concat([batch_shape, [length]], axis=0))
+    p = pad(p, signal_length)[..., :signal_length]
+
+    logp = floored_log(p, floor)
+    return logp + a1 + a2
+
+
+def fft_log_convolution(p1, p2, signal_length, precision=None):
     """
     Imlementation of summing the PMF of two probilistic integers using the fast log-conv-exp trick.
+    Its gradient is computed by fft_log_convolution_gradient, which rematerializes the transforms from the float32
+    inputs instead of keeping the float64 intermediates of the forward pass alive.
 
     @param p1: The PMF of the first probabilistic integer
     @param p2: The PMF of the second probabilistic integer
     @param signal_length: The length of the outcome space
+    @param precision: The precision policy, defaults to the active one
 
     @return: The PMF of the sum of the two probabilistic integers
     """
+
+    @tf.custom_gradient
+    def convolution(p1, p2):
+        # the intermediates of the forward pass are not recorded by the tape and freed right away
+        logp = fft_log_convolution_forward(
+            tf.stop_gradient(p1), tf.stop_gradient(p2), signal_length, precision
+        )
+        return logp, lambda g: fft_log_convolution_gradient(
+            p1, p2, g, signal_length, precision
+        )
+
+    return convolution(p1, p2)
+
+
+def fft_log_convolution_forward(p1, p2, signal_length, precision=None):
+    """The forward pass of fft_log_convolution, which autodiff differentiates when it is called directly."""
+    dtype, floor = precision_policy(precision)[0], transform_floor(precision)
+
     a1 = tf.math.reduce_max(p1, axis=-1, keepdims=True)
     a2 = tf.math.reduce_max(p2, axis=-1, keepdims=True)
 
     p1 = p1 - a1
     p2 = p2 - a2
 
-    p1 = tf.cast(p1, dtype=tf.float64)
-    p2 = tf.cast(p2, dtype=tf.float64)
+    p1 = tf.cast(p1, dtype=dtype)
+    p2 = tf.cast(p2, dtype=dtype)
 
     p1 = tf.math.exp(p1)
     p2 = tf.math.exp(p2)
 
-    p1 = pad(p1, signal_length)
-    p2 = pad(p2, signal_length)
+    n = fft_length(signal_length)
+    p1 = pad(p1, n)
+    p2 = pad(p2, n)
 
-    p1 = tf.signal.rfft(p1, fft_length=[signal_length])
-    p2 = tf.signal.rfft(p2, fft_length=[signal_length])
+    p1 = tf.signal.rfft(p1, fft_length=[n])
+    p2 = tf.signal.rfft(p2, fft_length=[n])
 
     p = p1 * p2
 
-    p = tf.signal.irfft(p, fft_length=[signal_length])
+    p = tf.signal.irfft(p, fft_length=[n])[..., :signal_length]
 
-    logp = tf.math.log(p + EPSILON)
+    logp = floored_log(p, floor)
     logp = tf.cast(logp, dtype=tf.float32)
     return logp + a1 + a2
 
 
-def multi_log_convolution(p, signal_length):
+def shifted_exp(p, dtype):
+    """The probabilities exp(p - max(p)) in dtype, and the indicator of the maxima scaled to sum to one."""
+    a = tf.math.reduce_max(p, axis=-1, keepdims=True)
+    is_max = tf.cast(tf.equal(p, a), dtype)
+    return tf.math.exp(tf.cast(p - a, dtype)), is_max / tf.reduce_sum(
+        is_max, axis=-1, keepdims=True
+    )
+
+
+def log_convolution_weights(spectrum, g, n, signal_length, floor):
+    """
+    The upstream gradient g of the floored logarithm of the inverse transform of spectrum, divided by the
+    probabilities of the sum (zero where they are negative round-off errors), and its transform.
+    """
+    p = tf.signal.irfft(spectrum, fft_length=[n])[..., :signal_length]
+    w = tf.where(p > 0.0, g / (tf.maximum(p, 0.0) + floor), 0.0)
+    return tf.signal.rfft(pad(w, n), fft_length=[n])
+
+
+def shift_gradient(p, is_max, correlation, g):
+    """
+    The gradient of the logits of one operand, p * correlation, plus the gradient of its shift by the maximal logit,
+    which flows into the maxima.
+    """
+    grad = p * correlation
+    grad_a = tf.reduce_sum(g, axis=-1, keepdims=True)
+    grad_a = grad_a - tf.reduce_sum(grad, axis=-1, keepdims=True)
+    return grad + is_max * grad_a
+
+
+def reduce_to_shape(grad, shape):
+    """Sums a gradient over the axes its operand of the given shape was broadcast along."""
+    offset = len(grad.shape) - len(shape)
+    axes = [
+        i
+        for i in range(len(grad.shape))
+        if i < offset or (shape[i - offset] == 1 and grad.shape[i] != 1)
+    ]
+    return tf.reshape(tf.reduce_sum(grad, axis=axes), shape)
+
+
+def fft_log_convolution_gradient(p1, p2, g, signal_length, precision=None):
+    """
+    The gradient of fft_log_convolution. The gradient of the logits of each operand is its probabilities times
+    the correlation of the other operand with the upstream gradient divided by the probabilities of the sum,
+    which is again computed with transforms of the same length n = fft_length(signal_length). It hence matches
+    the forward pass also when the sum wraps around modulo n, which happens if signal_length is shorter than the
+    full support of the sum. The transforms of the operands are rematerialized from the float32 logits.
+
+    @param p1: The PMF of the first probabilistic integer
+    @param p2: The PMF of the second probabilistic integer
+    @param g: The upstream gradient of the PMF of the sum
+    @param signal_length: The length of the outcome space
+    @param precision: The precision policy, defaults to the active one
+
+    @return: The gradients of the PMFs of the two probabilistic integers
+    """
+    dtype, floor = precision_policy(precision)[0], transform_floor(precision)
+    n = fft_length(signal_length)
+    card1, card2 = p1.shape[-1], p2.shape[-1]
+    g = tf.cast(g, dtype)
+
+    q1, is_max1 = shifted_exp(p1, dtype)
+    q2, is_max2 = shifted_exp(p2, dtype)
+    spectrum1 = tf.signal.rfft(pad(q1, n), fft_length=[n])
+    spectrum2 = tf.signal.rfft(pad(q2, n), fft_length=[n])
+    w = log_convolution_weights(spectrum1 * spectrum2, g, n, signal_length, floor)
+
+    # every buffer is released as soon as it is used, which bounds the peak memory of the backward pass
+    correlation = tf.signal.irfft(w * tf.math.conj(spectrum2), fft_length=[n])
+    del spectrum2
+    grad1 = shift_gradient(q1, is_max1, correlation[..., :card1], g)
+    grad1 = tf.cast(reduce_to_shape(grad1, p1.shape), p1.dtype)
+    del q1, correlation
+    correlation = tf.signal.irfft(w * tf.math.conj(spectrum1), fft_length=[n])
+    del spectrum1, w
+    grad2 = shift_gradient(q2, is_max2, correlation[..., :card2], g)
+    return grad1, tf.cast(reduce_to_shape(grad2, p2.shape), p2.dtype)
+
+
+def overlap_add_log_convolution(
+    p1, p2, signal_length, block_length=None, precision=None
+):
+    """
+    Imlementation of summing the PMF of two probilistic integers of very different sizes using the
+    overlap-add method. The smaller PMF is transformed once, after which the larger PMF is convolved with it
+    one block at a time. Only block-sized spectra are alive at any point instead of full-length ones.
+    Precision policies that rescale blocks exponentiate every block relative to its own maximum, such that the
+    round-off error of its transform is relative to that maximum instead of the global one.
+
+    @param p1: The PMF of the first probabilistic integer
+    @param p2: The PMF of the second probabilistic integer
+    @param signal_length: The length of the outcome space
+    @param block_length: The number of values of the larger PMF in each block
+    @param precision: The precision policy, defaults to the active one
+
+    @return: The PMF of the sum of the two probabilistic integers
+    """
+    if p1.shape[-1] < p2.shape[-1]:
+        p1, p2 = p2, p1
+    card = p2.shape[-1]
+    dtype, floor, rescale = precision_policy(precision)
+    if block_length is None and rescale:
+        block_length = min(max(RESCALED_BLOCK_LENGTH, card), p1.shape[-1])
+    elif block_length is None:
+        block_length = min(max(BLOCK_LENGTH, 4 * card), p1.shape[-1])
+    n_blocks = -(-p1.shape[-1] // block_length)
+
+    a1 = tf.math.reduce_max(p1, axis=-1, keepdims=True)
+    a2 = tf.math.reduce_max(p2, axis=-1, keepdims=True)
+
+    p2 = tf.math.exp(tf.cast(p2 - a2, dtype=dtype))
+
+    n = fft_length(block_length + card - 1)
+    p2 = tf.signal.rfft(p2, fft_length=[n])
+
+    p1 = logit_pad(p1 - a1, 0, n_blocks * block_length - p1.shape[-1])
+    p1 = E.rearrange(p1, "... (blocks block) -> blocks ... block", block=block_length)
+
+    if rescale:
+        scales = tf.stop_gradient(tf.math.reduce_max(p1, axis=-1, keepdims=True))
+        scales = tf.where(tf.math.is_finite(scales), scales, tf.zeros_like(scales))
+    else:
+        scales = tf.zeros_like(p1[..., :1])
+
+    def convolve_block(inputs):
+        block, scale = inputs
+        block = tf.math.exp(tf.cast(block - scale, dtype=dtype))
+        block = tf.signal.rfft(block, fft_length=[n])
+        block = tf.signal.irfft(block * p2, fft_length=[n])[..., : 2 * block_length]
+        return block * tf.math.exp(tf.cast(scale, dtype=dtype))
+
+    p = tf.map_fn(
+        convolve_block, (p1, scales), fn_output_signature=dtype, parallel_iterations=1
+    )
+    p = pad(p, 2 * block_length)
+
+    # the second half of every block overlaps with the first half of the next one
+    heads = E.rearrange(p[..., :block_length], "blocks ... block -> ... (blocks block)")
+    tails = E.rearrange(p[..., block_length:], "blocks ... block -> ... (blocks block)")
+    padding = [[0, 0] for _ in range(len(heads.shape) - 1)]
+    heads = tf.pad(
+        heads, padding + [[0, block_length]], mode="CONSTANT", constant_values=0.0
+    )
+    tails = tf.pad(
+        tails, padding + [[block_length, 0]], mode="CONSTANT", constant_values=0.0
+    )
+    p = pad(heads + tails, signal_length)[..., :signal_length]
+
+    logp = floored_log(p, floor)
+    logp = tf.cast(logp, dtype=tf.float32)
+    return logp + a1 + a2
+
+
+def multi_log_convolution(p, signal_length, precision=None):
+    """
+    Implementation of summing the PMF of a Krat (tensor) of probabilistic integers.
+    Dispatches between a fold of direct convolutions and a single FFT product using the cost model in
+    CONVOLUTION_COSTS.
+
+    @param p: The PMF of the probabilistic integers in a Krat
+    @param signal_length: The length of the outcome space
+    @param precision: The precision policy, defaults to the active one
+
+    @return: The PMF of the sum of the probabilistic integers in the Krat
+    """
+    if sharding((p,), event_rank=2):
+        return Sharding.active.run(
+            lambda p: multi_log_convolution(p, signal_length, precision), (p,), 2
+        )
+
+    n_rvs, card = p.shape[-2], p.shape[-1]
+    if compiling():
+        bucket = Compilation.active.bucket(card)
+        signal_bucket = n_rvs * (bucket - 1) + 1
+        logp = Compilation.active.run(
+            lambda p: multi_log_convolution(p, signal_bucket, precision),
+            (p,),
+            [bucket],
+            ("multi_log_convolution", precision),
+        )
+        return logp[..., :signal_length]
+
+    batch = batch_size(p[..., 0, :])
+    fold_cost = sum(
+        direct_cost(i * (card - 1) + 1, card, batch) for i in range(1, n_rvs)
+    )
+    if fold_cost < fft_cost(signal_length, n_transforms=n_rvs + 1, batch=batch):
+        logits = p[..., 0, :]
+        for i in range(1, n_rvs):
+            length = min(logits.shape[-1] + card - 1, signal_length)
+            logits = direct_log_convolution(
+                logits, p[..., i, :], length, precision=precision
+            )
+        return logit_pad(logits, 0, signal_length - logits.shape[-1])
+    return fft_multi_log_convolution(p, signal_length, precision=precision)
+
+
+def fft_multi_log_convolution(p, signal_length, precision=None):
     """
     Implementation of summing the PMF of a Krat (tensor) of probabilistic integers using the fast log-conv-exp trick.
+    Its gradient is computed by fft_multi_log_convolution_gradient, which rematerializes the transforms from the
+    float32 inputs instead of keeping the float64 intermediates of the forward pass alive.
 
     @param p: The PMF of the probabilistic integers in a Krat
     @param signal_length: The length of the outcome space
+    @param precision: The precision policy, defaults to the active one
 
     @return: The PMF of the sum of the probabilistic integers in the Krat
     """
 
+    @tf.custom_gradient
+    def convolution(p):
+        # the intermediates of the forward pass are not recorded by the tape and freed right away
+        logp = fft_multi_log_convolution_forward(
+            tf.stop_gradient(p), signal_length, precision
+        )
+        return logp, lambda g: fft_multi_log_convolution_gradient(
+            p, g, signal_length, precision
+        )
+
+    return convolution(p)
+
+
+def fft_multi_log_convolution_forward(p, signal_length, precision=None):
+    """The forward pass of fft_multi_log_convolution, which autodiff differentiates when it is called directly."""
+    dtype, floor = precision_policy(precision)[0], transform_floor(precision)
+
     a = tf.math.reduce_max(p, axis=-1, keepdims=True)
 
     p = p - a
-    p = tf.cast(p, dtype=tf.float64)
+    p = tf.cast(p, dtype=dtype)
     p = tf.math.exp(p)
 
-    p = pad(p, signal_length)
-    p = tf.signal.rfft(p, fft_length=[signal_length])
+    n = fft_length(signal_length)
+    p = pad(p, n)
+    p = tf.signal.rfft(p, fft_length=[n])
 
     p = tf.math.reduce_prod(p, axis=-2)
-    p = tf.signal.irfft(p, fft_length=[signal_length])
+    p = tf.signal.irfft(p, fft_length=[n])[..., :signal_length]
 
-    p = tf.math.log(p + EPSILON)
+    p = floored_log(p, floor)
     p = tf.cast(p, dtype=tf.float32)
 
     a = tf.math.reduce_sum(a, axis=-2)
     return p + a
 
 
+def fft_multi_log_convolution_gradient(p, g, signal_length, precision=None):
+    """
+    The gradient of fft_multi_log_convolution. The gradient of the logits of every random variable is its
+    probabilities times the correlation of the sum of all other random variables, whose spectrum is the product
+    of the exclusive prefix and suffix products of the spectra, with the upstream gradient divided by the
+    probabilities of the sum. The transforms are rematerialized from the float32 logits.
+
+    @param p: The PMF of the probabilistic integers in a Krat
+    @param g: The upstream gradient of the PMF of the sum
+    @param signal_length: The length of the outcome space
+    @param precision: The precision policy, defaults to the active one
+
+    @return: The gradient of the PMF of the probabilistic integers in the Krat
+    """
+    dtype, floor = precision_policy(precision)[0], transform_floor(precision)
+    n = fft_length(signal_length)
+    g = tf.cast(g, dtype)[..., None, :]
+
+    q, is_max = shifted_exp(p, dtype)
+    spectra = tf.signal.rfft(pad(q, n), fft_length=[n])
+    others = tf.math.cumprod(spectra, axis=-2, exclusive=True, reverse=True)
+    spectrum = spectra[..., :1, :] * others[..., :1, :]
+    others *= tf.math.cumprod(spectra, axis=-2, exclusive=True)
+    del spectra
+    w = log_convolution_weights(spectrum, g, n, signal_length, floor)
+    del spectrum
+
+    correlation = tf.signal.irfft(w * tf.math.conj(others), fft_length=[n])
+    grad = shift_gradient(q, is_max, correlation[..., : p.shape[-1]], g)
+    return tf.cast(grad, p.dtype)
+
+
+def lcm(*values):
+    return functools.reduce(lambda a, b: a * b // math.gcd(a, b), values, 1)
+
+
+def dilated_spectrum(p, stride, n):
+    """
+    Real FFT of length n of a PMF spread out over every stride-th value. For a stride that divides n, this
+    spectrum is the full spectrum of the compact PMF at length n / stride repeated stride times, so the
+    dilated PMF never has to be materialised.
+
+    @param p: The compact PMF
+    @param stride: The distance between two consecutive values of the PMF
+    @param n: The FFT length, a multiple of stride
+
+    @return: The first n // 2 + 1 frequencies of the spectrum of the dilated PMF
+    """
+    if stride == 1:
+        return tf.signal.rfft(pad(p, n), fft_length=[n])
+    p = pad(p, n // stride)
+    p = tf.signal.fft(tf.complex(p, tf.zeros_like(p)))
+    p = E.repeat(p, "... n -> ... (stride n)", stride=stride)
+    return p[..., : n // 2 + 1]
+
+
+def nary_log_convolution(ps, signal_length, strides=None, precision=None):
+    """
+    Implementation of summing the PMFs of a list of probabilistic integers with arbitrary cardinalities using a
+    single inverse FFT. The spectra are multiplied into an accumulator one at a time at the final FFT length.
+
+    @param ps: The PMFs of the probabilistic integers
+    @param signal_length: The length of the outcome space
+    @param strides: The distance between consecutive values of every PMF, defaults to 1 for all of them
+    @param precision: The precision policy, defaults to the active one
+
+    @return: The PMF of the sum of the probabilistic integers
+    """
+    if strides is None:
+        strides = [1 for _ in ps]
+    if sharding(ps):
+        return Sharding.active.run(
+            lambda *ps: nary_log_convolution(
+                list(ps), signal_length, strides, precision
+            ),
+            ps,
+        )
+    if compiling():
+        buckets = [Compilation.active.bucket(p.shape[-1]) for p in ps]
+        signal_bucket = sum(s * (b - 1) for s, b in zip(strides, buckets)) + 1
+        logp = Compilation.active.run(
+            lambda *ps: nary_log_convolution(
+                list(ps), signal_bucket, strides, precision
+            ),
+            ps,
+            buckets,
+            ("nary_log_convolution", tuple(strides), precision),
+        )
+        return logp[..., :signal_length]
+    dtype, floor = precision_policy(precision)[0], transform_floor(precision)
+
+    n = fft_length(signal_length)
+    period = lcm(*strides)
+    if period > 1:
+        # dilated spectra need an FFT length that is a multiple of every stride
+        n_dilated = period * fft_length(-(-signal_length // period))
+        if n_dilated <= 2 * n:
+            n = n_dilated
+        else:
+            ps = [dilate_logits(p, stride) for p, stride in zip(ps, strides)]
+            strides = [1 for _ in ps]
+
+    a = 0.0
+    spectrum = None
+    for p, stride in zip(ps, strides):
+        a_p = tf.math.reduce_max(p, axis=-1, keepdims=True)
+        p = tf.math.exp(tf.cast(p - a_p, dtype=dtype))
+        p = dilated_spectrum(p, stride, n)
+
+        spectrum = p if spectrum is None else spectrum * p
+        a = a + a_p
+
+    p = tf.signal.irfft(spectrum, fft_length=[n])[..., :signal_length]
+
+    logp = floored_log(p, floor)
+    logp = tf.cast(logp, dtype=tf.float32)
+    return logp + a
+
+
+def strided_log_convolution(p1, stride1, p2, stride2):
+    """
+    Implementation of summing the PMFs of two probabilistic integers whose values are spread out over every
+    stride-th integer, without materialising the values in between.
+
+    @param p1: The compact PMF of the first probabilistic integer
+    @param stride1: The (positive) stride of the first probabilistic integer
+    @param p2: The compact PMF of the second probabilistic integer
+    @param stride2: The (positive) stride of the second probabilistic integer
+
+    @return: The compact PMF of the sum and its stride
+    """
+    stride = math.gcd(stride1, stride2)
+    stride1, stride2 = stride1 // stride, stride2 // stride
+    signal_length = stride1 * (p1.shape[-1] - 1) + stride2 * (p2.shape[-1] - 1) + 1
+
+    if stride1 == 1 and stride2 == 1:
+        p = log_convolution(p1, p2, signal_length)
+    else:
+        p = nary_log_convolution([p1, p2], signal_length, [stride1, stride2])
+    return p, stride
+
+
+def tree_log_convolution(ps, strides=None):
+    """
+    Implementation of summing the PMFs of a list of probabilistic integers by convolving them pairwise in a
+    balanced tree, such that every convolution is only as large as its partial sum.
+
+    @param ps: The PMFs of the probabilistic integers
+    @param strides: The distance between consecutive values of every PMF, defaults to 1 for all of them
+
+    @return: The PMF of the sum of the probabilistic integers
+    """
+    if strides is None:
+        strides = [1 for _ in ps]
+
+    xs = list(zip(ps, strides))
+    while len(xs) > 1:
+        pairs = [xs[i : i + 2] for i in range(0, len(xs), 2)]
+        xs = [
+            strided_log_convolution(*pair[0], *pair[1]) if len(pair) == 2 else pair[0]
+            for pair in pairs
+        ]
+    return xs[0][0]
+
+
+def tree_cost(cardinalities, batch=1):
+    cost = 0.0
+    while len(cardinalities) > 1:
+        pairs = [cardinalities[i : i + 2] for i in range(0, len(cardinalities), 2)]
+        for pair in pairs:
+            if len(pair) == 2:
+                signal_length = pair[0] + pair[1] - 1
+                cost += min(
+                    direct_cost(pair[0], pair[1], batch),
+                    fft_cost(signal_length, batch=batch),
+                )
+        cardinalities = [sum(pair) - len(pair) + 1 for pair in pairs]
+    return cost
+
+
+def positive_stride(x):
+    """
+    The compact logits, lower bound and stride of a probabilistic integer, reflecting it if its stride is negative.
+    """
+    logits, lower, stride = x.compact_logits, x.offset, x.stride
+    if stride < 0:
+        logits = tf.reverse(logits, axis=[-1])
+        lower = lower + stride * (logits.shape[-1] - 1)
+        stride = -stride
+    return logits, lower, stride
+
+
+def truncate_summands(summands, low=None, high=None):
+    """
+    Restricts the summands of a sum to the values that can make the sum fall within [low, high], for instance
+    when only a comparison of the sum against a constant is needed. The truncated logits are not renormalised.
+
+    @param summands: The compact logits, lower bound and positive stride of every summand
+    @param low: The smallest value of the sum that is needed, None if unbounded
+    @param high: The largest value of the sum that is needed, None if unbounded
+
+    @return: The truncated summands, or None if no value of the sum lies within [low, high]
+    """
+    lowers = [lower for _, lower, _ in summands]
+    uppers = [lower + stride * (p.shape[-1] - 1) for p, lower, stride in summands]
+
+    truncated = []
+    for p, lower, stride in summands:
+        upper = lower + stride * (p.shape[-1] - 1)
+        start, end = 0, p.shape[-1] - 1
+        if low is not None:
+            start = max(start, -(-(low - sum(uppers) + upper - lower) // stride))
+        if high is not None:
+            end = min(end, (high - sum(lowers)) // stride)
+        if start > end:
+            return None
+        truncated.append((p[..., start : end + 1], lower + stride * start, stride))
+    return truncated
+
+
+def sumPInts(xs, method=None, window=None):
+    """
+    Implementation of summing a list of probabilistic integers.
+
+    @param xs: The probabilistic integers to sum
+    @param method: "fft", "tree" or None to pick the cheaper one
+    @param window: Optional (low, high) bounds of the values of the sum that are needed, the summands are
+    truncated to the values that can reach them and the returned PMF is not renormalised
+
+    @return: The compact PMF of the sum, its lower bound and its stride, or None if the window is unreachable
+    """
+    summands = [positive_stride(x) for x in xs]
+    if window is not None:
+        summands = truncate_summands(summands, *window)
+        if summands is None:
+            return None
+    ps, lowers, strides = zip(*summands)
+    stride = functools.reduce(math.gcd, strides)
+    strides = [s // stride for s in strides]
+    if len(ps) == 1:
+        return ps[0], lowers[0], stride
+
+    cardinalities = [s * (p.shape[-1] - 1) + 1 for p, s in zip(ps, strides)]
+    cardinality = sum(cardinalities) - len(xs) + 1
+
+    if method is None:
+        batch = batch_size(*ps)
+        nary = fft_cost(cardinality, n_transforms=len(xs) + 1, batch=batch)
+        method = "fft" if nary < tree_cost(cardinalities, batch) else "tree"
+
+    if method == "fft":
+        p = nary_log_convolution(ps, cardinality, strides)
+    elif method == "tree":
+        p = tree_log_convolution(ps, strides)
+    else:
+        raise NotImplementedError(f"Unknown summation method '{method}'")
+    return p, sum(lowers), stride
+
+
 def addPIntPInt(x1, x2):
-    lower = x1.lower + x2.lower
-    upper = x1.upper + x2.upper
-    cardinality = upper - lower + 1
-    p = log_convolution(x1.logits, x2.logits, cardinality)
-    return p, lower
+    p1, lower1, stride1 = positive_stride(x1)
+    p2, lower2, stride2 = positive_stride(x2)
+    p, stride = strided_log_convolution(p1, stride1, p2, stride2)
+    return p, lower1 + lower2, stride
+
+
+@functools.lru_cache(maxsize=256)
+def value_table(lower, stride, cardinality, order=1):
+    """
+    The powers 1, ..., order of the values lower + stride * i of a support, as a float64 array of shape
+    [order, cardinality]. Tables are cached per support, as they are shared by all statistics of the PInts on it.
+    """
+    values = lower + stride * np.arange(cardinality, dtype=np.float64)
+    return values[None, :] ** np.arange(1, order + 1, dtype=np.float64)[:, None]
 
 
-def multiplyPIntInt(x, c):
-    logits = x.logits
+@functools.lru_cache(maxsize=256)
+def log_value_table(lower, stride, cardinality):
+    """The logarithms of the values lower + stride * i of a support, cached per support."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.log(value_table(lower, stride, cardinality)[0] + EPSILON).astype(
+            np.float32
+        )
+
+
+def moments(x, order):
+    """
+    Implementation of the raw moments E[X^k] for k = 1, ..., order of a probabilistic integer in a single
+    pass over its compact PMF. The moments are computed in float64 about the offset of the PInt and shifted
+    back using the binomial theorem, which limits the cancellation for supports far from zero.
+    """
+    p = tf.math.exp(tf.cast(x.compact_logits, dtype=tf.float64))
+    table = value_table(0, x.stride, x.compact_logits.shape[-1], order)
+    shifted = tf.einsum("...c,kc->...k", p, table)
+    # the zeroth moment is the actual mass, as float32 normalised logits do not sum to exactly one
+    mass = tf.math.reduce_sum(p, axis=-1, keepdims=True)
+    shifted = tf.concat([mass, shifted], axis=-1)
+
+    raw = []
+    for k in range(1, order + 1):
+        raw.append(
+            sum(
+                math.comb(k, j) * float(x.offset) ** (k - j) * shifted[..., j]
+                for j in range(k + 1)
+            )
+        )
+    return tf.stack(raw, axis=-1)
+
+
+def quantilePInt(x, q):
+    """
+    Implementation of the smallest values v with P(X <= v) >= q of a probabilistic integer.
+    """
+    logits, lower, stride = positive_stride(x)
+    cdf = tf.math.exp(tf.math.cumulative_logsumexp(logits, axis=-1))
+
+    q = tf.constant(q, dtype=cdf.dtype)
+    qs = q if q.shape.rank else q[None]
+    qs = tf.broadcast_to(qs, cdf.shape[:-1] + qs.shape[-1:])
+    index = tf.searchsorted(cdf, qs, side="left")
+    index = tf.minimum(index, logits.shape[-1] - 1)
+
+    values = lower + stride * index
+    return values if q.shape.rank else values[..., 0]
+
+
+def log_spectrum(x, n, precision=None):
+    """
+    Real FFT of length n of the PMF of a probabilistic integer, shifted by its maximum before exponentiating.
+
+    @param x: The probabilistic integer, whose cardinality may not exceed n
+    @param n: The FFT length
+    @param precision: The precision policy, defaults to the active one
+
+    @return: The spectrum, normalised to a zero frequency (total mass) of one, and its log-scale
+    """
+    dtype, _, _ = precision_policy(precision)
+    p, _, stride = positive_stride(x)
+    if n % stride != 0:
+        p, stride = dilate_logits(p, stride), 1
+
+    a = tf.math.reduce_max(p, axis=-1, keepdims=True)
+    p = tf.math.exp(tf.cast(p - a, dtype=dtype))
+    return normalize_spectrum(dilated_spectrum(p, stride, n), a)
+
+
+def normalize_spectrum(spectrum, scale):
+    mass = tf.math.real(spectrum[..., :1])
+    spectrum = spectrum / tf.cast(mass, dtype=spectrum.dtype)
+    return spectrum, scale + tf.cast(tf.math.log(mass), dtype=tf.float32)
+
+
+def addSpectra(x1, x2):
+    return normalize_spectrum(x1.spectrum * x2.spectrum, x1.scale + x2.scale)
+
+
+def spectrum_log_pmf(spectrum, scale, n, signal_length, precision=None):
+    """
+    Inverse of log_spectrum, the PMF of the first signal_length values of a spectrum of FFT length n. The floor is
+    applied relative to the maximum of the PMF, as in the other convolution kernels.
+    """
+    floor = transform_floor(precision)
+    p = tf.signal.irfft(spectrum, fft_length=[n])[..., :signal_length]
+    a = tf.math.reduce_max(p, axis=-1, keepdims=True)
+
+    logp = floored_log(p / a, floor) + tf.math.log(a)
+    logp = tf.cast(logp, dtype=tf.float32)
+    return logp + scale
+
+
+def addPIntBatchPIntBatch(x1, x2):
+    """
+    Sum of two batches of probabilistic integers padded to a common length, the values of every example past its
+    own cardinality are masked out again after the convolution.
+    """
+    signal_length = x1.logits.shape[-1] + x2.logits.shape[-1] - 1
+    logits = log_convolution(x1.logits, x2.logits, signal_length)
+
+    cardinalities = x1.cardinalities + x2.cardinalities - 1
+    mask = tf.range(signal_length) < cardinalities[..., None]
+    logits = tf.where(mask, logits, -np.inf)
+    return logits, x1.lowers + x2.lowers, cardinalities
+
+
+def ltPIntPInt(x1, x2):
+    """
+    Implementation of the log-probability of X1 < X2 in linear time, as the dot product of the PMF of X1 with the
+    survival function P(X2 > v) of X2, which is a reversed cumulative logsumexp.
+    """
+    survival = tf.math.cumulative_logsumexp(x2.logits, axis=-1, reverse=True)
+
+    start, end, leading, trailing = survival_window(x1, x2)
+    padding = [[0, 0] for _ in range(len(survival.shape) - 1)]
+    survival = tf.pad(survival, padding + [[leading, 0]], constant_values=0.0)
+    survival = logit_pad(survival, 0, trailing)[..., start + leading : end + leading]
+    return tf.reduce_logsumexp(x1.logits + survival, axis=-1)
+
+
+def eqPIntPInt(x1, x2):
+    """
+    Implementation of the log-probability of X1 == X2 in time linear in the overlap of the two supports, as the
+    logsumexp of the sum of the logits over the values both probabilistic integers can take.
+    """
+    slice1, slice2 = overlap_slices(x1, x2)
+    return tf.reduce_logsumexp(x1.logits[..., slice1] + x2.logits[..., slice2], axis=-1)
+
+
+def dilate_logits(logits, c):
+    """
+    Spreads the logits of a probabilistic integer out over every c-th value, filling the values in between with -inf.
+    """
+    if c == 1:
+        return logits
     logits = E.rearrange(logits, "... card -> ... card 1")
 
     fillers = tf.ones_like(logits)
@@ -102,17 +1164,14 @@ def multiplyPIntInt(x, c):
 
     logits = tf.concat([logits, fillers], axis=-1)
     logits = E.rearrange(logits, "... card c -> ... (card c)")[..., : -c + 1]
-
-    return logits, x.lower * c
+    return logits
 
 
-def integer_fill_logits(x, c):
-    logits = x.logits
-    lower = x.lower
-    upper = x.upper
+def integer_fill_logits(logits, lower, c):
+    upper = lower + logits.shape[-1] - 1
 
-    lower_filler = (x.lower // c) * c
-    upper_filler = ((x.upper + c) // c) * c - 1
+    lower_filler = (lower // c) * c
+    upper_filler = ((upper + c) // c) * c - 1
 
     lower_filler = tf.ones(logits.shape[:-1] + (lower - lower_filler)) * (-np.inf)
     upper_filler = tf.ones(logits.shape[:-1] + (upper_filler - upper)) * (-np.inf)
@@ -120,18 +1179,203 @@ def integer_fill_logits(x, c):
     return tf.concat([lower_filler, logits, upper_filler], axis=-1)
 
 
+def integer_reduce_logits(x, c, axis):
+    """
+    Sums the probabilities of the values of x with the same quotient (axis=-1) or remainder (axis=-2) by c.
+    """
+
+    def reduce(logits):
+        logits = integer_fill_logits(logits, x.lower, c)
+        logits = E.rearrange(logits, "... (card c) -> ... card c", c=c)
+        return tf.reduce_logsumexp(logits, axis=axis)
+
+    if sharding((x.logits,)):
+        return Sharding.active.run(reduce, (x.logits,))
+    return reduce(x.logits)
+
+
 def floordividePIntInt(x, c):
-    logits = integer_fill_logits(x, c)
-    logits = E.rearrange(logits, "... (card c) -> ... card c", c=c)
-    logits = tf.reduce_logsumexp(logits, axis=-1)
-    return logits, x.lower // c
+    return integer_reduce_logits(x, c, -1), x.lower // c
 
 
 def modPIntInt(x, c):
-    logits = integer_fill_logits(x, c)
-    logits = E.rearrange(logits, "... (card c) -> ... card c", c=c)
-    logits = tf.reduce_logsumexp(logits, axis=-2)
-    return logits, 0
+    return integer_reduce_logits(x, c, -2), 0
+
+
+def multiplyPIntPInt(x1, x2):
+    p1, p2 = x1.compact_logits, x2.compact_logits
+    card1, card2 = p1.shape[-1], p2.shape[-1]
+    domain1 = (x1.offset, x1.stride, card1)
+    domain2 = (x2.offset, x2.stride, card2)
+    lower, stride, cardinality = product_support(*domain1, *domain2)
+
+    a1 = tf.math.reduce_max(p1, axis=-1, keepdims=True)
+    a2 = tf.math.reduce_max(p2, axis=-1, keepdims=True)
+    p1 = tf.math.exp(p1 - a1)
+    p2 = tf.math.exp(p2 - a2)
+
+    batch_shape = tf.broadcast_dynamic_shape(tf.shape(p1)[:-1], tf.shape(p2)[:-1])
+    p1 = tf.broadcast_to(p1, tf.concat([batch_shape, [card1]], axis=0))
+    p2 = tf.broadcast_to(p2, tf.concat([batch_shape, [card2]], axis=0))
+
+    def segment_sum(rows, segments):
+        pairs = p1[..., rows[0] : rows[1], None] * p2[..., None, :]
+        pairs = E.rearrange(pairs, "... card1 card2 -> (card1 card2) ...")
+        return tf.math.unsorted_segment_sum(pairs, segments, cardinality)
+
+    if card1 * card2 <= PAIR_BLOCK_LENGTH:
+        segments, *_ = product_table(*domain1, *domain2)
+        p = segment_sum((0, card1), segments)
+    else:
+        # only a block of rows of the outer product is alive at any time
+        block = max(1, PAIR_BLOCK_LENGTH // card2)
+        p = 0.0
+        for start in range(0, card1, block):
+            rows = (start, min(start + block, card1))
+            segments = product_segments(
+                x1.offset, x1.stride, rows, *domain2, lower, stride
+            )
+            p = p + segment_sum(rows, segments)
+
+    # unlike a convolution, the scatter has no round-off, so unreachable products keep a zero probability
+    p = E.rearrange(p, "card ... -> ... card")
+    return safe_log(p) + a1 + a2, lower, stride
+
+
+def piecewiseAffinePInt(x, segments):
+    """
+    Implementation of applying a different affine map to every segment of the support of a probabilistic integer,
+    for all segments at once with a single scatter of the PMF. Values outside of the segments are dropped, so the
+    result is weighted by the probability of the segments.
+
+    @param x: The probabilistic integer
+    @param segments: The (start, end, a, b) tuples mapping the values v in [start, end) to a * v + b
+
+    @return: The unnormalised logits of the result and its lower bound
+    """
+    # values outside of the segments are summed into a last, discarded bin
+    segment_ids, lower, cardinality = affine_targets(x.lower, x.upper, segments)
+
+    a = tf.math.reduce_max(x.logits, axis=-1, keepdims=True)
+    p = tf.math.exp(x.logits - a)
+    p = E.rearrange(p, "... card -> card ...")
+    p = tf.math.unsorted_segment_sum(p, segment_ids, cardinality + 1)[:cardinality]
+    p = E.rearrange(p, "card ... -> ... card")
+
+    return safe_log(p) + a, lower
+
+
+def mixture_logits(logits):
+    """
+    Log-sum-exp over the first axis whose gradients remain finite for the values that are -inf in all of the
+    summands, unlike tf.reduce_logsumexp.
+    """
+    a = tf.stop_gradient(tf.math.reduce_max(logits, axis=0))
+    a = tf.where(tf.math.is_finite(a), a, 0.0)
+    return safe_log(tf.math.reduce_sum(tf.math.exp(logits - a), axis=0)) + a
+
+
+def safe_log(p):
+    """The logarithm of non-negative values with finite gradients for the zero values, which map to -inf."""
+    return tf.where(p > 0.0, tf.math.log(tf.where(p > 0.0, p, 1.0)), -np.inf)
+
+
+def divmodPIntInt(x, c):
+    # the logits of the quotient and of the remainder are concatenated, such that they are sharded together
+    def reduce(logits):
+        logits = integer_fill_logits(logits, x.lower, c)
+        logits = E.rearrange(logits, "... (card c) -> ... card c", c=c)
+        quotient = tf.reduce_logsumexp(logits, axis=-1)
+        remainder = tf.reduce_logsumexp(logits, axis=-2)
+        return tf.concat([quotient, remainder], axis=-1)
+
+    if sharding((x.logits,)):
+        logits = Sharding.active.run(reduce, (x.logits,))
+    else:
+        logits = reduce(x.logits)
+    return (logits[..., :-c], x.lower // c), (logits[..., -c:], 0)
+
+
+def cyclic_log_convolution(p1, p2):
+    """
+    Implementation of summing the PMF of two probabilistic integers modulo n, with n the cardinality of both.
+    Dispatches between a direct and an FFT cyclic convolution using the cost model in CONVOLUTION_COSTS.
+
+    @param p1: The PMF of the first probabilistic integer over the residues 0, ..., n - 1
+    @param p2: The PMF of the second probabilistic integer over the residues 0, ..., n - 1
+
+    @return: The PMF of the sum modulo n
+    """
+    n = p1.shape[-1]
+    batch = batch_size(p1, p2)
+    if direct_cost(n, n, batch) < fft_cost(n, batch=batch):
+        return direct_cyclic_log_convolution(p1, p2)
+    return fft_cyclic_log_convolution(p1, p2)
+
+
+def direct_cyclic_log_convolution(p1, p2):
+    n = p1.shape[-1]
+    _, floor, _ = precision_policy()
+    a1 = tf.math.reduce_max(p1, axis=-1, keepdims=True)
+    a2 = tf.math.reduce_max(p2, axis=-1, keepdims=True)
+
+    p1 = tf.math.exp(p1 - a1)
+    p2 = tf.math.exp(p2 - a2)
+
+    # circulant[k, j] = p2[(k - j) mod n]
+    circulant = (np.arange(n)[:, None] - np.arange(n)[None, :]) % n
+    p = tf.linalg.matvec(tf.gather(p2, circulant, axis=-1), p1)
+
+    logp = floored_log(p, floor)
+    return logp + a1 + a2
+
+
+def fft_cyclic_log_convolution(p1, p2):
+    n = p1.shape[-1]
+    dtype, floor = precision_policy()[0], transform_floor()
+
+    a1 = tf.math.reduce_max(p1, axis=-1, keepdims=True)
+    a2 = tf.math.reduce_max(p2, axis=-1, keepdims=True)
+
+    p1 = tf.math.exp(tf.cast(p1 - a1, dtype=dtype))
+    p2 = tf.math.exp(tf.cast(p2 - a2, dtype=dtype))
+
+    # an FFT of exactly length n wraps the convolution around modulo n
+    p1 = tf.signal.rfft(p1, fft_length=[n])
+    p2 = tf.signal.rfft(p2, fft_length=[n])
+    p = tf.signal.irfft(p1 * p2, fft_length=[n])
+
+    logp = floored_log(p, floor)
+    logp = tf.cast(logp, dtype=tf.float32)
+    return logp + a1 + a2
+
+
+def residue_map(logits, c):
+    """
+    Log-PMF of c * x mod n given the log-PMF of x over the residues 0, ..., n - 1, in linear time in n.
+    """
+    n = logits.shape[-1]
+    if math.gcd(c, n) == 1:
+        # multiplying by a unit permutes the residues, r = c * x has x = c^-1 * r
+        return tf.gather(logits, (pow(c, -1, n) * np.arange(n)) % n, axis=-1)
+
+    # otherwise gcd(c, n) residues map onto every multiple of gcd(c, n), which are summed by a scatter
+    a = tf.math.reduce_max(logits, axis=-1, keepdims=True)
+    p = tf.math.exp(logits - a)
+    p = E.rearrange(p, "... card -> card ...")
+    p = tf.math.unsorted_segment_sum(p, (c * np.arange(n)) % n, n)
+    p = E.rearrange(p, "card ... -> ... card")
+    return safe_log(p) + a
+
+
+def addPIntModPIntMod(x1, x2):
+    if x1.modulus != x2.modulus:
+        raise ValueError("Cannot add integers modulo different moduli.")
+    return cyclic_log_convolution(x1.logits, x2.logits)
+
+
+def multiplyPIntModInt(x, c):
+    return residue_map(x.logits, c)
 
 
 def sumreduceKrat(krat):
@@ -139,5 +1383,156 @@ def sumreduceKrat(krat):
     upper = krat.upper * krat.n_rvs
 
     cardinality = upper - lower + 1
+    if krat.logits.shape[-1] == 2:
+        return poisson_binomial_log_pmf(krat.logits), lower
     p = multi_log_convolution(krat.logits, cardinality)
     return p, lower
+
+
+def point_masses(shape):
+    """Logits of the PMFs of the constant zero, of the given shape."""
+    return logit_pad(tf.zeros(shape[:-1] + (1,)), 0, shape[-1] - 1)
+
+
+def poisson_binomial_log_pmf(p):
+    """
+    Implementation of summing the PMF of a Krat of Bernoulli (two-outcome) random variables, whose sum follows a
+    Poisson-binomial distribution. Groups of up to BERNOULLI_GROUP_LENGTH random variables are summed by the
+    dynamic program of poisson_binomial_dp, batched across the groups, and the sums of the groups are convolved
+    pairwise in a balanced tree. Unlike the FFT of multi_log_convolution, the sum of a single group neither adds
+    round-off errors relative to the largest probability, nor a floor to the probabilities above the smallest
+    normal float.
+
+    @param p: The PMF of the Bernoulli random variables in a Krat, of shape [..., n_rvs, 2]
+
+    @return: The PMF of the sum of the random variables, of shape [..., n_rvs + 1]
+    """
+    if sharding((p,), event_rank=2):
+        return Sharding.active.run(poisson_binomial_log_pmf, (p,), 2)
+    if compiling():
+        return Compilation.active.run(
+            poisson_binomial_log_pmf, (p,), [2], ("poisson_binomial_log_pmf",)
+        )
+
+    n_rvs = p.shape[-2]
+    if n_rvs <= BERNOULLI_GROUP_LENGTH:
+        return poisson_binomial_dp(p)
+
+    n_groups = -(-n_rvs // BERNOULLI_GROUP_LENGTH)
+    padding = n_groups * BERNOULLI_GROUP_LENGTH - n_rvs
+    p = tf.concat([p, point_masses(p.shape[:-2] + (padding, 2))], axis=-2)
+    p = E.rearrange(p, "... (g n) c -> ... g n c", g=n_groups)
+    p = poisson_binomial_dp(p)
+
+    while p.shape[-2] > 1:
+        if p.shape[-2] % 2:
+            p = tf.concat([p, point_masses(p.shape[:-2] + (1, p.shape[-1]))], axis=-2)
+        p = log_convolution(p[..., ::2, :], p[..., 1::2, :], 2 * p.shape[-1] - 1)
+    return p[..., 0, : n_rvs + 1]
+
+
+def poisson_binomial_dp(p):
+    """
+    The dynamic program over the Bernoulli random variables of p, of shape [..., n_rvs, 2]. After adding the i-th
+    random variable, the PMF of the partial sum has i + 1 values, and the probability of the count k is that of
+    k - 1 times the success plus that of k times the failure of the i-th random variable. The probabilities of
+    every random variable are divided by the larger of the two, whose logarithms are added back at the end, such
+    that the program only multiplies and adds non-negative values, which keeps the relative error of every
+    probability small down to the smallest normal float.
+    """
+    a = tf.stop_gradient(tf.math.reduce_max(p, axis=-1, keepdims=True))
+    a = tf.where(tf.math.is_finite(a), a, 0.0)
+    q = tf.unstack(tf.math.exp(p - a), axis=-2)
+
+    pmf = q[0]
+    for qi in q[1:]:
+        failure, success = qi[..., :1], qi[..., 1:]
+        zeros = tf.zeros_like(failure)
+        pmf = tf.concat([pmf * failure, zeros], axis=-1) + tf.concat(
+            [zeros, pmf * success], axis=-1
+        )
+    return safe_log(pmf) + tf.math.reduce_sum(a, axis=-2)
+
+
+def ragged_log_softmax(values, row_splits):
+    """
+    Normalises every row of a ragged tensor of logits, stored as flat values along the last axis.
+
+    @param values: The concatenated logits of all rows
+    @param row_splits: The offsets of the rows in values, starting at 0 and ending at the number of values
+
+    @return: The normalised logits of all rows
+    """
+    cardinalities = np.diff(row_splits)
+    segment_ids = np.repeat(np.arange(len(cardinalities)), cardinalities)
+
+    logits = E.rearrange(values, "... card -> card ...")
+    a = tf.stop_gradient(tf.math.segment_max(logits, segment_ids))
+    a = tf.where(tf.math.is_finite(a), a, tf.zeros_like(a))
+    a = tf.gather(a, segment_ids)
+    norm = tf.math.segment_sum(tf.math.exp(logits - a), segment_ids)
+    norm = tf.gather(tf.math.log(norm), segment_ids) + a
+    return E.rearrange(logits - norm, "card ... -> ... card")
+
+
+def sumreduceRaggedKrat(krat):
+    """
+    Implementation of summing the random variables of a RaggedKrat. Every row is transformed at its own
+    cardinality and multiplied into the spectrum of the sum at the final FFT length, as in nary_log_convolution,
+    or convolved pairwise in a balanced tree if that is cheaper, so rows are never padded to the largest one.
+    """
+    lower = sum(krat.lowers)
+    upper = sum(krat.uppers)
+
+    cardinality = upper - lower + 1
+    ps = [
+        krat.values[..., start:end]
+        for start, end in zip(krat.row_splits[:-1], krat.row_splits[1:])
+    ]
+    if len(ps) == 1:
+        return ps[0], lower
+
+    batch = batch_size(*ps)
+    nary = fft_cost(cardinality, n_transforms=len(ps) + 1, batch=batch)
+    if nary < tree_cost(krat.cardinalities, batch):
+        p = nary_log_convolution(ps, cardinality)
+    else:
+        p = tree_log_convolution(ps)
+    return p, lower
+
+
+def prune_logits(logits, lower, log_threshold=None, top_k=None):
+    """
+    Trims the leading and trailing entries of a PMF whose log-probability lies below a threshold for every
+    element in the batch, optionally followed by restricting the support to the most probable window of top_k
+    consecutive values. Only the ends of the support are removed, so the result is again a contiguous PMF.
+
+    @param logits: The (normalised) log-PMF of a probabilistic integer
+    @param lower: The lower bound of the probabilistic integer
+    @param log_threshold: Entries with a log-probability below this value are considered negligible
+    @param top_k: The maximal number of consecutive values to keep
+
+    @return: The trimmed log-PMF, its new lower bound and the log-mass that was discarded per batch element
+    """
+    batch_axes = list(range(len(logits.shape) - 1))
+    cardinality = logits.shape[-1]
+
+    start, end = 0, cardinality
+    if log_threshold is not None:
+        support = tf.math.reduce_max(logits, axis=batch_axes)
+        keep = tf.where(support >= log_threshold)[:, 0].numpy()
+        if keep.size == 0:
+            keep = np.array([tf.math.argmax(support).numpy()])
+        start, end = int(keep[0]), int(keep[-1]) + 1
+    if top_k is not None and end - start > top_k:
+        mass = tf.math.reduce_logsumexp(logits[..., start:end], axis=batch_axes)
+        mass = tf.math.exp(tf.cast(mass, dtype=tf.float64))
+        mass = tf.concat(
+            [tf.zeros([1], dtype=tf.float64), tf.math.cumsum(mass)], axis=-1
+        )
+        window = tf.math.argmax(mass[top_k:] - mass[:-top_k]).numpy()
+        start, end = start + int(window), start + int(window) + top_k
+
+    discarded = tf.concat([logits[..., :start], logits[..., end:]], axis=-1)
+    discarded = tf.math.reduce_logsumexp(discarded, axis=-1)
+    return logits[..., start:end], lower + start, discarded
@@ -0,0 +1,152 @@
+import operator
+import collections
+import numpy as np
+import tensorflow as tf
+
+from .pint import PInt, PIverson
+from .arithmetics import addPIntBatchPIntBatch, bucket_length, logit_pad
+
+
+class PIntBatch:
+    """
+    A batch of independent probabilistic integers that each have their own lower bound and cardinality. The logits
+    of every example are padded with -inf to a common length, the lower bounds and cardinalities are integer tensors
+    with one entry per example.
+    """
+
+    def __init__(self, logits, lowers, cardinalities=None):
+        self.logits = tf.nn.log_softmax(logits, axis=-1)
+        self.lowers = tf.convert_to_tensor(lowers, dtype=tf.int32)
+        if cardinalities is None:
+            cardinalities = tf.fill(tf.shape(self.lowers), logits.shape[-1])
+        self.cardinalities = tf.convert_to_tensor(cardinalities, dtype=tf.int32)
+
+    @classmethod
+    def from_pints(cls, pints, length=None):
+        """
+        Stacks unbatched probabilistic integers into a batch padded to the given length.
+        """
+        if length is None:
+            length = max(x.cardinality for x in pints)
+        logits = [logit_pad(x.logits, 0, length - x.cardinality) for x in pints]
+        return cls(
+            tf.stack(logits),
+            [x.lower for x in pints],
+            [x.cardinality for x in pints],
+        )
+
+    def to_pints(self):
+        lowers = self.lowers.numpy()
+        cardinalities = self.cardinalities.numpy()
+        return [
+            PInt(logits[:cardinality], int(lower))
+            for logits, lower, cardinality in zip(
+                tf.unstack(self.logits), lowers, cardinalities
+            )
+        ]
+
+    @property
+    def values(self):
+        return self.lowers[..., None] + tf.range(self.logits.shape[-1])
+
+    def __add__(self, other):
+        if isinstance(other, PIntBatch):
+            logits, lowers, cardinalities = addPIntBatchPIntBatch(self, other)
+            return PIntBatch(logits, lowers, cardinalities)
+        elif isinstance(other, (int, tf.Tensor)):
+            return PIntBatch(self.logits, self.lowers + other, self.cardinalities)
+        else:
+            raise NotImplementedError()
+
+    def __neg__(self):
+        logits = tf.reverse_sequence(
+            self.logits, self.cardinalities, seq_axis=1, batch_axis=0
+        )
+        lowers = -(self.lowers + self.cardinalities - 1)
+        return PIntBatch(logits, lowers, self.cardinalities)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def compare(self, other, predicate, negated=False):
+        """The PIverson of the values of every example for which predicate(value, other) holds."""
+        if isinstance(other, PIntBatch):
+            return (self - other).compare(0, predicate, negated)
+        elif isinstance(other, (int, tf.Tensor)):
+            other = tf.convert_to_tensor(other, dtype=tf.int32)[..., None]
+        else:
+            raise NotImplementedError()
+        holds = predicate(self.values, other)
+        return PIverson(tf.where(holds, self.logits, -np.inf), 0, negated=negated)
+
+    def __lt__(self, other):
+        return self.compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self.compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self.compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self.compare(other, operator.ge)
+
+    def __eq__(self, other):
+        return self.compare(other, operator.eq)
+
+    def __ne__(self, other):
+        return self.compare(other, operator.eq, negated=True)
+
+    __hash__ = object.__hash__
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(batch:{self.logits.shape[0]}, length:{self.logits.shape[-1]})"
+
+
+def execute(function, queries, min_bucket=16):
+    """
+    Evaluates a program on many independent queries with few batched operations instead of one per query. Queries
+    are grouped by the padded length (the next power of two) of their largest probabilistic integer, every group is
+    evaluated at once on PIntBatch arguments with per-example lower bounds, and the results are scattered back.
+
+    @param function: The program, which maps PIntBatch (and integer tensor) arguments to a PIntBatch, a PIverson
+    or a tensor with one entry per example
+    @param queries: The arguments of every query, unbatched PInts or integers
+    @param min_bucket: The smallest padded length
+
+    @return: The result of every query, in the order of the queries
+    """
+    groups = collections.defaultdict(list)
+    for i, query in enumerate(queries):
+        cardinality = max([x.cardinality for x in query if isinstance(x, PInt)] + [1])
+        groups[bucket_length(cardinality, min_bucket)].append(i)
+
+    results = [None for _ in queries]
+    for length, indices in groups.items():
+        args = []
+        for arg in zip(*[queries[i] for i in indices]):
+            if isinstance(arg[0], PInt):
+                args.append(PIntBatch.from_pints(arg, length))
+            else:
+                args.append(tf.constant(arg, dtype=tf.int32))
+
+        output = function(*args)
+        if isinstance(output, PIntBatch):
+            outputs = output.to_pints()
+        elif isinstance(output, PIverson):
+            outputs = [
+                PIverson(logits, output.lower, negated=output.negated)
+                for logits in tf.unstack(output.logits)
+            ]
+        else:
+            outputs = tf.unstack(output)
+
+        for i, result in zip(indices, outputs):
+            results[i] = result
+    return results
@@ -1,9 +1,22 @@
 import math
+import functools
 import numpy as np
 import tensorflow as tf
 
-from .pint import PInt, PIverson
-from .arithmetics import EPSILON, logit_pad
+from .pint import PInt, PIverson, SpectralPInt
+from .lazy import LazyPInt, LazyIverson
+from .batch import PIntBatch
+from .arithmetics import (
+    EPSILON,
+    logit_pad,
+    sumPInts,
+    Compilation,
+    compiling,
+    log_value_table,
+    piecewiseAffinePInt,
+    mixture_logits,
+)
+from .supports import piecewise_segments, mixture_paddings
 
 
 def log_expectation(x):
@@ -14,14 +27,38 @@ def log_expectation(x):
 
     @return: The log-expectation of the probabilistic integer comparison
     """
-    if isinstance(x, bool) and x == False:
-        return -np.inf
+    if isinstance(x, (LazyPInt, LazyIverson)):
+        return log_expectation(x.evaluate())
+    elif isinstance(x, SpectralPInt):
+        return log_expectation(x.to_pint())
+    elif isinstance(x, bool):
+        return 0.0 if x else -np.inf
+    elif isinstance(x, PInt) and compiling():
+        bucket = Compilation.active.bucket(x.compact_logits.shape[-1])
+        return Compilation.active.run(
+            lambda logits, offset, stride: pint_log_expectation(
+                logits, log_values(offset, stride, bucket)
+            ),
+            (x.compact_logits,),
+            [bucket],
+            "pint_log_expectation",
+            tensors=(
+                tf.constant(x.offset, dtype=tf.float32),
+                tf.constant(x.stride, dtype=tf.float32),
+            ),
+        )
     elif isinstance(x, PInt):
-        values = tf.math.log(tf.range(x.lower, x.upper + 1, dtype=tf.float32) + EPSILON)
-        expectation = values + x.logits
-        return tf.reduce_logsumexp(expectation, axis=-1)
+        values = log_value_table(x.offset, x.stride, x.compact_logits.shape[-1])
+        return pint_log_expectation(x.compact_logits, values)
+    elif isinstance(x, PIntBatch):
+        offsets = tf.cast(x.lowers[..., None], dtype=tf.float32)
+        values = log_values(offsets, 1.0, x.logits.shape[-1])
+        return pint_log_expectation(x.logits, values)
     elif isinstance(x, PIverson):
-        expectation = tf.reduce_logsumexp(x.logits, axis=-1)
+        if x.log_probability is not None:
+            expectation = x.log_probability
+        else:
+            expectation = tf.reduce_logsumexp(x.logits, axis=-1)
         if x.negated:
             expectation = log1mexp(expectation)
         return expectation
@@ -29,6 +66,16 @@ def log_expectation(x):
         raise NotImplementedError()
 
 
+def log_values(offset, stride, cardinality):
+    values = tf.range(cardinality, dtype=tf.float32)
+    return tf.math.log(offset + stride * values + EPSILON)
+
+
+def pint_log_expectation(logits, log_values):
+    expectation = tf.where(logits > -np.inf, log_values + logits, -np.inf)
+    return tf.reduce_logsumexp(expectation, axis=-1)
+
+
 def log1mexp(x):
     """
     Numerically accurate evaluation of log(1 - exp(x)) for x < 0.
@@ -39,8 +86,8 @@ def log1mexp(x):
     mask = -math.log(2) < x  # x < 0
     return tf.where(
         mask,
-        tf.math.log(tf.math.expm1(-x)),
-        tf.math.log1p(tf.math.exp(-x)),
+        tf.math.log(-tf.math.expm1(x)),
+        tf.math.log1p(-tf.math.exp(x)),
     )
 
 
@@ -56,36 +103,123 @@ def ifthenelse(variable, lt, tbranch, fbranch):
 
     @return: The wegihted average of the two branches
     """
-    if variable.lower < lt and variable.upper >= lt:
-        t_logits = variable.logits[..., : lt - variable.lower]
-        f_logits = variable.logits[..., lt - variable.lower :]
+    return piecewise(variable, [lt], [tbranch, fbranch])
 
-        t_logprob = log_expectation(variable < lt)
-        f_logprob = log1mexp(t_logprob)
 
-        t_var = PInt(t_logits, variable.lower)
-        f_var = PInt(f_logits, lt)
+def piecewise(variable, thresholds, branches):
+    """
+    Implementation of a probabilistic piecewise function (switch statement). The support of the variable is
+    partitioned once, every branch is evaluated on its segment and all outputs are merged with a single padded
+    logsumexp. Constant and affine branches are evaluated together by a single scatter of the PMF.
 
-        t_var = tbranch(t_var)
-        f_var = fbranch(f_var)
+    @param variable: The probabilistic integer to branch on
+    @param thresholds: The increasing thresholds t_1 < ... < t_k separating the segments
+    @param branches: The k + 1 branches, the i-th one applies to the values in [t_i, t_i+1) with t_0 = -inf and
+    t_k+1 = inf. A branch is a function of a probabilistic integer, an integer constant or a tuple (a, b) for the
+    affine map x -> a * x + b
 
-        lower = min(t_var.lower, f_var.lower)
-        upper = max(t_var.upper, f_var.upper)
+    @return: The weighted average of the branches
+    """
+    affine, functions = piecewise_segments(
+        variable.lower, variable.upper, thresholds, branches
+    )
+    if not affine and len(functions) == 1:
+        return functions[0][2](variable)
+
+    outputs = []
+    for start, end, branch in functions:
+        logits = variable.logits[..., start - variable.lower : end - variable.lower]
+        logprob = tf.reduce_logsumexp(logits, axis=-1, keepdims=True)
+        x = branch(PInt(logits, start))
+        if isinstance(x, int):
+            x = PInt(tf.zeros_like(logprob), x)
+        outputs.append((x.logits + logprob, x.lower))
+
+    if affine:
+        outputs.append(piecewiseAffinePInt(variable, affine))
+
+    lower, paddings = mixture_paddings(outputs)
+    batch_shape = functools.reduce(
+        tf.broadcast_static_shape, [logits.shape[:-1] for logits, _ in outputs]
+    )
+    logits = [
+        logit_pad(logits, *padding) for (logits, _), padding in zip(outputs, paddings)
+    ]
+    logits = [tf.broadcast_to(l, batch_shape + l.shape[-1:]) for l in logits]
+    logits = mixture_logits(tf.stack(logits))
+    return PInt(logits, lower)
 
-        t_logits = t_var.logits + t_logprob
-        f_logits = f_var.logits + f_logprob
 
-        t_logits = logit_pad(t_logits, t_var.lower - lower, upper - t_var.upper)
-        f_logits = logit_pad(f_logits, f_var.lower - lower, upper - f_var.upper)
+def sum(xs, method=None):
+    """
+    Implementation of summing a list of probabilistic integers (and integer constants) in a single pass,
+    instead of folding the list with pairwise additions.
 
-        logits = tf.experimental.numpy.logaddexp(t_logits, f_logits)
+    @param xs: The probabilistic integers to sum, which may have different bounds and cardinalities
+    @param method: "fft" multiplies all spectra at the final FFT length, "tree" convolves pairwise in a balanced
+    tree, which keeps intermediate buffers smaller. By default the cheaper of the two is picked.
 
-        variable = PInt(logits, lower)
+    @return: The probabilistic integer representing the sum
+    """
+    constant = 0
+    pints = []
+    for x in xs:
+        if isinstance(x, PInt):
+            pints.append(x)
+        elif isinstance(x, int):
+            constant += x
+        else:
+            raise NotImplementedError()
+
+    if not pints:
+        return constant
+    elif len(pints) == 1:
+        return pints[0] + constant
+    logits, lower, stride = sumPInts(pints, method)
+    return PInt(logits, lower + constant, stride=stride)
+
+
+def checkpoint(function):
+    """
+    Wraps a function of probabilistic integers, such as a segment of a long chain of operations, with
+    tf.recompute_grad. The tape only keeps the inputs and outputs of the function, and the intermediates of its
+    forward pass are recomputed from its inputs during the backward pass. Chaining checkpointed segments of k
+    operations hence keeps one segment boundary per k operations plus the intermediates of a single segment,
+    trading one more forward pass for memory.
 
-        return variable
-    elif variable.lower >= lt:
-        return tbranch(variable)
-    elif variable.upper < lt:
-        return fbranch(variable)
-    else:
-        raise NotImplementedError()
+    @param function: A function whose arguments and return value are probabilistic integers, Python values or
+    (nested) lists and tuples of them. Python values of the return value must not depend on the values of
+    tensors, and the function must not create variables
+
+    @return: The checkpointed function
+    """
+
+    @functools.wraps(function)
+    def checkpointed(*args):
+        leaves = tf.nest.flatten(args)
+        positions = [i for i, leaf in enumerate(leaves) if isinstance(leaf, PInt)]
+        outputs = {}
+
+        def segment(*logits):
+            inputs = list(leaves)
+            for i, x in zip(positions, logits):
+                inputs[i] = PInt(x, leaves[i].offset, stride=leaves[i].stride)
+            result = function(*tf.nest.pack_sequence_as(args, inputs))
+            outputs["result"] = result
+            return [
+                x.compact_logits for x in tf.nest.flatten(result) if isinstance(x, PInt)
+            ]
+
+        logits = iter(
+            tf.recompute_grad(segment)(*[leaves[i].compact_logits for i in positions])
+        )
+        return tf.nest.map_structure(
+            lambda x: (
+                PInt(next(logits), x.offset, stride=x.stride)
+                if isinstance(x, PInt)
+                else x
+            ),
+            outputs["result"],
+        )
+
+    return checkpointed
@@ -0,0 +1,250 @@
+import operator
+import collections
+
+from .pint import PInt, PIverson
+from .arithmetics import sumPInts
+
+
+class LazyPInt:
+    """
+    A node of an expression graph over probabilistic integers. Operations on lazy nodes only record the
+    expression, which is optimised and executed by `evaluate`:
+
+    - chains of additions, negations and multiplications by constants are fused into a single n-ary sum,
+    - comparisons are pushed down into those sums, such that only the support that can satisfy them is convolved,
+    - intermediate results are only materialised where an operation needs them and are dropped after their last use.
+
+    Every operand of an operation is an independent random variable, exactly as in eager mode: x + x is the sum of
+    two independent copies of x and not 2 * x.
+    """
+
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+
+    def evaluate(self):
+        return evaluate(self)[0]
+
+    def __add__(self, other):
+        return LazyPInt("add", (self, lazy(other)))
+
+    def __neg__(self):
+        return LazyPInt("scale", (self, -1))
+
+    def __sub__(self, other):
+        return self + (-lazy(other))
+
+    def __mul__(self, other):
+        other = lazy(other)
+        if isinstance(other, int):
+            return LazyPInt("scale", (self, other))
+        return LazyPInt("apply", (operator.mul, self, other))
+
+    def __floordiv__(self, other):
+        if isinstance(other, int):
+            return LazyPInt("apply", (operator.floordiv, self, other))
+        else:
+            raise NotImplementedError()
+
+    def __mod__(self, other):
+        if isinstance(other, int):
+            return LazyPInt("apply", (operator.mod, self, other))
+        else:
+            raise NotImplementedError()
+
+    def __radd__(self, other):
+        return self + other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __lt__(self, other):
+        return LazyIverson(self - other, "<")
+
+    def __le__(self, other):
+        return LazyIverson(self - other, "<=")
+
+    def __gt__(self, other):
+        return LazyIverson(self - other, ">")
+
+    def __ge__(self, other):
+        return LazyIverson(self - other, ">=")
+
+    def __eq__(self, other):
+        return LazyIverson(self - other, "==")
+
+    def __ne__(self, other):
+        return LazyIverson(self - other, "!=")
+
+    __hash__ = object.__hash__
+
+
+class LazyIverson:
+    """The comparison of a lazy expression against zero, evaluated into a PIverson."""
+
+    def __init__(self, x, op):
+        self.x = x
+        self.op = op
+
+    def evaluate(self):
+        return evaluate(self)[0]
+
+
+def lazy(x):
+    """
+    Wraps a probabilistic integer into a leaf of an expression graph, integers are returned unchanged.
+    """
+    if isinstance(x, (LazyPInt, int)):
+        return x
+    elif isinstance(x, PInt):
+        return LazyPInt("leaf", (x,))
+    else:
+        raise NotImplementedError()
+
+
+def linearize(node):
+    """
+    Fuses the additions, negations and multiplications by constants below a node.
+
+    @param node: The lazy expression
+    @return: The (atom, coefficient) terms and the integer constant of the node as a linear combination of
+    atoms, which are leaves and nodes of other operations
+    """
+    terms, constant = [], 0
+    stack = [(node, 1)]
+    while stack:
+        node, coefficient = stack.pop()
+        if isinstance(node, int):
+            constant += coefficient * node
+        elif node.op == "add":
+            stack.extend((arg, coefficient) for arg in reversed(node.args))
+        elif node.op == "scale":
+            stack.append((node.args[0], coefficient * node.args[1]))
+        elif coefficient != 0:
+            terms.append((node, coefficient))
+    return terms, constant
+
+
+def dependencies(node):
+    """The nodes whose values are needed to evaluate a node once its additions are fused."""
+    if isinstance(node, LazyIverson):
+        node = node.x
+    if isinstance(node, int) or node.op == "leaf":
+        return []
+    elif node.op == "apply":
+        return [arg for arg in node.args[1:] if isinstance(arg, LazyPInt)]
+    else:
+        return [atom for atom, _ in linearize(node)[0]]
+
+
+# Bounds (low, high) on the value of an expression for which a comparison against zero holds
+WINDOWS = {
+    "<": (None, -1),
+    "<=": (None, 0),
+    ">": (1, None),
+    ">=": (0, None),
+    "==": (0, 0),
+    "!=": (0, 0),
+}
+
+
+class Evaluation:
+    """
+    Executes the optimised expression graph of a set of outputs, sharing the values of common nodes between
+    them. A value is dropped as soon as all of the nodes using it have been evaluated.
+    """
+
+    def __init__(self, outputs):
+        self.uses = collections.Counter()
+        self.values = {}
+
+        stack, seen = list(outputs), set()
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            for dependency in dependencies(node):
+                self.uses[id(dependency)] += 1
+                stack.append(dependency)
+
+    def value(self, node):
+        if isinstance(node, int):
+            return node
+        key = id(node)
+        if key not in self.values:
+            self.values[key] = self.compute(node)
+        value = self.values[key]
+        self.uses[key] -= 1
+        if self.uses[key] <= 0:
+            del self.values[key]
+        return value
+
+    def compute(self, node):
+        if isinstance(node, LazyIverson):
+            return self.compare(node)
+        elif node.op == "leaf":
+            return node.args[0]
+        elif node.op == "apply":
+            function, *args = node.args
+            return function(*[self.value(arg) for arg in args])
+        else:
+            pints, constant = self.summands(node)
+            if not pints:
+                return constant
+            elif len(pints) == 1:
+                return pints[0] + constant
+            logits, lower, stride = sumPInts(pints)
+            return PInt(logits, lower + constant, stride=stride)
+
+    def summands(self, node):
+        terms, constant = linearize(node)
+        pints = []
+        for atom, coefficient in terms:
+            x = self.value(atom) * coefficient
+            if isinstance(x, PInt):
+                pints.append(x)
+            else:
+                constant += x
+        return pints, constant
+
+    def compare(self, node):
+        pints, constant = self.summands(node.x)
+        negated = node.op == "!="
+        low, high = WINDOWS[node.op]
+        low = None if low is None else low - constant
+        high = None if high is None else high - constant
+
+        if not pints:
+            holds = (low is None or low <= 0) and (high is None or 0 <= high)
+            return holds != negated
+
+        summation = sumPInts(pints, window=(low, high))
+        if summation is None:
+            return negated
+        logits, lower, stride = summation
+
+        start, end = 0, logits.shape[-1]
+        if low is not None:
+            start = max(start, -(-(low - lower) // stride))
+        if high is not None:
+            end = min(end, (high - lower) // stride + 1)
+        if start >= end:
+            return negated
+        return PIverson(logits[..., start:end], lower + stride * start, negated=negated)
+
+
+def evaluate(*outputs):
+    """
+    Evaluates lazy expressions and comparisons of probabilistic integers in a single optimised pass.
+
+    @param outputs: The lazy expressions to evaluate
+    @return: A tuple with a PInt (or integer) per LazyPInt and a PIverson (or bool) per LazyIverson
+    """
+    evaluation = Evaluation(outputs)
+    for output in outputs:
+        evaluation.uses[id(output)] += 1
+    return tuple(evaluation.value(output) for output in outputs)
@@ -0,0 +1,4 @@
+from .pint import PInt, PIverson, Krat
+from .exact import ExactPInt
+from .streaming import StreamingPInt
+from .inference import ifthenelse, piecewise, log_expectation, log1mexp, sum
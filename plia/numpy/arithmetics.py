@@ -0,0 +1,267 @@
+import math
+import functools
+import numpy as np
+import scipy.fft
+
+from ..supports import (
+    product_table,
+    affine_targets,
+    survival_window,
+    overlap_slices,
+)
+
+# Same floor as tf.keras.backend.epsilon(), which the TensorFlow backend uses
+EPSILON = 1e-7
+
+# Number of threads of the transforms, -1 uses all cores (see the workers argument of scipy.fft)
+WORKERS = -1
+
+# Seconds per unit of work, measured on CPU (see experiments/convolution/run.py --problem backend)
+CONVOLUTION_COSTS = {
+    "direct": 1.2e-9,
+    "direct_shift": 4.0e-6,
+    "fft": 2.0e-9,
+    "fft_overhead": 1.0e-4,
+}
+
+
+def logit_pad(logits, lower_padding, upper_padding):
+    padding = [(0, 0) for _ in range(logits.ndim - 1)]
+    padding = padding + [(max(0, lower_padding), max(0, upper_padding))]
+    return np.pad(logits, padding, mode="constant", constant_values=-np.inf)
+
+
+def logsumexp(logits, axis=-1, keepdims=False):
+    """Log-sum-exp that returns -inf instead of nan when all of the logits are -inf."""
+    a = np.max(logits, axis=axis, keepdims=True)
+    a = np.where(np.isfinite(a), a, 0.0)
+    with np.errstate(divide="ignore"):
+        s = np.log(np.sum(np.exp(logits - a), axis=axis, keepdims=True)) + a
+    return s if keepdims else np.squeeze(s, axis=axis)
+
+
+def log_softmax(logits):
+    return logits - logsumexp(logits, keepdims=True)
+
+
+def floored_log(p):
+    """Logarithm of probabilities computed by a convolution, clipping negative round-off errors to zero."""
+    return np.log(np.maximum(p, 0.0) + EPSILON)
+
+
+def exp_normalized(logits):
+    """The probabilities of logits scaled to sum to one, and the logarithm of the scale."""
+    a = logsumexp(logits, keepdims=True)
+    return np.exp(logits - a), a
+
+
+@functools.lru_cache(maxsize=None)
+def fft_length(signal_length):
+    return scipy.fft.next_fast_len(signal_length, real=True)
+
+
+def direct_cost(card1, card2, batch=1):
+    """Estimated time in seconds of a direct convolution, which is one vector operation per shift."""
+    return (
+        CONVOLUTION_COSTS["direct_shift"] * min(card1, card2)
+        + CONVOLUTION_COSTS["direct"] * batch * card1 * card2
+    )
+
+
+def fft_cost(signal_length, n_transforms=3, batch=1):
+    """Estimated time in seconds of an FFT convolution computing n_transforms real transforms."""
+    n = fft_length(signal_length)
+    cost = CONVOLUTION_COSTS["fft"] * batch * n_transforms * n * max(1.0, math.log2(n))
+    return CONVOLUTION_COSTS["fft_overhead"] + cost
+
+
+def log_convolution(p1, p2, signal_length):
+    """
+    Implementation of summing the PMF of two probabilistic integers with NumPy.
+    Dispatches between a direct and an FFT convolution based on the cost model in CONVOLUTION_COSTS.
+
+    @param p1: The logits of the first probabilistic integer
+    @param p2: The logits of the second probabilistic integer
+    @param signal_length: The length of the outcome space
+
+    @return: The logits of the sum of the two probabilistic integers
+    """
+    card1, card2 = p1.shape[-1], p2.shape[-1]
+    batch = math.prod(np.broadcast_shapes(p1.shape[:-1], p2.shape[:-1]))
+    if direct_cost(card1, card2, batch) < fft_cost(signal_length, batch=batch):
+        return direct_log_convolution(p1, p2, signal_length)
+    return fft_log_convolution(p1, p2, signal_length)
+
+
+def direct_log_convolution(p1, p2, signal_length):
+    """
+    Implementation of summing the PMF of two probabilistic integers by accumulating the larger PMF shifted by
+    every value of the smaller one, which is linear in the product of the cardinalities.
+    """
+    if p1.shape[-1] < p2.shape[-1]:
+        p1, p2 = p2, p1
+    p1, a1 = exp_normalized(p1)
+    p2, a2 = exp_normalized(p2)
+
+    card1 = p1.shape[-1]
+    batch_shape = np.broadcast_shapes(p1.shape[:-1], p2.shape[:-1])
+    p = np.zeros(batch_shape + (max(signal_length, card1 + p2.shape[-1] - 1),))
+    for j in range(p2.shape[-1]):
+        p[..., j : j + card1] += p1 * p2[..., j : j + 1]
+    return floored_log(p[..., :signal_length]) + a1 + a2
+
+
+def fft_log_convolution(p1, p2, signal_length):
+    """
+    Implementation of summing the PMF of two probabilistic integers with multithreaded real FFTs.
+    """
+    return nary_log_convolution([p1, p2], signal_length)
+
+
+def nary_log_convolution(ps, signal_length):
+    """
+    Implementation of summing the PMFs of any number of probabilistic integers by multiplying their spectra,
+    with a single inverse transform. Every PMF is scaled to sum to one first, which bounds the magnitude of its
+    spectrum by one such that the product can neither overflow nor be dominated by a single operand.
+
+    @param ps: The logits of the probabilistic integers
+    @param signal_length: The length of the outcome space
+
+    @return: The logits of the sum of the probabilistic integers
+    """
+    n = fft_length(signal_length)
+    spectrum, scale = 1.0, 0.0
+    for p in ps:
+        p, a = exp_normalized(p)
+        spectrum = spectrum * scipy.fft.rfft(p, n, axis=-1, workers=WORKERS)
+        scale = scale + a
+    p = scipy.fft.irfft(spectrum, n, axis=-1, workers=WORKERS)[..., :signal_length]
+    return floored_log(p) + scale
+
+
+def multi_log_convolution(p, signal_length):
+    """
+    Implementation of summing the PMFs of the random variables along the second to last axis of p, transforming
+    all of them with a single batched FFT.
+    """
+    n = fft_length(signal_length)
+    p, a = exp_normalized(p)
+    spectrum = scipy.fft.rfft(p, n, axis=-1, workers=WORKERS)
+    spectrum = np.prod(spectrum, axis=-2)
+    p = scipy.fft.irfft(spectrum, n, axis=-1, workers=WORKERS)[..., :signal_length]
+    return floored_log(p) + np.sum(a, axis=-2)
+
+
+def addPIntPInt(x1, x2):
+    cardinality = x1.cardinality + x2.cardinality - 1
+    return log_convolution(x1.logits, x2.logits, cardinality), x1.lower + x2.lower
+
+
+def sumPInts(xs):
+    cardinality = sum(x.cardinality for x in xs) - len(xs) + 1
+    logits = nary_log_convolution([x.logits for x in xs], cardinality)
+    return logits, sum(x.lower for x in xs)
+
+
+def sumreduceKrat(krat):
+    cardinality = (krat.cardinality - 1) * krat.n_rvs + 1
+    return multi_log_convolution(krat.logits, cardinality), krat.lower * krat.n_rvs
+
+
+def dilate_logits(logits, c):
+    """
+    Spreads the logits of a probabilistic integer out over every c-th value, filling the values in between with -inf.
+    """
+    if c == 1:
+        return logits
+    dilated = np.full(logits.shape[:-1] + ((logits.shape[-1] - 1) * c + 1,), -np.inf)
+    dilated[..., ::c] = logits
+    return dilated
+
+
+def integer_fill_logits(x, c):
+    """The logits of x padded to whole multiples of c, reshaped to [..., card // c, c]."""
+    lower_padding = x.lower - (x.lower // c) * c
+    upper_padding = ((x.upper + c) // c) * c - 1 - x.upper
+    logits = logit_pad(x.logits, lower_padding, upper_padding)
+    return logits.reshape(logits.shape[:-1] + (-1, c))
+
+
+def floordividePIntInt(x, c):
+    return logsumexp(integer_fill_logits(x, c), axis=-1), x.lower // c
+
+
+def modPIntInt(x, c):
+    return logsumexp(integer_fill_logits(x, c), axis=-2), 0
+
+
+def scatter_logits(logits, targets, cardinality):
+    """
+    Sums the probabilities of the logits into the bins targets, dropping the values whose target is cardinality.
+
+    @param logits: Logits of shape [..., n]
+    @param targets: Integer bins of shape [n]
+    @param cardinality: The number of bins
+
+    @return: The logits of the bins
+    """
+    a = np.max(logits, axis=-1, keepdims=True)
+    a = np.where(np.isfinite(a), a, 0.0)
+    p = np.exp(logits - a)
+
+    keep = targets < cardinality
+    batch_shape = p.shape[:-1]
+    p = p.reshape(-1, p.shape[-1])[:, keep]
+    bins = np.zeros((cardinality, p.shape[0]))
+    np.add.at(bins, targets[keep], p.T)
+    with np.errstate(divide="ignore"):
+        logp = np.log(bins.T.reshape(batch_shape + (cardinality,)))
+    return logp + a
+
+
+def multiplyPIntPInt(x1, x2):
+    segments, lower, stride, cardinality = product_table(
+        x1.lower, 1, x1.cardinality, x2.lower, 1, x2.cardinality
+    )
+    logits = x1.logits[..., :, None] + x2.logits[..., None, :]
+    logits = logits.reshape(logits.shape[:-2] + (-1,))
+    logits = scatter_logits(logits, segments, cardinality)
+    return dilate_logits(logits, stride), lower
+
+
+def piecewiseAffinePInt(x, segments):
+    """
+    Implementation of applying a different affine map to every segment of the support of a probabilistic integer,
+    for all segments at once with a single scatter of the PMF. Values outside of the segments are dropped.
+
+    @param x: The probabilistic integer
+    @param segments: The (start, end, a, b) tuples mapping the values v in [start, end) to a * v + b
+
+    @return: The unnormalised logits of the result and its lower bound
+    """
+    targets, lower, cardinality = affine_targets(x.lower, x.upper, segments)
+    return scatter_logits(x.logits, targets, cardinality), lower
+
+
+def ltPIntPInt(x1, x2):
+    """
+    Implementation of the log-probability of X1 < X2 in linear time, as the dot product of the PMF of X1 with the
+    survival function P(X2 > v) of X2.
+    """
+    p2, a2 = exp_normalized(x2.logits)
+    with np.errstate(divide="ignore"):
+        survival = np.log(np.cumsum(p2[..., ::-1], axis=-1)[..., ::-1]) + a2
+
+    start, end, leading, trailing = survival_window(x1, x2)
+    padding = [(0, 0) for _ in range(survival.ndim - 1)]
+    survival = np.pad(survival, padding + [(leading, 0)], constant_values=0.0)
+    survival = logit_pad(survival, 0, trailing)[..., start + leading : end + leading]
+    return logsumexp(x1.logits + survival)
+
+
+def eqPIntPInt(x1, x2):
+    """
+    Implementation of the log-probability of X1 == X2 in time linear in the overlap of the two supports.
+    """
+    slice1, slice2 = overlap_slices(x1, x2)
+    return logsumexp(x1.logits[..., slice1] + x2.logits[..., slice2])
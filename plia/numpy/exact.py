@@ -0,0 +1,424 @@
+import math
+import functools
+import concurrent.futures
+from fractions import Fraction
+import numpy as np
+
+# Largest modulus of the number-theoretic transforms, products of two residues then fit into uint64
+MAX_MODULUS = 2**32
+
+# Smallest transform length (log2) the primes are selected for, which bounds the search for primes for short
+# transforms while leaving enough primes for very large counts
+MIN_LOG_LENGTH = 20
+
+# Values of the counts up to which they are held in int64 arrays instead of arrays of Python integers
+INT64_LIMIT = 2**62
+
+
+def is_prime(n):
+    """Deterministic Miller-Rabin test for n < 2^32."""
+    if n < 2:
+        return False
+    for p in (2, 3, 5, 7):
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d, s = d // 2, s + 1
+    for a in (2, 7, 61):
+        if a % n == 0:
+            continue
+        x = pow(a, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def primitive_root(p):
+    factors, n, f = [], p - 1, 2
+    while f * f <= n:
+        if n % f == 0:
+            factors.append(f)
+            while n % f == 0:
+                n //= f
+        f += 1
+    if n > 1:
+        factors.append(n)
+    g = 2
+    while any(pow(g, (p - 1) // f, p) == 1 for f in factors):
+        g += 1
+    return g
+
+
+@functools.lru_cache(maxsize=None)
+def ntt_primes(log_length):
+    """
+    The primes p < MAX_MODULUS for which 2^log_length divides p - 1, in decreasing order, with a primitive root of
+    each. They support transforms of all lengths up to 2^log_length.
+    """
+    primes = []
+    c = (MAX_MODULUS - 1) >> log_length
+    while c > 0:
+        p = (c << log_length) + 1
+        if is_prime(p):
+            primes.append((p, primitive_root(p)))
+        c -= 1
+    return tuple(primes)
+
+
+def select_primes(bound, log_length):
+    """The fewest NTT primes of the given length whose product exceeds 2 * bound."""
+    primes, product = [], 1
+    for p, g in ntt_primes(log_length):
+        primes.append((p, g))
+        product *= p
+        if product > 2 * bound:
+            return primes
+    raise ValueError(
+        f"Not enough NTT primes of length 2^{log_length} for counts up to {bound}"
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def stage_twiddles(primes, log_length, inverse=False):
+    """
+    The twiddle factors of every stage of a transform of length 2^log_length modulo each of the primes, with
+    their Shoup quotients floor(w * 2^32 / p). The stage merging transforms of length m has arrays of shape
+    [n_primes, m] holding the powers of a root of unity of order 2m.
+    """
+    n = 1 << log_length
+    tables = []
+    for p, g in primes:
+        r = pow(g, (p - 1) // n, p)
+        if inverse:
+            r = pow(r, p - 2, p)
+        # the powers r^j for j < n / 2, doubling the table with every step
+        table = np.ones(max(1, n // 2), dtype=np.uint64)
+        size = 1
+        while size < n // 2:
+            table[size : 2 * size] = (
+                table[:size] * np.uint64(pow(r, size, p)) % np.uint64(p)
+            )
+            size *= 2
+        tables.append(table)
+
+    moduli = np.array([p for p, _ in primes], dtype=np.uint64)[:, None]
+    stages = []
+    for stage in range(log_length):
+        m = 1 << stage
+        w = np.stack([table[:: n // (2 * m)][:m] for table in tables])
+        stages.append((w, (w << np.uint64(32)) // moduli))
+    return stages
+
+
+def reduce_once(x, p, buffer):
+    """x modulo p in place for x < 2p: x - p wraps around for x < p, so the minimum picks the reduced value."""
+    np.subtract(x, p, out=buffer)
+    np.minimum(x, buffer, out=x)
+
+
+def butterflies(even, odd, w, w_quotient, p, merged_even, merged_odd, buffers):
+    """
+    Writes even + w * odd and even - w * odd modulo p into merged_even and merged_odd. The product uses Shoup's
+    method with the precomputed quotient floor(w * 2^32 / p), which replaces the division of a modulo by a
+    multiplication and a shift. All passes write into preallocated buffers.
+    """
+    q, t, scratch = buffers
+    np.multiply(odd, w_quotient, out=q)
+    np.right_shift(q, np.uint64(32), out=q)
+    np.multiply(q, p, out=q)
+    np.multiply(odd, w, out=t)
+    np.subtract(t, q, out=t)
+    reduce_once(t, p, scratch)
+
+    np.add(even, t, out=merged_even)
+    reduce_once(merged_even, p, scratch)
+    np.add(even, p, out=merged_odd)
+    np.subtract(merged_odd, t, out=merged_odd)
+    reduce_once(merged_odd, p, scratch)
+
+
+def ntt_row(x, p, stages):
+    """
+    Number-theoretic transform of the residues x modulo a prime p, with the twiddle factors of every stage.
+
+    The radix-2 stages are those of a Stockham transform in natural order: before the stage merging transforms of
+    length m, X[r, c] holds the transforms of the subsequences x[c::n/m], and the subsequences of the even and odd
+    columns are merged into transforms of length 2m. X is stored as [m, n/m] while m is small and transposed once
+    when it grows, such that every stage is a few vectorised passes with long inner loops.
+    """
+    n = len(x)
+    p = np.uint64(p)
+    X, merged = x.copy(), np.empty_like(x)
+    buffers = [np.empty(n // 2, dtype=np.uint64) for _ in range(3)]
+    transposed = False
+    for stage, (w, w_quotient) in enumerate(stages):
+        m, c = 1 << stage, n >> (stage + 1)
+        if not transposed and c < m:
+            X = np.ascontiguousarray(X.reshape(m, 2 * c).T).reshape(-1)
+            transposed = True
+
+        if transposed:
+            # X is stored as [n/m, m]
+            X2, merged2 = X.reshape(2 * c, m), merged.reshape(c, 2 * m)
+            views = [b.reshape(c, m) for b in buffers]
+            even, odd = X2[:c], X2[c:]
+            merged_even, merged_odd = merged2[:, :m], merged2[:, m:]
+            w, w_quotient = w[None, :], w_quotient[None, :]
+        else:
+            X2, merged2 = X.reshape(m, 2 * c), merged.reshape(2 * m, c)
+            views = [b.reshape(m, c) for b in buffers]
+            even, odd = X2[:, :c], X2[:, c:]
+            merged_even, merged_odd = merged2[:m], merged2[m:]
+            w, w_quotient = w[:, None], w_quotient[:, None]
+        butterflies(even, odd, w, w_quotient, p, merged_even, merged_odd, views)
+        X, merged = merged, X
+    return X
+
+
+def ntt(x, primes, log_length, inverse=False):
+    """
+    Number-theoretic transform of residues x of shape [n_primes, 2^log_length], modulo the prime of each row.
+    The rows are transformed on separate threads, as NumPy releases the GIL in its kernels.
+    """
+    n = 1 << log_length
+    stages = stage_twiddles(tuple(primes), log_length, inverse)
+    with concurrent.futures.ThreadPoolExecutor(len(primes)) as executor:
+        rows = executor.map(
+            lambda i: ntt_row(x[i], primes[i][0], [(w[i], q[i]) for w, q in stages]),
+            range(len(primes)),
+        )
+        x = np.stack(list(rows))
+
+    if inverse:
+        moduli = np.array([p for p, _ in primes], dtype=np.uint64)[:, None]
+        n_inverse = np.array([pow(n, p - 2, p) for p, _ in primes], dtype=np.uint64)
+        x = x * n_inverse[:, None] % moduli
+    return x
+
+
+def residues(counts, primes):
+    """The counts modulo every prime, as uint64 array of shape [n_primes, n]."""
+    return np.stack(
+        [np.asarray(counts % p, dtype=np.uint64) for p, _ in primes]
+    ).astype(np.uint64)
+
+
+def spectrum(counts, primes, log_length):
+    """The transforms of the counts modulo every prime, zero-padded to length 2^log_length."""
+    r = np.zeros((len(primes), 1 << log_length), dtype=np.uint64)
+    r[:, : len(counts)] = residues(counts, primes)
+    return ntt(r, primes, log_length)
+
+
+def garner(r, primes):
+    """
+    The mixed-radix digits of the numbers with residues r modulo the primes: x = d_0 + p_0 * (d_1 + p_1 * ...).
+    """
+    digits = [r[0]]
+    for j in range(1, len(primes)):
+        pj = np.uint64(primes[j][0])
+        # x_j = d_0 + p_0 * (d_1 + ... + p_j-2 * d_j-1) modulo p_j, by Horner's scheme
+        x = digits[-1] % pj
+        for i in range(j - 2, -1, -1):
+            x = (x * np.uint64(primes[i][0] % primes[j][0]) + digits[i]) % pj
+        product = math.prod(p for p, _ in primes[:j]) % primes[j][0]
+        inverse = np.uint64(pow(product, primes[j][0] - 2, primes[j][0]))
+        digits.append((r[j] + pj - x) % pj * inverse % pj)
+    return digits
+
+
+def reconstruct(digits, primes, bound):
+    """
+    The exact integers of mixed-radix digits, in int64 when they are at most bound < INT64_LIMIT and as Python
+    integers otherwise. The partial results of Horner's scheme never exceed the final value, so int64 cannot
+    overflow.
+    """
+    dtype = np.int64 if bound < INT64_LIMIT else object
+    x = digits[-1].astype(dtype)
+    for i in range(len(digits) - 2, -1, -1):
+        x = x * primes[i][0] + digits[i].astype(dtype)
+    return x
+
+
+def exact_convolution(counts1, counts2):
+    """
+    Implementation of the exact convolution of two arrays of non-negative integer counts with number-theoretic
+    transforms modulo several primes, whose results are combined with the Chinese remainder theorem. The number of
+    primes follows from a bound on the largest count of the result.
+
+    @param counts1: The counts of the first probabilistic integer, an int64 or object array
+    @param counts2: The counts of the second probabilistic integer, an int64 or object array
+
+    @return: The counts of the sum of the two probabilistic integers
+    """
+    signal_length = len(counts1) + len(counts2) - 1
+    log_length = max(1, (signal_length - 1).bit_length())
+    bound = int(counts1.max()) * int(counts2.max())
+    bound *= min(len(counts1), len(counts2))
+    primes = select_primes(bound, max(log_length, MIN_LOG_LENGTH))
+
+    spectrum1 = spectrum(counts1, primes, log_length)
+    # two independent copies of the same probabilistic integer share their spectrum
+    if counts2 is counts1:
+        spectrum2 = spectrum1
+    else:
+        spectrum2 = spectrum(counts2, primes, log_length)
+    moduli = np.array([p for p, _ in primes], dtype=np.uint64)[:, None]
+    r = ntt(spectrum1 * spectrum2 % moduli, primes, log_length, inverse=True)
+
+    digits = garner(r[:, :signal_length], primes)
+    return reconstruct(digits, primes, bound)
+
+
+def as_counts(counts):
+    """Integer counts in an int64 array when they fit and in an array of Python integers otherwise."""
+    counts = np.asarray(counts)
+    if counts.dtype.kind not in "iu":
+        counts = np.array([int(c) for c in counts], dtype=object)
+    if (counts < 0).any():
+        raise ValueError("Counts must be non-negative")
+    if counts.dtype == object and counts.max(initial=0) >= INT64_LIMIT:
+        return counts
+    return counts.astype(np.int64)
+
+
+class ExactPInt:
+    """
+    A probabilistic integer with exact weights: the probability of the value lower + i is counts[i] / denominator,
+    with integer counts. Additions are exact convolutions with number-theoretic transforms, such that the
+    result gives exact counts (or rational probabilities) for audits, including probabilities far below the
+    floor of the float convolutions. The denominator defaults to the sum of the counts.
+    """
+
+    def __init__(self, counts, lower, denominator=None):
+        self.counts = as_counts(counts)
+        self.lower = int(lower)
+        if denominator is None:
+            denominator = sum(int(c) for c in self.counts)
+        self.denominator = int(denominator)
+
+    @classmethod
+    def from_pint(cls, x, denominator=2**32):
+        """
+        Quantises the probabilities of an unbatched PInt (of either backend) to integer counts over the given
+        denominator.
+        """
+        probabilities = np.exp(np.asarray(x.logits, dtype=np.float64))
+        counts = np.rint(probabilities * denominator).astype(np.int64)
+        return cls(counts, x.lower, denominator)
+
+    @property
+    def cardinality(self):
+        return len(self.counts)
+
+    @property
+    def upper(self):
+        return self.lower + self.cardinality - 1
+
+    def probability(self, value):
+        """The exact probability of a value."""
+        if not self.lower <= value <= self.upper:
+            return Fraction(0)
+        return Fraction(int(self.counts[value - self.lower]), self.denominator)
+
+    @property
+    def probabilities(self):
+        """The exact probabilities of all values of the support."""
+        return [Fraction(int(c), self.denominator) for c in self.counts]
+
+    @property
+    def logits(self):
+        """The float64 log-probabilities, exact up to rounding even below the float64 range."""
+        with np.errstate(divide="ignore"):
+            if self.counts.dtype == object:
+                logs = np.array([math.log(c) if c else -np.inf for c in self.counts])
+            else:
+                logs = np.log(self.counts.astype(np.float64))
+        return logs - math.log(self.denominator)
+
+    def __add__(self, other):
+        if isinstance(other, ExactPInt):
+            counts = exact_convolution(self.counts, other.counts)
+            return ExactPInt(
+                counts, self.lower + other.lower, self.denominator * other.denominator
+            )
+        elif isinstance(other, int):
+            return ExactPInt(self.counts, self.lower + other, self.denominator)
+        else:
+            raise NotImplementedError()
+
+    def __neg__(self):
+        return ExactPInt(self.counts[::-1], -self.upper, self.denominator)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        if isinstance(other, int) and other > 0:
+            counts = np.zeros((self.cardinality - 1) * other + 1, self.counts.dtype)
+            counts[::other] = self.counts
+            return ExactPInt(counts, self.lower * other, self.denominator)
+        elif isinstance(other, int) and other < 0:
+            return -(self * -other)
+        else:
+            raise NotImplementedError()
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __lt__(self, other):
+        """The exact probability that the value is less than an integer or an independent ExactPInt."""
+        if isinstance(other, ExactPInt):
+            return (self - other) < 0
+        end = min(max(other - self.lower, 0), self.cardinality)
+        return Fraction(sum(int(c) for c in self.counts[:end]), self.denominator)
+
+    def __le__(self, other):
+        return self < other + 1
+
+    def __gt__(self, other):
+        return -self < -other
+
+    def __ge__(self, other):
+        return -self < -other + 1
+
+    def __eq__(self, other):
+        if isinstance(other, ExactPInt):
+            return (self - other) == 0
+        return self.probability(other)
+
+    __hash__ = object.__hash__
+
+    def max_error(self, x):
+        """
+        The largest absolute error of the probabilities of an unbatched float PInt (of either backend) against the
+        exact ones. This fast path compares in float64 and never builds rational numbers.
+        """
+        lower, upper = min(self.lower, x.lower), max(self.upper, x.upper)
+        expected = np.zeros(upper - lower + 1)
+        actual = np.zeros(upper - lower + 1)
+        expected[self.lower - lower : self.upper - lower + 1] = np.exp(self.logits)
+        actual[x.lower - lower : x.upper - lower + 1] = np.exp(
+            np.asarray(x.logits, dtype=np.float64)
+        )
+        return float(np.abs(actual - expected).max())
+
+    def verify(self, x, atol=1e-6):
+        """Whether the probabilities of a float PInt match the exact ones up to atol."""
+        return self.max_error(x) <= atol
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(lower:{self.lower}, upper:{self.upper})"
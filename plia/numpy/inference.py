@@ -0,0 +1,128 @@
+import math
+import numpy as np
+
+from .pint import PInt, PIverson
+from .arithmetics import (
+    EPSILON,
+    logsumexp,
+    logit_pad,
+    sumPInts,
+    piecewiseAffinePInt,
+)
+from ..supports import piecewise_segments, mixture_paddings
+
+
+def log_expectation(x):
+    """
+    Implementation of the log-expectation operator for probabilistic integers and their comparisons.
+
+    @param x: The probabilistic integer (comparison) to compute the log-expectation of
+
+    @return: The log-expectation as a float64 array with the batch shape of x
+    """
+    if isinstance(x, bool):
+        return 0.0 if x else -np.inf
+    elif isinstance(x, PInt):
+        values = np.arange(x.lower, x.upper + 1, dtype=np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            log_values = np.log(values + EPSILON)
+        expectation = np.where(x.logits > -np.inf, x.logits + log_values, -np.inf)
+        return logsumexp(expectation)
+    elif isinstance(x, PIverson):
+        if x.log_probability is not None:
+            expectation = x.log_probability
+        else:
+            expectation = logsumexp(x.logits)
+        if x.negated:
+            expectation = log1mexp(expectation)
+        return expectation
+    else:
+        raise NotImplementedError()
+
+
+def log1mexp(x):
+    """
+    Numerically accurate evaluation of log(1 - exp(x)) for x < 0.
+    See [Maechler2012accurate]_ for details.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(-math.log(2) < x, np.log(-np.expm1(x)), np.log1p(-np.exp(x)))
+
+
+def ifthenelse(variable, lt, tbranch, fbranch):
+    """
+    Implementation of the probabilistic if-then-else statement.
+
+    @param variable: The probabilistic integer to branch on
+    @param lt: The threshold value
+    @param tbranch: The function to execute if the variable is less than the threshold
+    @param fbranch: The function to execute if the variable is greater or equal to the threshold
+
+    @return: The weighted average of the two branches
+    """
+    return piecewise(variable, [lt], [tbranch, fbranch])
+
+
+def piecewise(variable, thresholds, branches):
+    """
+    Implementation of a probabilistic piecewise function, see plia.piecewise.
+
+    @param variable: The probabilistic integer to branch on
+    @param thresholds: The increasing thresholds separating the segments
+    @param branches: The branches of the segments, functions of a probabilistic integer, integer constants or
+    tuples (a, b) for the affine map x -> a * x + b
+
+    @return: The weighted average of the branches
+    """
+    affine, functions = piecewise_segments(
+        variable.lower, variable.upper, thresholds, branches
+    )
+    if not affine and len(functions) == 1:
+        return functions[0][2](variable)
+
+    outputs = []
+    for start, end, branch in functions:
+        logits = variable.logits[..., start - variable.lower : end - variable.lower]
+        logprob = logsumexp(logits, keepdims=True)
+        x = branch(PInt(logits, start))
+        if isinstance(x, int):
+            x = PInt(np.zeros_like(logprob), x)
+        outputs.append((x.logits + logprob, x.lower))
+
+    if affine:
+        outputs.append(piecewiseAffinePInt(variable, affine))
+
+    lower, paddings = mixture_paddings(outputs)
+    batch_shape = np.broadcast_shapes(*[logits.shape[:-1] for logits, _ in outputs])
+    logits = [
+        logit_pad(logits, *padding) for (logits, _), padding in zip(outputs, paddings)
+    ]
+    logits = [np.broadcast_to(l, batch_shape + l.shape[-1:]) for l in logits]
+    return PInt(logsumexp(np.stack(logits), axis=0), lower)
+
+
+def sum(xs):
+    """
+    Implementation of summing a list of probabilistic integers (and integer constants) with a single product of
+    their spectra.
+
+    @param xs: The probabilistic integers to sum
+
+    @return: The probabilistic integer representing the sum
+    """
+    constant = 0
+    pints = []
+    for x in xs:
+        if isinstance(x, PInt):
+            pints.append(x)
+        elif isinstance(x, int):
+            constant += x
+        else:
+            raise NotImplementedError()
+
+    if not pints:
+        return constant
+    elif len(pints) == 1:
+        return pints[0] + constant
+    logits, lower = sumPInts(pints)
+    return PInt(logits, lower + constant)
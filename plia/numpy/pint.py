@@ -0,0 +1,194 @@
+import numpy as np
+
+from .arithmetics import (
+    EPSILON,
+    log_softmax,
+    addPIntPInt,
+    dilate_logits,
+    floordividePIntInt,
+    modPIntInt,
+    multiplyPIntPInt,
+    sumreduceKrat,
+    ltPIntPInt,
+    eqPIntPInt,
+)
+
+
+class PArray:
+
+    def __init__(self, logits, lower):
+        self.logits = logits
+        self.lower = lower
+
+    @property
+    def cardinality(self):
+        return self.logits.shape[-1]
+
+    @property
+    def upper(self):
+        return self.lower + self.cardinality - 1
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(lower:{self.lower}, upper:{self.upper})"
+
+
+class PInt(PArray):
+    """
+    A probabilistic integer whose float64 logits are held in a NumPy array. It mirrors the arithmetic and
+    comparisons of plia.PInt without importing TensorFlow, which is only imported by `to_tensorflow` for
+    computations that need gradients.
+    """
+
+    def __init__(self, logits, lower, log_input=True):
+        logits = np.asarray(logits, dtype=np.float64)
+        if not log_input:
+            logits = np.log(logits + EPSILON)
+        super().__init__(log_softmax(logits), int(lower))
+
+    @classmethod
+    def from_tensorflow(cls, x):
+        return cls(x.logits.numpy(), x.lower)
+
+    def to_tensorflow(self):
+        from ..pint import PInt as TFPInt
+
+        return TFPInt(self.logits.astype(np.float32), self.lower)
+
+    def __add__(self, other):
+        if isinstance(other, PInt):
+            logits, lower = addPIntPInt(self, other)
+            return PInt(logits, lower)
+        elif isinstance(other, int):
+            return PInt(self.logits, self.lower + other)
+        else:
+            raise NotImplementedError()
+
+    def __neg__(self):
+        return PInt(self.logits[..., ::-1], -self.upper)
+
+    def __sub__(self, other):
+        if isinstance(other, (PInt, int)):
+            return self + (-other)
+        else:
+            raise NotImplementedError()
+
+    def __mul__(self, other):
+        if isinstance(other, PInt):
+            logits, lower = multiplyPIntPInt(self, other)
+            return PInt(logits, lower)
+        elif isinstance(other, int):
+            if other == 0:
+                return 0
+            elif other < 0:
+                return -(self * -other)
+            return PInt(dilate_logits(self.logits, other), self.lower * other)
+        else:
+            raise NotImplementedError()
+
+    def __floordiv__(self, other):
+        if isinstance(other, int):
+            logits, lower = floordividePIntInt(self, other)
+            return PInt(logits, lower)
+        else:
+            raise NotImplementedError()
+
+    def __mod__(self, other):
+        if isinstance(other, int) and other > 0:
+            logits, lower = modPIntInt(self, other)
+            return PInt(logits, lower)
+        elif isinstance(other, int) and other < 0:
+            raise ValueError("Modulo operator is not defined for negative integers.")
+        else:
+            raise NotImplementedError()
+
+    def __divmod__(self, other):
+        return self // other, self % other
+
+    def __radd__(self, other):
+        return self + other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __rmul__(self, other: int):
+        return self * other
+
+    def __lt__(self, other):
+        if isinstance(other, PInt):
+            if self.lower - other.upper >= 0:
+                return False
+            return PIverson(None, 0, log_probability=ltPIntPInt(self, other))
+        elif isinstance(other, int):
+            x = self - other
+            if x.lower >= 0:
+                return False
+            return PIverson(x.logits[..., : abs(x.lower)], x.lower)
+        else:
+            raise NotImplementedError()
+
+    def __le__(self, other):
+        return self < other + 1
+
+    def __gt__(self, other):
+        return -self < -other
+
+    def __ge__(self, other):
+        return -self < -other + 1
+
+    def __eq__(self, other):
+        if isinstance(other, PInt):
+            if self.lower > other.upper or self.upper < other.lower:
+                return False
+            return PIverson(None, 0, log_probability=eqPIntPInt(self, other))
+        elif isinstance(other, int):
+            x = self - other
+            if x.lower > 0 or x.upper < 0:
+                return False
+            return PIverson(x.logits[..., abs(x.lower) : abs(x.lower) + 1], 0)
+        else:
+            raise NotImplementedError()
+
+    def __ne__(self, other):
+        if isinstance(other, (int, PInt)):
+            equal = self == other
+            return True if equal is False else -equal
+        else:
+            raise NotImplementedError()
+
+    __hash__ = object.__hash__
+
+
+class PIverson(PArray):
+    """
+    The indicator of a comparison of probabilistic integers. Comparisons between two PInts only hold the
+    log-probability of the comparison, computed with a linear-time kernel, and no logits.
+    """
+
+    def __init__(self, logits, lower, negated=False, log_probability=None):
+        super().__init__(logits, lower)
+        self.negated = negated
+        self.log_probability = log_probability
+
+    def __neg__(self):
+        return PIverson(self.logits, self.lower, not self.negated, self.log_probability)
+
+
+class Krat(PArray):
+    """
+    A tensor of independent probabilistic integers sharing their support, the random variables are along the
+    second to last axis of the logits.
+    """
+
+    def __init__(self, logits, lower, log_input=True):
+        logits = np.asarray(logits, dtype=np.float64)
+        if not log_input:
+            logits = np.log(logits + EPSILON)
+        super().__init__(log_softmax(logits), int(lower))
+
+    @property
+    def n_rvs(self):
+        return self.logits.shape[-2]
+
+    def sum_reduce(self):
+        logits, lower = sumreduceKrat(self)
+        return PInt(logits, lower)
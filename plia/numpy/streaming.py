@@ -0,0 +1,237 @@
+import os
+import math
+import weakref
+import tempfile
+import numpy as np
+import scipy.fft
+
+from .arithmetics import WORKERS
+from .pint import PInt
+
+# Default bound in bytes on the memory of the buffers of a streaming convolution
+MEMORY_BUDGET = 2**30
+
+# Bytes held in memory per element of a chunk: the float64 input, the complex128 chunk and its transform, the
+# twiddle factors with their int64 exponents and the temporaries of their product (or the chunk of the other
+# spectrum), measured with tracemalloc
+BYTES_PER_ELEMENT = 96
+
+
+def factor_length(signal_length):
+    """
+    Splits the power-of-two transform length of a signal into n1 * n2 with n1 >= n2, the signal being viewed as
+    a row-major [n2, n1] matrix by the four-step FFT.
+    """
+    log_length = max(1, (signal_length - 1).bit_length())
+    n1 = 2 ** ((log_length + 1) // 2)
+    return n1, 2**log_length // n1
+
+
+def chunk_sizes(n1, n2, memory_budget):
+    """The number of columns and rows of the [n2, n1] matrix processed at once within the memory budget."""
+    elements = memory_budget // BYTES_PER_ELEMENT
+    if elements < n1:
+        raise ValueError(
+            f"Memory budget of {memory_budget} bytes is too small for rows of length {n1}, "
+            f"use at least {n1 * BYTES_PER_ELEMENT} bytes"
+        )
+    return min(n1, elements // n2), min(n2, elements // n1)
+
+
+def twiddles(n1, n2, start, stop, inverse=False):
+    """The twiddle factors exp(-2 pi i k2 j1 / (n1 n2)) of the columns start:stop, of shape [n2, stop - start]."""
+    n = n1 * n2
+    exponents = np.outer(np.arange(n2), np.arange(start, stop)) % n
+    sign = 1.0 if inverse else -1.0
+    return np.exp(sign * 2j * np.pi / n * exponents)
+
+
+def streaming_logsumexp(logits, chunk):
+    """Log-sum-exp of a (memory-mapped) vector of logits, reading chunk elements at a time."""
+    a, s = -np.inf, 0.0
+    for start in range(0, logits.shape[-1], chunk):
+        block = np.asarray(logits[start : start + chunk])
+        m = block.max(initial=-np.inf)
+        if not np.isfinite(m):
+            continue
+        if m > a:
+            s, a = s * math.exp(a - m), m
+        s += np.exp(block - a).sum()
+    return a + math.log(s) if s > 0 else -np.inf
+
+
+def read_columns(logits, scale, n1, n2, start, stop):
+    """
+    The probabilities exp(logits - scale) of the columns start:stop of the signal viewed as a [n2, n1] matrix,
+    zero-padded beyond the end of the logits.
+    """
+    columns = np.zeros((n2, stop - start))
+    length = logits.shape[-1]
+    rows = length // n1
+    if rows:
+        block = logits[: rows * n1].reshape(rows, n1)[:, start:stop]
+        columns[:rows] = np.exp(block - scale)
+    tail = np.asarray(logits[rows * n1 :][start:stop])
+    if len(tail):
+        columns[rows, : len(tail)] = np.exp(tail - scale)
+    return columns
+
+
+def column_pass(logits, scale, spectrum, column_chunk):
+    """
+    First step of the four-step FFT: transforms the columns of the signal and multiplies them by the twiddle
+    factors, writing the result into the memory-mapped spectrum of shape [n2, n1].
+    """
+    n2, n1 = spectrum.shape
+    for start in range(0, n1, column_chunk):
+        stop = min(n1, start + column_chunk)
+        columns = read_columns(logits, scale, n1, n2, start, stop)
+        columns = scipy.fft.fft(columns, axis=0, workers=WORKERS)
+        spectrum[:, start:stop] = columns * twiddles(n1, n2, start, stop)
+
+
+def row_pass(spectrum, other, row_chunk):
+    """
+    Second step of the four-step FFT of both signals, fused with the product of their spectra and the first step
+    of the inverse FFT: transforms the rows of the column passes of both signals, multiplies them and transforms
+    the product back, writing it into the memory-mapped spectrum in place.
+    """
+    n2, n1 = spectrum.shape
+    for start in range(0, n2, row_chunk):
+        stop = min(n2, start + row_chunk)
+        rows = scipy.fft.fft(spectrum[start:stop], axis=1, workers=WORKERS)
+        rows *= scipy.fft.fft(other[start:stop], axis=1, workers=WORKERS)
+        spectrum[start:stop] = scipy.fft.ifft(rows, axis=1, workers=WORKERS)
+
+
+def inverse_column_pass(spectrum, scale, logits, column_chunk):
+    """
+    Last step of the inverse four-step FFT: multiplies the columns by the inverse twiddle factors, transforms
+    them back and writes their log-probabilities into the memory-mapped logits of shape [n2, n1].
+    """
+    n2, n1 = spectrum.shape
+    for start in range(0, n1, column_chunk):
+        stop = min(n1, start + column_chunk)
+        columns = spectrum[:, start:stop] * twiddles(n1, n2, start, stop, True)
+        p = scipy.fft.ifft(columns, axis=0, workers=WORKERS).real
+        with np.errstate(divide="ignore"):
+            logits[:, start:stop] = np.log(np.maximum(p, 0.0)) + scale
+
+
+def memmap(directory, shape, dtype):
+    """
+    A new memory-mapped array in a temporary file, which is removed once neither the array nor any of its views
+    are referenced anymore.
+    """
+    descriptor, path = tempfile.mkstemp(suffix=".npy", dir=directory)
+    os.close(descriptor)
+    array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    weakref.finalize(array, os.remove, path)
+    return array
+
+
+def streaming_log_convolution(
+    p1, p2, signal_length, memory_budget=None, directory=None
+):
+    """
+    Implementation of summing the PMF of two probabilistic integers out of core. The logits are read from and
+    written to memory-mapped arrays, and the convolution is a four-step FFT of length n1 * n2 that transforms
+    chunks of columns and rows of the signal viewed as a [n2, n1] matrix, such that only the chunks, bounded by
+    memory_budget, are held in memory. The spectra are kept in two complex128 temporary files in directory,
+    which take 32 bytes per value of the result on disk.
+
+    @param p1: The (memory-mapped) logits of the first probabilistic integer
+    @param p2: The (memory-mapped) logits of the second probabilistic integer
+    @param signal_length: The length of the outcome space
+    @param memory_budget: The bound in bytes on the memory of the buffers, defaults to MEMORY_BUDGET
+    @param directory: The directory of the temporary files, defaults to the system's temporary directory
+
+    @return: The memory-mapped logits of the sum
+    """
+    memory_budget = MEMORY_BUDGET if memory_budget is None else memory_budget
+    n1, n2 = factor_length(signal_length)
+    column_chunk, row_chunk = chunk_sizes(n1, n2, memory_budget)
+    chunk = memory_budget // BYTES_PER_ELEMENT
+    scale1 = streaming_logsumexp(p1, chunk)
+    scale2 = streaming_logsumexp(p2, chunk)
+
+    spectrum = memmap(directory, (n2, n1), np.complex128)
+    other = memmap(directory, (n2, n1), np.complex128)
+    column_pass(p1, scale1, spectrum, column_chunk)
+    column_pass(p2, scale2, other, column_chunk)
+    row_pass(spectrum, other, row_chunk)
+    del other
+    logits = memmap(directory, (n2, n1), np.float64)
+    inverse_column_pass(spectrum, scale1 + scale2, logits, column_chunk)
+    return logits.reshape(-1)[:signal_length]
+
+
+class StreamingPInt:
+    """
+    A probabilistic integer whose float64 logits are held in a memory-mapped array, for domains too large for
+    the memory. Additions are streaming convolutions whose buffers are bounded by memory_budget (in bytes), and
+    their results are written to temporary files in directory, which are removed once their logits are not
+    referenced anymore.
+    Unlike PInt, the logits are not renormalised, as this would need another pass over them.
+    """
+
+    def __init__(self, logits, lower, memory_budget=None, directory=None):
+        self.logits = logits
+        self.lower = int(lower)
+        self.memory_budget = MEMORY_BUDGET if memory_budget is None else memory_budget
+        self.directory = directory
+
+    @classmethod
+    def from_file(cls, path, lower, memory_budget=None, directory=None):
+        """Maps the logits saved with np.save to the file path, which is not removed with the StreamingPInt."""
+        logits = np.load(path, mmap_mode="r")
+        return cls(logits, lower, memory_budget, directory)
+
+    @classmethod
+    def from_pint(cls, x, memory_budget=None, directory=None):
+        """Writes the logits of an unbatched PInt (of either backend) to a temporary file."""
+        logits = memmap(directory, (x.cardinality,), np.float64)
+        logits[:] = np.asarray(x.logits, dtype=np.float64)
+        logits.flush()
+        return cls(logits, x.lower, memory_budget, directory)
+
+    def to_pint(self):
+        """Loads the logits into the memory as a PInt of the NumPy backend."""
+        return PInt(np.asarray(self.logits), self.lower)
+
+    @property
+    def cardinality(self):
+        return self.logits.shape[-1]
+
+    @property
+    def upper(self):
+        return self.lower + self.cardinality - 1
+
+    def __add__(self, other):
+        if isinstance(other, StreamingPInt):
+            cardinality = self.cardinality + other.cardinality - 1
+            logits = streaming_log_convolution(
+                self.logits,
+                other.logits,
+                cardinality,
+                min(self.memory_budget, other.memory_budget),
+                self.directory,
+            )
+            return StreamingPInt(
+                logits,
+                self.lower + other.lower,
+                self.memory_budget,
+                self.directory,
+            )
+        elif isinstance(other, int):
+            return StreamingPInt(
+                self.logits, self.lower + other, self.memory_budget, self.directory
+            )
+        else:
+            raise NotImplementedError()
+
+    def __radd__(self, other):
+        return self + other
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(lower:{self.lower}, upper:{self.upper})"
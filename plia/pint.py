@@ -1,15 +1,63 @@
+import math
 import tensorflow as tf
 
 from .arithmetics import (
     EPSILON,
     addPIntPInt,
-    multiplyPIntInt,
+    dilate_logits,
     floordividePIntInt,
     modPIntInt,
+    divmodPIntInt,
+    multiplyPIntPInt,
     sumreduceKrat,
+    ltPIntPInt,
+    eqPIntPInt,
+    addPIntModPIntMod,
+    multiplyPIntModInt,
+    sumreduceRaggedKrat,
+    ragged_log_softmax,
+    prune_logits,
+    fft_length,
+    log_spectrum,
+    addSpectra,
+    spectrum_log_pmf,
+    moments,
+    quantilePInt,
+    positive_stride,
 )
 
 
+class Pruning:
+    """
+    Context manager that trims negligible tails off every PInt constructed inside of it, which bounds the size
+    of the supports (and hence of the FFTs) in long chains of operations. The log-mass discarded over the whole
+    context, maximised over the batch, is accumulated in `discarded`.
+
+    Pruning inspects the values of the logits and therefore requires eager execution.
+    """
+
+    active = None
+
+    def __init__(self, threshold=EPSILON, top_k=None):
+        self.log_threshold = None if threshold is None else math.log(threshold)
+        self.top_k = top_k
+        self.discarded = -math.inf
+
+    def update(self, discarded):
+        discarded = float(tf.math.reduce_max(discarded))
+        self.discarded = float(
+            tf.experimental.numpy.logaddexp(self.discarded, discarded)
+        )
+
+    def __enter__(self):
+        self.previous = Pruning.active
+        Pruning.active = self
+        return self
+
+    def __exit__(self, *args):
+        Pruning.active = self.previous
+
+
 class PArray:
 
     def __init__(self, logits, lower):
@@ -29,42 +77,177 @@ class PArray:
 
 
 class PInt(PArray):
+    """
+    A probabilistic integer whose values are offset + stride * i for every index i of its compact logits.
+    Multiplying by a constant, negating and shifting only change the offset and (signed) stride, the dense
+    logits over [lower, upper] are only materialised when they are accessed.
+    """
 
-    def __init__(self, logits, lower, log_input=True):
+    def __init__(self, logits, lower, log_input=True, stride=1):
         if not log_input:
             logits = tf.math.log(logits + EPSILON)
-        logits = tf.nn.log_softmax(logits, axis=-1)
-        super().__init__(logits, lower)
+        self.compact_logits = tf.nn.log_softmax(logits, axis=-1)
+        self.offset = lower
+        self.stride = stride
+        self.dense_logits = None
+        self.pruned = None
+        if Pruning.active is not None:
+            self._prune(Pruning.active.log_threshold, Pruning.active.top_k)
+            Pruning.active.update(self.pruned)
+
+    def _affine(self, offset, stride):
+        x = PInt.__new__(PInt)
+        x.compact_logits = self.compact_logits
+        x.offset = offset
+        x.stride = stride
+        x.dense_logits = self.dense_logits if stride == self.stride else None
+        x.pruned = None
+        return x
+
+    @property
+    def logits(self):
+        if self.stride == 1:
+            return self.compact_logits
+        if self.dense_logits is None:
+            logits = self.compact_logits
+            if self.stride < 0:
+                logits = tf.reverse(logits, axis=[-1])
+            self.dense_logits = dilate_logits(logits, abs(self.stride))
+        return self.dense_logits
+
+    @logits.setter
+    def logits(self, logits):
+        self.offset = self.lower
+        self.stride = 1
+        self.compact_logits = logits
+        self.dense_logits = None
+
+    @property
+    def lower(self):
+        return self.offset + min(0, self.stride * (self.compact_logits.shape[-1] - 1))
+
+    @property
+    def upper(self):
+        return self.offset + max(0, self.stride * (self.compact_logits.shape[-1] - 1))
+
+    @property
+    def cardinality(self):
+        return self.upper - self.lower + 1
+
+    def _prune(self, log_threshold=None, top_k=None):
+        logits, start, self.pruned = prune_logits(
+            self.compact_logits, 0, log_threshold, top_k
+        )
+        self.compact_logits = tf.nn.log_softmax(logits, axis=-1)
+        self.offset = self.offset + self.stride * start
+        self.dense_logits = None
+
+    def prune(self, threshold=EPSILON, top_k=None):
+        """
+        Removes the leading and trailing values of the support whose probability lies below the threshold.
+
+        @param threshold: Values less probable than this for every batch element are discarded
+        @param top_k: If given, only the most probable window of top_k consecutive values is kept
+
+        @return: The pruned probabilistic integer, the discarded log-mass is stored in its `pruned` attribute
+        """
+        x = self._affine(self.offset, self.stride)
+        x._prune(None if threshold is None else math.log(threshold), top_k)
+        return x
+
+    def moments(self, order):
+        """
+        The raw moments E[X], ..., E[X^order] (in float64) computed in a single pass over the logits.
+
+        @param order: The highest moment
+        """
+        return moments(self, order)
+
+    def mean(self):
+        return moments(self, 1)[..., 0]
+
+    def variance(self):
+        shifted = moments(self._affine(0, self.stride), 2)
+        return shifted[..., 1] - shifted[..., 0] ** 2
+
+    def cdf(self, value=None):
+        """
+        The cumulative distribution function of the probabilistic integer.
+
+        @param value: If given, P(X <= value) is returned, otherwise P(X <= v) for every v in [lower, upper]
+        """
+        if value is None:
+            return tf.math.exp(tf.math.cumulative_logsumexp(self.logits, axis=-1))
+        logits, lower, stride = positive_stride(self)
+        if value < lower:
+            return tf.zeros_like(logits[..., 0])
+        logits = logits[..., : (value - lower) // stride + 1]
+        return tf.math.exp(tf.reduce_logsumexp(logits, axis=-1))
+
+    def quantile(self, q):
+        """
+        The smallest values v with P(X <= v) >= q.
+
+        @param q: A probability or a list of probabilities
+        """
+        return quantilePInt(self, q)
+
+    def mode(self):
+        return self.offset + self.stride * tf.math.argmax(
+            self.compact_logits, axis=-1, output_type=tf.int32
+        )
+
+    def describe(self, quantiles=(0.25, 0.5, 0.75)):
+        """
+        Mean, variance, mode and quantiles of the probabilistic integer, sharing one pass over the logits for all
+        moments.
+        """
+        shifted = moments(self._affine(0, self.stride), 2)
+        return {
+            "mean": shifted[..., 0] + self.offset,
+            "variance": shifted[..., 1] - shifted[..., 0] ** 2,
+            "mode": self.mode(),
+            "quantiles": self.quantile(list(quantiles)),
+        }
+
+    def to_spectral(self, signal_length=None):
+        """
+        Moves the probabilistic integer to the Fourier domain, such that subsequent additions are pointwise products.
+
+        @param signal_length: The largest cardinality expected in the chain of additions, which fixes the FFT length
+        """
+        return SpectralPInt.from_pint(self, signal_length)
 
     def __add__(self, other):
         if isinstance(other, PInt):
-            logits, lower = addPIntPInt(self, other)
-            return PInt(logits, lower=lower)
+            logits, lower, stride = addPIntPInt(self, other)
+            return PInt(logits, lower=lower, stride=stride)
+        elif isinstance(other, SpectralPInt):
+            return other + self
         elif isinstance(other, int):
-            return PInt(self.logits, lower=self.lower + other)
+            return self._affine(self.offset + other, self.stride)
         else:
             raise NotImplementedError()
 
     def __neg__(self):
-        return PInt(self.logits[::-1], lower=-self.upper)
+        return self._affine(-self.offset, -self.stride)
 
     def __sub__(self, other):
-        if isinstance(other, (PInt, int)):
+        if isinstance(other, (PInt, SpectralPInt, int)):
             return self + (-other)
         else:
             raise NotImplementedError()
 
-    def __mul__(self, other: int):
-        if isinstance(other, int):
-            if other == 1:
-                return self
-            elif other == 0:
+    def __mul__(self, other):
+        if isinstance(other, PInt):
+            logits, lower, stride = multiplyPIntPInt(self, other)
+            return PInt(logits, lower, stride=stride)
+        elif isinstance(other, SpectralPInt):
+            return self * other.to_pint()
+        elif isinstance(other, int):
+            if other == 0:
                 return 0
-            elif other < 0:
-                return -self * (-other)
-            else:
-                logits, lower = multiplyPIntInt(self, other)
-            return PInt(logits, lower)
+            return self._affine(self.offset * other, self.stride * other)
         else:
             raise NotImplementedError()
 
@@ -85,6 +268,15 @@ class PInt(PArray):
         else:
             raise NotImplementedError()
 
+    def __divmod__(self, other):
+        if isinstance(other, int) and other > 0:
+            (q_logits, q_lower), (r_logits, r_lower) = divmodPIntInt(self, other)
+            return PInt(q_logits, q_lower), PInt(r_logits, r_lower)
+        elif isinstance(other, int) and other < 0:
+            raise ValueError("Modulo operator is not defined for negative integers.")
+        else:
+            raise NotImplementedError()
+
     def __radd__(self, other):
         return self + other
 
@@ -97,7 +289,18 @@ class PInt(PArray):
     # TODO implement comparisons using total order
     # https://docs.python.org/3.6/library/functools.html#functools.total_ordering
     def __lt__(self, other):
-        if isinstance(other, (int, tf.Tensor, PInt)):
+        if isinstance(other, SpectralPInt):
+            other = other.to_pint()
+        if isinstance(other, PInt):
+            lower = self.lower - other.upper
+            if lower >= 0:
+                return False
+            return PIverson.deferred(
+                ltPIntPInt(self, other),
+                lambda: (self - other).logits[..., : abs(lower)],
+                lower,
+            )
+        elif isinstance(other, (int, tf.Tensor)):
             x = self - other
             if x.lower >= 0:
                 return False
@@ -129,7 +332,18 @@ class PInt(PArray):
         return self < other + 1
 
     def __eq__(self, other):
-        if isinstance(other, (int, tf.Tensor, PInt)):
+        if isinstance(other, SpectralPInt):
+            other = other.to_pint()
+        if isinstance(other, PInt):
+            lower = self.lower - other.upper
+            if lower > 0 or self.upper - other.lower < 0:
+                return False
+            return PIverson.deferred(
+                eqPIntPInt(self, other),
+                lambda: (self - other).logits[..., abs(lower) : abs(lower) + 1],
+                0,
+            )
+        elif isinstance(other, (int, tf.Tensor)):
             x = self - other
             if x.lower > 0 or x.upper < 0:
                 return False
@@ -140,20 +354,233 @@ class PInt(PArray):
             raise NotImplementedError()
 
     def __ne__(self, other):
-        if isinstance(other, (int, tf.Tensor, PInt)):
-            return -(self == other)
+        if isinstance(other, (int, tf.Tensor, PInt, SpectralPInt)):
+            equal = self == other
+            return True if equal is False else -equal
         else:
             raise NotImplementedError()
 
 
+class SpectralPInt:
+    """
+    A probabilistic integer resident in the Fourier domain: the real FFT of its PMF at a fixed length n, with the
+    log-scale of the PMF tracked separately. Adding probabilistic integers multiplies spectra pointwise, the logits
+    are only recovered (with a single inverse FFT) when they are accessed or a non-additive operation needs them.
+    Once a sum outgrows n, it is transformed back and forth once to twice the length.
+    """
+
+    def __init__(self, spectrum, scale, lower, cardinality, n):
+        self.spectrum = spectrum
+        self.scale = scale
+        self.lower = lower
+        self.cardinality = cardinality
+        self.n = n
+        self.pint = None
+
+    @classmethod
+    def from_pint(cls, x, signal_length=None):
+        n = fft_length(max(x.cardinality, signal_length or 0))
+        spectrum, scale = log_spectrum(x, n)
+        return cls(spectrum, scale, x.lower, x.cardinality, n)
+
+    @property
+    def upper(self):
+        return self.lower + self.cardinality - 1
+
+    @property
+    def logits(self):
+        return self.to_pint().logits
+
+    def to_pint(self):
+        if self.pint is None:
+            logits = spectrum_log_pmf(
+                self.spectrum, self.scale, self.n, self.cardinality
+            )
+            self.pint = PInt(logits, self.lower)
+        return self.pint
+
+    def __add__(self, other):
+        if isinstance(other, int):
+            x = SpectralPInt(
+                self.spectrum, self.scale, self.lower + other, self.cardinality, self.n
+            )
+            x.pint = None if self.pint is None else self.pint + other
+            return x
+        elif isinstance(other, PInt):
+            other = SpectralPInt.from_pint(other, self.n)
+        elif not isinstance(other, SpectralPInt):
+            raise NotImplementedError()
+
+        x1, x2 = self, other
+        cardinality = x1.cardinality + x2.cardinality - 1
+        n = max(x1.n, x2.n)
+        if cardinality > n:
+            n = fft_length(max(cardinality, 2 * n))
+        if x1.n != n:
+            x1 = SpectralPInt.from_pint(x1.to_pint(), n)
+        if x2.n != n:
+            x2 = SpectralPInt.from_pint(x2.to_pint(), n)
+
+        spectrum, scale = addSpectra(x1, x2)
+        return SpectralPInt(spectrum, scale, x1.lower + x2.lower, cardinality, n)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __neg__(self):
+        return -self.to_pint()
+
+    def __mul__(self, other):
+        return self.to_pint() * other
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __floordiv__(self, other):
+        return self.to_pint() // other
+
+    def __mod__(self, other):
+        return self.to_pint() % other
+
+    def __divmod__(self, other):
+        return divmod(self.to_pint(), other)
+
+    def __lt__(self, other):
+        return self.to_pint() < other
+
+    def __le__(self, other):
+        return self.to_pint() <= other
+
+    def __gt__(self, other):
+        return self.to_pint() > other
+
+    def __ge__(self, other):
+        return self.to_pint() >= other
+
+    def __eq__(self, other):
+        return self.to_pint() == other
+
+    def __ne__(self, other):
+        return self.to_pint() != other
+
+    __hash__ = object.__hash__
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(lower:{self.lower}, upper:{self.upper})"
+
+
+class PIntMod(PArray):
+    """
+    A probabilistic integer in Z_n, with its logits ranging over the residues 0, ..., n - 1. Additions and
+    multiplications by constants stay in Z_n, so chains of them keep a constant size.
+    """
+
+    def __init__(self, logits, log_input=True):
+        if not log_input:
+            logits = tf.math.log(logits + EPSILON)
+        logits = tf.nn.log_softmax(logits, axis=-1)
+        super().__init__(logits, 0)
+
+    @classmethod
+    def from_pint(cls, x, modulus):
+        return cls((x % modulus).logits)
+
+    @property
+    def modulus(self):
+        return self.cardinality
+
+    def to_pint(self):
+        return PInt(self.logits, 0)
+
+    def __add__(self, other):
+        if isinstance(other, PIntMod):
+            return PIntMod(addPIntModPIntMod(self, other))
+        elif isinstance(other, PInt):
+            return self + PIntMod.from_pint(other, self.modulus)
+        elif isinstance(other, int):
+            return PIntMod(tf.roll(self.logits, shift=other % self.modulus, axis=-1))
+        else:
+            raise NotImplementedError()
+
+    def __neg__(self):
+        return self * -1
+
+    def __sub__(self, other):
+        if isinstance(other, (PIntMod, PInt, int)):
+            return self + (-other)
+        else:
+            raise NotImplementedError()
+
+    def __mul__(self, other: int):
+        if isinstance(other, int):
+            return PIntMod(multiplyPIntModInt(self, other))
+        else:
+            raise NotImplementedError()
+
+    def __radd__(self, other):
+        return self + other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __rmul__(self, other: int):
+        return self * other
+
+    def __eq__(self, other):
+        if isinstance(other, int):
+            residue = other % self.modulus
+            return PIverson(self.logits[..., residue : residue + 1], 0)
+        else:
+            raise NotImplementedError()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(modulus:{self.modulus})"
+
+
 class PIverson(PArray):
+    """
+    The indicator of a comparison of probabilistic integers, holding the logits of the values that satisfy it.
+    Comparisons between two PInts compute the log-probability of the comparison with a linear-time kernel
+    instead, the logits are then only computed (with a convolution) when they are accessed.
+    """
 
-    def __init__(self, logits, lower, negated=False):
+    def __init__(self, logits, lower, negated=False, log_probability=None):
         super().__init__(logits, lower)
         self.negated = negated
+        self.log_probability = log_probability
+
+    @classmethod
+    def deferred(cls, log_probability, logits, lower, negated=False):
+        """
+        @param log_probability: The log-probability of the comparison (before negation)
+        @param logits: A function computing the logits of the values that satisfy the comparison
+        @param lower: The lower bound of those values
+        """
+        x = cls(None, lower, negated, log_probability)
+        x.materialize = logits
+        return x
+
+    @property
+    def logits(self):
+        if self._logits is None and self.materialize is not None:
+            self._logits = self.materialize()
+        return self._logits
 
-    def __neg__(self, x):
-        return PIverson(x.logits, x.lower, negated=True)
+    @logits.setter
+    def logits(self, logits):
+        self._logits = logits
+        self.materialize = None
+
+    def __neg__(self):
+        return PIverson.deferred(
+            self.log_probability, lambda: self.logits, self.lower, not self.negated
+        )
 
 
 class Krat(PArray):
@@ -170,3 +597,60 @@ class Krat(PArray):
     def sum_reduce(self):
         logits, lower = sumreduceKrat(self)
         return PInt(logits, lower)
+
+
+class RaggedKrat:
+    """
+    A tensor of probabilistic integers that each have their own lower bound and cardinality. The logits of all
+    random variables are concatenated along the last axis, with row_splits holding the offset of each of them.
+    """
+
+    def __init__(self, values, row_splits, lowers, log_input=True):
+        if not log_input:
+            values = tf.math.log(values + EPSILON)
+        self.row_splits = [int(split) for split in row_splits]
+        self.values = ragged_log_softmax(values, self.row_splits)
+        self.lowers = [int(lower) for lower in lowers]
+
+    @classmethod
+    def from_pints(cls, pints):
+        batch_shape = pints[0].logits.shape[:-1]
+        for x in pints[1:]:
+            batch_shape = tf.broadcast_static_shape(batch_shape, x.logits.shape[:-1])
+
+        values = [
+            tf.broadcast_to(x.logits, batch_shape + x.logits.shape[-1:]) for x in pints
+        ]
+        row_splits = [0]
+        for x in pints:
+            row_splits.append(row_splits[-1] + x.cardinality)
+        return cls(tf.concat(values, axis=-1), row_splits, [x.lower for x in pints])
+
+    @property
+    def n_rvs(self):
+        return len(self.lowers)
+
+    @property
+    def cardinalities(self):
+        return [
+            end - start for start, end in zip(self.row_splits[:-1], self.row_splits[1:])
+        ]
+
+    @property
+    def uppers(self):
+        return [
+            lower + card - 1 for lower, card in zip(self.lowers, self.cardinalities)
+        ]
+
+    def __getitem__(self, i):
+        return PInt(
+            self.values[..., self.row_splits[i] : self.row_splits[i + 1]],
+            self.lowers[i],
+        )
+
+    def sum_reduce(self):
+        logits, lower = sumreduceRaggedKrat(self)
+        return PInt(logits, lower)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(n_rvs:{self.n_rvs}, lower:{sum(self.lowers)}, upper:{sum(self.uppers)})"
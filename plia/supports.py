@@ -0,0 +1,133 @@
+import math
+import functools
+import numpy as np
+
+# Arithmetic on the supports (bounds, strides and indices) of probabilistic integers, shared by the TensorFlow
+# and the NumPy backend. It only uses Python integers and NumPy index arrays, the kernels of both backends apply
+# the array operations to the logits.
+
+
+def product_support(offset1, stride1, card1, offset2, stride2, card2):
+    """
+    Lower bound, stride and cardinality of the product of the values offset1 + stride1 * i and
+    offset2 + stride2 * j, for i < card1 and j < card2.
+    """
+    corners = [
+        (offset1 + stride1 * i) * (offset2 + stride2 * j)
+        for i in (0, card1 - 1)
+        for j in (0, card2 - 1)
+    ]
+    lower, upper = min(corners), max(corners)
+
+    # products differ from offset1 * offset2 by multiples of these terms
+    stride = 0
+    if card2 > 1:
+        stride = math.gcd(stride, offset1 * stride2)
+    if card1 > 1:
+        stride = math.gcd(stride, offset2 * stride1)
+    if card1 > 1 and card2 > 1:
+        stride = math.gcd(stride, stride1 * stride2)
+    stride = max(stride, 1)
+    return lower, stride, (upper - lower) // stride + 1
+
+
+def product_segments(offset1, stride1, rows, offset2, stride2, card2, lower, stride):
+    values1 = offset1 + stride1 * np.arange(*rows)
+    values2 = offset2 + stride2 * np.arange(card2)
+    products = values1[:, None] * values2[None, :]
+    return ((products - lower) // stride).reshape(-1)
+
+
+@functools.lru_cache(maxsize=128)
+def product_table(offset1, stride1, card1, offset2, stride2, card2):
+    """
+    Index of the product value of every pair of values of two probabilistic integers, cached per pair of domains.
+    """
+    lower, stride, cardinality = product_support(
+        offset1, stride1, card1, offset2, stride2, card2
+    )
+    segments = product_segments(
+        offset1, stride1, (0, card1), offset2, stride2, card2, lower, stride
+    )
+    return segments, lower, stride, cardinality
+
+
+def affine_targets(lower, upper, segments):
+    """
+    Index of the result of every value in [lower, upper] under the affine maps of the segments, values outside
+    of the segments are mapped to the extra index cardinality, which the kernels discard.
+
+    @param lower: The lower bound of the probabilistic integer
+    @param upper: The upper bound of the probabilistic integer
+    @param segments: The (start, end, a, b) tuples mapping the values v in [start, end) to a * v + b
+
+    @return: The indices, the lower bound and the cardinality of the result
+    """
+    values = np.arange(lower, upper + 1)
+    targets = np.zeros(values.shape, dtype=np.int64)
+    covered = np.zeros(values.shape, dtype=bool)
+    for start, end, a, b in segments:
+        mask = (start <= values) & (values < end)
+        targets[mask] = a * values[mask] + b
+        covered |= mask
+    lower, upper = int(targets[covered].min()), int(targets[covered].max())
+    cardinality = upper - lower + 1
+    return np.where(covered, targets - lower, cardinality), lower, cardinality
+
+
+def survival_window(x1, x2):
+    """
+    The window of the survival function P(X2 > v) of X2 over the values v of X1, as the start and end indices into
+    the survival function and the number of values before its first (probability one) and after its last
+    (probability zero) index.
+    """
+    # log P(X2 > v) for v in [x1.lower, x1.upper] starts at index x1.lower + 1 - x2.lower of the survival function
+    start = x1.lower + 1 - x2.lower
+    end = start + x1.cardinality
+    return start, end, max(0, -start), max(0, end - x2.cardinality)
+
+
+def overlap_slices(x1, x2):
+    """The slices of the logits of two probabilistic integers over the values both of them can take."""
+    lower, upper = max(x1.lower, x2.lower), min(x1.upper, x2.upper)
+    return (
+        slice(lower - x1.lower, upper - x1.lower + 1),
+        slice(lower - x2.lower, upper - x2.lower + 1),
+    )
+
+
+def piecewise_segments(lower, upper, thresholds, branches):
+    """
+    Partitions the support [lower, upper] of the variable of a piecewise function into the non-empty segments of
+    its branches.
+
+    @return: The (start, end, a, b) tuples of the constant and affine branches and the (start, end, branch) tuples
+    of the branches that are functions
+    """
+    if len(branches) != len(thresholds) + 1:
+        raise ValueError("A piecewise function needs one branch more than thresholds")
+
+    bounds = [lower] + [min(max(t, lower), upper + 1) for t in thresholds] + [upper + 1]
+    affine, functions = [], []
+    for start, end, branch in zip(bounds[:-1], bounds[1:], branches):
+        if start >= end:
+            continue
+        elif isinstance(branch, int):
+            affine.append((start, end, 0, branch))
+        elif isinstance(branch, tuple):
+            affine.append((start, end, *branch))
+        else:
+            functions.append((start, end, branch))
+    return affine, functions
+
+
+def mixture_paddings(outputs):
+    """
+    The lower bound of the mixture of the (logits, lower) outputs of the branches of a piecewise function, and the
+    lower and upper padding aligning the logits of every output to its support.
+    """
+    lower = min(l for _, l in outputs)
+    upper = max(l + logits.shape[-1] - 1 for logits, l in outputs)
+    return lower, [
+        (l - lower, upper - l - logits.shape[-1] + 1) for logits, l in outputs
+    ]
@@ -0,0 +1,40 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia
+from plia import PInt
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def dense(x):
+    return PInt(x.logits, x.lower)
+
+
+def main():
+    x = PInt(tf.random.uniform((3, 10)), 2)
+    y = PInt(tf.random.uniform((3, 7)), -3)
+
+    for a, b in [(10, 1), (-3, 2), (100, 10), (4, -6)]:
+        affine = x * a + y * b
+        reference = dense(x * a) + dense(y * b)
+        print(f"x * {a} + y * {b}:", affine, "stride:", affine.stride, reference)
+        tf.debugging.assert_near(tf.exp(affine.logits), tf.exp(reference.logits))
+
+    digits = [PInt(tf.random.uniform((3, 10)), 0) for _ in range(4)]
+    number = plia.sum([d * 10**i for i, d in enumerate(digits)])
+    reference = dense(digits[0])
+    for i, d in enumerate(digits[1:], start=1):
+        reference = reference + dense(d * 10**i)
+    print(number, reference)
+    tf.debugging.assert_near(tf.exp(number.logits), tf.exp(reference.logits))
+
+
+if __name__ == "__main__":
+    main()
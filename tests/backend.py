@@ -0,0 +1,97 @@
+import os
+import sys
+import subprocess
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia
+import plia.numpy
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def to_tensorflow(x):
+    return plia.PInt(tf.constant(x.logits, dtype=tf.float32), x.lower)
+
+
+def assert_close(x, y, atol=1e-6):
+    assert x.lower == y.lower and x.upper == y.upper
+    np.testing.assert_allclose(np.exp(x.logits), np.exp(y.logits), atol=atol)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    x = plia.numpy.PInt(rng.normal(size=(3, 50)), -5)
+    y = plia.numpy.PInt(rng.normal(size=(200,)), 7)
+    large = plia.numpy.PInt(rng.normal(size=(2, 30000)), 0)
+    tx, ty, tlarge = to_tensorflow(x), to_tensorflow(y), to_tensorflow(large)
+
+    # Arithmetic matches the TensorFlow backend, for direct and FFT convolutions
+    assert_close(x + y, tx + ty)
+    assert_close(large + large, tlarge + tlarge)
+    assert_close(x - y + 3, tx - ty + 3)
+    assert_close(x * y, tx * ty)
+    assert_close(x * -3, tx * -3)
+    assert_close((x * 2) * (x * 3 + 1), (tx * 2) * (tx * 3 + 1))
+    assert_close(plia.numpy.PInt([0.0], 4) * y, plia.PInt(tf.zeros(1), 4) * ty)
+    assert_close(x // 4, tx // 4)
+    assert_close(x % 7, tx % 7)
+    assert_close(plia.numpy.sum([x, y, 3, x]), plia.sum([tx, ty, 3, tx]))
+
+    krat = plia.numpy.Krat(rng.normal(size=(4, 30, 10)), 2)
+    tkrat = plia.Krat(tf.constant(krat.logits, dtype=tf.float32), 2)
+    assert_close(krat.sum_reduce(), tkrat.sum_reduce())
+
+    branches = [(2, 1), lambda v: v // 2, 7]
+    assert_close(
+        plia.numpy.piecewise(x, [0, 20], branches),
+        plia.piecewise(tx, [0, 20], branches),
+    )
+    double = [lambda v: 2 * v, lambda v: 2 * v - 9]
+    digit = plia.numpy.PInt(rng.normal(size=(10,)), 0)
+    assert_close(
+        plia.numpy.ifthenelse(digit, 5, *double),
+        plia.ifthenelse(to_tensorflow(digit), 5, *double),
+    )
+
+    # So do the log-expectations of PInts and of their comparisons
+    log_expectation = plia.numpy.log_expectation
+    np.testing.assert_allclose(log_expectation(y), plia.log_expectation(ty), atol=1e-5)
+    for op in ["__lt__", "__le__", "__gt__", "__ge__", "__eq__", "__ne__"]:
+        for other, tother in [(y, ty), (20, 20), (-100, -100)]:
+            expected = plia.log_expectation(getattr(tx, op)(tother))
+            result = log_expectation(getattr(x, op)(other))
+            np.testing.assert_allclose(
+                np.exp(result), np.exp(expected), atol=1e-6, err_msg=op
+            )
+
+    # Gradients go through the TensorFlow backend
+    assert isinstance(x.to_tensorflow(), plia.PInt)
+    assert_close(plia.numpy.PInt.from_tensorflow(tx), tx)
+
+    # Neither the NumPy backend nor plia itself import TensorFlow until a TensorFlow name is used
+    code = "import sys, plia.numpy, plia; print('tensorflow' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT_PATH, capture_output=True, text=True
+    )
+    assert output.stdout.strip() == "False", output.stderr
+
+    code = "import plia; print(plia.PInt.__module__)"
+    env = dict(os.environ, PLIA_BACKEND="numpy")
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT_PATH,
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    assert output.stdout.strip() == "plia.numpy.pint", output.stderr
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import random
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia
+from plia import PInt, PIntBatch, log_expectation
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def program(x, y, c):
+    return x - y + 2 < c
+
+
+def main():
+    queries = []
+    for _ in range(50):
+        x = PInt(tf.random.uniform((random.randint(1, 70),)), random.randint(-20, 20))
+        y = PInt(tf.random.uniform((random.randint(1, 40),)), random.randint(-20, 20))
+        queries.append((x, y, random.randint(-30, 30)))
+
+    # Comparisons are scattered back per query
+    results = plia.execute(program, queries)
+    for query, result in zip(queries, results):
+        expected = tf.exp(log_expectation(program(*query)))
+        tf.debugging.assert_near(tf.exp(log_expectation(result)), expected, atol=1e-5)
+
+    # Probabilistic integers are trimmed back to their own bounds
+    results = plia.execute(lambda x, y, c: x - y + c, queries)
+    for (x, y, c), result in zip(queries, results):
+        expected = x - y + c
+        assert (result.lower, result.upper) == (expected.lower, expected.upper)
+        tf.debugging.assert_near(tf.exp(result.logits), tf.exp(expected.logits))
+
+    # Tensors with one entry per example
+    x, y = queries[0][0], queries[1][0]
+    batch = PIntBatch.from_pints([x, y])
+    expectations = log_expectation(batch + 30)
+    tf.debugging.assert_near(expectations[0], log_expectation(x + 30))
+    tf.debugging.assert_near(expectations[1], log_expectation(y + 30))
+
+
+if __name__ == "__main__":
+    main()
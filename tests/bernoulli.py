@@ -0,0 +1,80 @@
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import Krat
+from plia.arithmetics import multi_log_convolution, BERNOULLI_GROUP_LENGTH
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def reference(logits):
+    """The Poisson-binomial PMF of every row of logits of shape [..., n_rvs, 2] in float64."""
+    p = np.exp(logits.numpy().astype(np.float64))
+    p = p / p.sum(-1, keepdims=True)
+    pmf = np.ones(p.shape[:-2] + (1,))
+    for i in range(p.shape[-2]):
+        failure, success = p[..., i, :1], p[..., i, 1:]
+        pmf = np.concatenate([pmf * failure, np.zeros_like(failure)], -1) + (
+            np.concatenate([np.zeros_like(success), pmf * success], -1)
+        )
+    return pmf
+
+
+def main():
+    # Sums of Bernoulli Krats, with and without groups, match the float64 Poisson-binomial PMF and the FFT
+    for n_rvs in [1, 2, 9, BERNOULLI_GROUP_LENGTH, BERNOULLI_GROUP_LENGTH + 1, 100]:
+        krat = Krat(tf.random.normal((3, 2, n_rvs, 2)), -2)
+        x = krat.sum_reduce()
+        assert x.lower == -2 * n_rvs and x.upper == -n_rvs
+        expected = reference(krat.logits)
+        np.testing.assert_allclose(np.exp(x.logits.numpy()), expected, atol=1e-6)
+        tf.debugging.assert_near(
+            tf.exp(x.logits),
+            tf.exp(multi_log_convolution(krat.logits, n_rvs + 1)),
+            atol=1e-5,
+        )
+
+    # Within a single group, unlikely outcomes keep their relative precision far below the floor of the FFT, down
+    # to the smallest normal float
+    krat = Krat(
+        tf.math.log_softmax(
+            tf.random.normal((4, BERNOULLI_GROUP_LENGTH, 2)) + [2.0, -2.0]
+        ),
+        0,
+    )
+    expected = np.log(reference(krat.logits))
+    assert np.all(expected[..., -1] < np.log(1e-20))
+    np.testing.assert_allclose(krat.sum_reduce().logits.numpy(), expected, rtol=1e-4)
+
+    # Gradients match those through the FFT
+    logits = tf.math.log_softmax(tf.random.normal((5, 40, 2)))
+    gradients = []
+    for kernel in [
+        lambda p: Krat(p, 0).sum_reduce().logits,
+        lambda p: multi_log_convolution(tf.nn.log_softmax(p), 41),
+    ]:
+        with tf.GradientTape() as tape:
+            tape.watch(logits)
+            loss = tf.reduce_sum(tf.exp(kernel(logits)) * tf.range(41.0) ** 2)
+        gradients.append(tape.gradient(loss, logits))
+    tf.debugging.assert_near(gradients[0], gradients[1], atol=1e-3)
+
+    # Gradients remain finite for deterministic random variables
+    logits = tf.constant([[0.0, -np.inf], [-np.inf, 0.0], [0.3, -0.2]] * 12)
+    with tf.GradientTape() as tape:
+        tape.watch(logits)
+        x = Krat(logits, 0).sum_reduce()
+        loss = x.logits[12] + x.logits[20]
+    assert np.isfinite(tape.gradient(loss, logits).numpy()).all()
+    np.testing.assert_allclose(np.exp(x.logits.numpy()), reference(logits), atol=1e-6)
+
+
+if __name__ == "__main__":
+    main()
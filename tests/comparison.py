@@ -0,0 +1,64 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import PInt, log_expectation
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def main():
+    x = PInt(tf.random.uniform((3, 20)), -4)
+    for y in [
+        PInt(tf.random.uniform((3, 7)), 3),
+        PInt(tf.random.uniform((1, 40)), -30),
+        2 * PInt(tf.random.uniform((3, 5)), -10),
+        PInt(tf.random.uniform((3, 3)), 14),
+    ]:
+        for comparison in [
+            lambda a, b: a < b,
+            lambda a, b: a <= b,
+            lambda a, b: a > b,
+            lambda a, b: a >= b,
+            lambda a, b: a == b,
+        ]:
+            result = comparison(x, y)
+            if result is False:
+                continue
+            # The linear-time log-probability matches the one of the logits of the difference
+            expected = tf.reduce_logsumexp(result.logits, axis=-1)
+            tf.debugging.assert_near(
+                tf.exp(log_expectation(result)), tf.exp(expected), atol=1e-6
+            )
+
+        # Inequality is the complement of equality
+        tf.debugging.assert_near(
+            tf.exp(log_expectation(x != y)), 1.0 - tf.exp(log_expectation(x == y))
+        )
+
+    assert (
+        PInt(tf.random.uniform((5,)), 10) < PInt(tf.random.uniform((5,)), 0)
+    ) is False
+    assert (
+        PInt(tf.random.uniform((5,)), 10) == PInt(tf.random.uniform((5,)), 0)
+    ) is False
+    assert (
+        PInt(tf.random.uniform((5,)), 10) != PInt(tf.random.uniform((5,)), 0)
+    ) is True
+
+    logits = tf.Variable(tf.random.uniform((3, 20)))
+    with tf.GradientTape(persistent=True) as tape:
+        x, y = PInt(logits, 0), PInt(tf.random.uniform((3, 10)), 5)
+        lt = log_expectation(x < y)
+        eq = log_expectation(x == y)
+    tf.debugging.assert_all_finite(tape.gradient(lt, logits), "gradient")
+    tf.debugging.assert_all_finite(tape.gradient(eq, logits), "gradient")
+
+
+if __name__ == "__main__":
+    main()
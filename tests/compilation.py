@@ -0,0 +1,57 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia
+from plia import PInt, Krat, Compilation, log_expectation
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def program(x, y, z):
+    total = x + y + 3 * z
+    return (
+        total,
+        plia.sum([x, y, z]),
+        log_expectation(total),
+        log_expectation(total < 40),
+    )
+
+
+def main():
+    for jit_compile in [False, True]:
+        compilation = Compilation(jit_compile=jit_compile)
+        for card, lower in [(20, 0), (25, -3), (24, 7), (17, 2)]:
+            x = PInt(tf.random.uniform((2, card)), lower + 1)
+            y = PInt(tf.random.uniform((2, card + 3)), lower)
+            z = PInt(tf.random.uniform((2, 5)), 2)
+
+            expected = program(x, y, z)
+            with compilation:
+                result = program(x, y, z)
+
+            for e, r in zip(expected[:2], result[:2]):
+                assert (e.lower, e.upper) == (r.lower, r.upper)
+                tf.debugging.assert_near(tf.exp(e.logits), tf.exp(r.logits), atol=1e-6)
+            for e, r in zip(expected[2:], result[2:]):
+                tf.debugging.assert_near(tf.exp(e), tf.exp(r), atol=1e-5)
+
+        # All cardinalities fall into the same buckets, so every kernel is only traced once
+        print(compilation.report())
+        assert compilation.misses == len(compilation.functions)
+        assert compilation.hits == 3 * compilation.misses
+
+    krat = Krat(tf.random.uniform((2, 4, 10)), 0)
+    with Compilation() as compilation:
+        result = krat.sum_reduce()
+    tf.debugging.assert_near(tf.exp(result.logits), tf.exp(krat.sum_reduce().logits))
+    assert compilation.misses == 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import PInt, PIntMod, ifthenelse, log_expectation
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def double(digit):
+    return ifthenelse(digit, lt=5, tbranch=lambda x: 2 * x, fbranch=lambda x: 2 * x - 9)
+
+
+def main():
+    LENGTH = 8
+
+    digits = [PInt(tf.random.uniform((10,)), 0) for _ in range(LENGTH)]
+
+    check = PInt(tf.convert_to_tensor([0.0]), lower=0)
+    cyclic = PIntMod.from_pint(check, 10)
+    for i, digit in enumerate(digits):
+        if i % 2 == 0:
+            digit = double(digit)
+        check = (check + digit) % 10
+        cyclic = cyclic + digit
+
+    print(check, cyclic)
+    tf.debugging.assert_near(tf.exp(check.logits), tf.exp(cyclic.logits))
+
+    x = PIntMod(tf.random.uniform((4, 7)))
+    for c in [3, -1, 14]:
+        reference = PIntMod.from_pint(x.to_pint() * c, 7)
+        tf.debugging.assert_near(tf.exp((x * c).logits), tf.exp(reference.logits))
+
+    x = PIntMod(tf.random.uniform((4, 12)))
+    for c in [4, -6, 5, 24]:
+        reference = PIntMod.from_pint(x.to_pint() * c, 12)
+        tf.debugging.assert_near(tf.exp((x * c).logits), tf.exp(reference.logits))
+
+    large = PIntMod(tf.random.normal((2, 100000)))
+    for c in [10, 7]:
+        product = large * c
+        assert product.logits.shape == large.logits.shape
+        tf.debugging.assert_near(
+            tf.reduce_logsumexp(product.logits, axis=-1),
+            tf.reduce_logsumexp(large.logits, axis=-1),
+        )
+    tf.debugging.assert_near(
+        tf.reduce_logsumexp(tf.reshape(large.logits, (2, 10, 10000)), axis=-2),
+        (large * 10).logits[:, ::10],
+    )
+
+    large = PIntMod(tf.random.uniform((2, 1000)))
+    reference = PIntMod.from_pint(large.to_pint() + large.to_pint(), 1000)
+    tf.debugging.assert_near(tf.exp((large + large).logits), tf.exp(reference.logits))
+    print(large + 3, tf.exp(log_expectation(large + 3 == 3)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import PInt
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def main():
+    logits = tf.random.uniform((3, 18))
+    x = PInt(logits, -1)
+    const = 4
+
+    quotient, remainder = divmod(x, const)
+
+    print(quotient, remainder)
+    tf.debugging.assert_near(tf.exp(quotient.logits), tf.exp((x // const).logits))
+    tf.debugging.assert_near(tf.exp(remainder.logits), tf.exp((x % const).logits))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import math
+from fractions import Fraction
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia
+from plia.numpy.exact import ExactPInt, exact_convolution
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def reference(counts1, counts2):
+    counts = [0] * (len(counts1) + len(counts2) - 1)
+    for i, c1 in enumerate(counts1):
+        for j, c2 in enumerate(counts2):
+            counts[i + j] += int(c1) * int(c2)
+    return counts
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    # Exact convolutions for small, int64-sized and arbitrarily large counts
+    for card1, card2, high in [
+        (1, 1, 5),
+        (5, 3, 10),
+        (100, 37, 2**30),
+        (64, 200, 2**62),
+    ]:
+        counts1 = rng.integers(0, high, card1, dtype=np.int64)
+        counts2 = rng.integers(0, high, card2, dtype=np.int64)
+        result = exact_convolution(counts1, counts2)
+        assert [int(c) for c in result] == reference(counts1, counts2)
+
+    counts1 = np.array([3**200 + i for i in range(50)], dtype=object)
+    counts2 = np.array([7**90 * i for i in range(20)], dtype=object)
+    assert list(exact_convolution(counts1, counts2)) == reference(counts1, counts2)
+
+    # Transforms longer than the minimal prime length match an int64 convolution
+    counts = rng.integers(0, 2**10, 2**12, dtype=np.int64)
+    assert (exact_convolution(counts, counts) == np.convolve(counts, counts)).all()
+
+    # Exact probabilities of sums of digits, including those below the float floor
+    digit = ExactPInt([1] * 10, 0)
+    total = digit
+    for _ in range(19):
+        total = total + digit
+    assert total.denominator == 10**20
+    assert total.probability(0) == Fraction(1, 10**20)
+    assert sum(total.probabilities) == 1
+    assert math.isclose(total.logits[0], -20 * math.log(10))
+    assert (total < 90) + (total == 90) + (total > 90) == 1
+    assert (total <= 90) == 1 - (total > 90)
+    assert (digit < digit + 1) == Fraction(55, 100)
+
+    # Verifying float results against the exact ones
+    x = plia.PInt(tf.math.log(tf.constant([1.0] * 10)), 0)
+    float_total = x
+    for _ in range(19):
+        float_total = float_total + x
+    assert total.verify(float_total)
+    assert total.max_error(float_total) < 1e-6
+    assert not total.verify(float_total + 1)
+
+    quantized = ExactPInt.from_pint(x, denominator=10)
+    assert list(quantized.counts) == [1] * 10 and quantized.denominator == 10
+
+    # Negation, shifts and scaling keep the counts exact
+    y = ExactPInt([1, 2, 3], -1, denominator=6)
+    assert (-y).probability(1) == Fraction(1, 6)
+    assert (y * -2).probability(-2) == Fraction(1, 2)
+    assert (3 - y).probability(3) == Fraction(2, 6)
+
+    try:
+        ExactPInt([1, -1], 0)
+        raise AssertionError("Negative counts accepted")
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
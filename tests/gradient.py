@@ -0,0 +1,107 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import Precision, Compilation
+from plia.arithmetics import (
+    fft_log_convolution,
+    fft_log_convolution_forward,
+    fft_multi_log_convolution,
+    fft_multi_log_convolution_forward,
+)
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def gradients(f, ps, weights):
+    with tf.GradientTape() as tape:
+        tape.watch(ps)
+        loss = tf.reduce_sum(f(*ps) * weights)
+    return tape.gradient(loss, ps)
+
+
+def assert_same_gradients(f, f_forward, ps, signal_length, atol):
+    weights = tf.random.normal(f_forward(*ps, signal_length).shape)
+    tf.debugging.assert_near(
+        f(*ps, signal_length), f_forward(*ps, signal_length), atol=1e-6
+    )
+    expected = gradients(lambda *ps: f_forward(*ps, signal_length), ps, weights)
+    actual = gradients(lambda *ps: f(*ps, signal_length), ps, weights)
+    for grad, expected_grad in zip(actual, expected):
+        assert grad.shape == expected_grad.shape
+        tf.debugging.assert_near(grad, expected_grad, rtol=1e-4, atol=atol)
+
+
+def main():
+    p1 = tf.random.normal((4, 50))
+    p2 = tf.random.normal((1, 17))
+    tied = tf.concat([tf.ones((4, 3)), tf.zeros((4, 5)), -tf.ones((4, 2))], axis=-1)
+    padded = tf.concat([tf.random.normal((4, 6)), tf.fill((4, 3), -float("inf"))], -1)
+    pairs = [(p1, p2, 66), (p2, p1, 66), (p1, p1, 99), (p1, p2, 60), (p1[0], p2[0], 66)]
+    krats = [(tf.random.normal((1, 12)), 12), (tf.random.normal((6, 20)), 50)]
+
+    # The custom gradients match autodiff through the forward passes, including broadcast operands, logits with
+    # several maxima, -inf logits and a too short (cyclic) signal length
+    ill_conditioned_pairs = [(tied, padded, 18)]
+    ill_conditioned_krats = [
+        (tf.random.normal((3, 5, 20)), 96),
+        (tf.concat([tied[None], tied[None]], axis=0), 37),
+    ]
+    for a, b, signal_length in pairs + ill_conditioned_pairs:
+        assert_same_gradients(
+            fft_log_convolution,
+            fft_log_convolution_forward,
+            [a, b],
+            signal_length,
+            1e-5,
+        )
+    for p, signal_length in krats + ill_conditioned_krats:
+        assert_same_gradients(
+            fft_multi_log_convolution,
+            fft_multi_log_convolution_forward,
+            [p],
+            signal_length,
+            1e-5,
+        )
+
+    # Probabilities of the sum that are zero up to float32 round-off have gradients of round-off noise, so
+    # the float32 policies are only compared on sums without such probabilities
+    for precision in ["float32", "float32-rescaled"]:
+        with Precision(precision):
+            for a, b, signal_length in pairs:
+                assert_same_gradients(
+                    fft_log_convolution,
+                    fft_log_convolution_forward,
+                    [a, b],
+                    signal_length,
+                    1e-3,
+                )
+            for p, signal_length in krats:
+                assert_same_gradients(
+                    fft_multi_log_convolution,
+                    fft_multi_log_convolution_forward,
+                    [p],
+                    signal_length,
+                    1e-3,
+                )
+
+    # Compiled kernels use the custom gradients as well
+    with Compilation():
+        weights = tf.random.normal((4, 66))
+        expected = gradients(
+            lambda *ps: fft_log_convolution_forward(*ps, 66), [p1, p2], weights
+        )
+        actual = gradients(
+            tf.function(lambda *ps: fft_log_convolution(*ps, 66)), [p1, p2], weights
+        )
+        for grad, expected_grad in zip(actual, expected):
+            tf.debugging.assert_near(grad, expected_grad, rtol=1e-4, atol=1e-5)
+
+
+if __name__ == "__main__":
+    main()
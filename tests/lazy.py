@@ -0,0 +1,62 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia
+from plia import PInt, lazy, log_expectation
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def main():
+    xs = [PInt(tf.random.uniform((3, 10)), 0) for _ in range(6)]
+    y = PInt(tf.random.uniform((3, 7)), -2)
+    lxs = [lazy(x) for x in xs]
+    ly = lazy(y)
+
+    # Chains of additions, negations and scalings are fused into a single sum
+    eager = xs[0] + xs[1] - 2 * xs[2] + 3 + xs[3] + xs[3] - y
+    fused = lxs[0] + lxs[1] - 2 * lxs[2] + 3 + lxs[3] + lxs[3] - ly
+    z = fused.evaluate()
+    assert (z.lower, z.upper) == (eager.lower, eager.upper)
+    tf.debugging.assert_near(tf.exp(z.logits), tf.exp(eager.logits), atol=1e-5)
+
+    # Comparisons are pushed down into the sums and only evaluate the support that can satisfy them
+    total = sum(xs[1:], xs[0])
+    lazy_total = sum(lxs[1:], lxs[0])
+    for c in [-1, 0, 3, 20, 27, 54, 60]:
+        for comparison in [
+            lambda a: a < c,
+            lambda a: a <= c,
+            lambda a: a > c,
+            lambda a: a >= c,
+            lambda a: a == c,
+        ]:
+            expected = log_expectation(comparison(total))
+            result = log_expectation(comparison(lazy_total))
+            tf.debugging.assert_near(tf.exp(result), tf.exp(expected), atol=1e-5)
+
+    # Comparisons between expressions and operations that are not fused
+    eager = (xs[0] * xs[1]) // 3 + xs[2] % 4 < y + xs[3]
+    result = (lxs[0] * lxs[1]) // 3 + lxs[2] % 4 < ly + lxs[3]
+    tf.debugging.assert_near(log_expectation(result), log_expectation(eager))
+
+    # Shared intermediates are evaluated once for all outputs
+    shared = (lxs[0] + lxs[1]) * lxs[2]
+    sum_, lt, eq = plia.evaluate(shared + lxs[3], shared < 5, shared == 10)
+    eager = (xs[0] + xs[1]) * xs[2]
+    tf.debugging.assert_near(tf.exp(sum_.logits), tf.exp((eager + xs[3]).logits))
+    tf.debugging.assert_near(log_expectation(lt), log_expectation(eager < 5))
+    tf.debugging.assert_near(log_expectation(eq), log_expectation(eager == 10))
+
+    assert (lxs[0] + 5 < 0).evaluate() is False
+    assert log_expectation(lxs[0] - 100 < 0).numpy().max() > -1e-5
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import PInt, ifthenelse, piecewise
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def reference(x, thresholds, functions):
+    """The PMF of the piecewise function by enumerating the values of an unbatched probabilistic integer."""
+    probs = tf.exp(x.logits).numpy()
+    values = np.arange(x.lower, x.upper + 1)
+    segments = np.searchsorted(thresholds, values, side="right")
+    outputs = [functions[s](v) for s, v in zip(segments, values)]
+    lower = min(outputs)
+    pmf = np.zeros(max(outputs) - lower + 1)
+    np.add.at(pmf, np.array(outputs) - lower, probs)
+    return pmf, lower
+
+
+def assert_pmf(x, pmf, lower):
+    upper = lower + len(pmf) - 1
+    low, high = min(x.lower, lower), max(x.upper, upper)
+    expected = np.pad(pmf, (lower - low, high - upper))
+    actual = np.pad(tf.exp(x.logits).numpy(), (x.lower - low, high - x.upper))
+    tf.debugging.assert_near(actual, expected, atol=1e-6)
+
+
+def main():
+    x = PInt(tf.random.normal((40,)), -10)
+
+    # Affine, constant and general branches agree with the enumerated mixture
+    thresholds = [-3, 5, 12]
+    branches = [(2, 1), 7, lambda y: y // 3 + 50, (-1, 20)]
+    functions = [
+        lambda v: 2 * v + 1,
+        lambda v: 7,
+        lambda v: v // 3 + 50,
+        lambda v: 20 - v,
+    ]
+    assert_pmf(piecewise(x, thresholds, branches), *reference(x, thresholds, functions))
+
+    # Thresholds outside of the support leave empty segments, which are skipped
+    thresholds = [-50, 0, 100]
+    branches = [lambda y: y + 1000, (3, 0), lambda y: y // 2, 5]
+    functions = [None, lambda v: 3 * v, lambda v: v // 2, None]
+    assert_pmf(piecewise(x, thresholds, branches), *reference(x, thresholds, functions))
+
+    # The if-then-else statement is a piecewise function with one threshold
+    digit = PInt(tf.random.uniform((10,)), 0)
+    doubled = ifthenelse(
+        digit, lt=5, tbranch=lambda y: 2 * y, fbranch=lambda y: 2 * y - 9
+    )
+    affine = piecewise(digit, [5], [(2, 0), (2, -9)])
+    functions = [lambda v: 2 * v, lambda v: 2 * v - 9]
+    assert_pmf(doubled, *reference(digit, [5], functions))
+    assert_pmf(affine, *reference(digit, [5], functions))
+
+    # A support within a single branch only evaluates that branch
+    assert ifthenelse(digit, lt=0, tbranch=None, fbranch=lambda y: y) is digit
+    assert ifthenelse(digit, lt=10, tbranch=lambda y: y, fbranch=None) is digit
+
+    # Batched variables match the unbatched ones
+    batch = PInt(tf.random.normal((3, 25)), 0)
+    thresholds = [8, 16]
+    branches = [lambda y: y + 3, (-2, 40), lambda y: y]
+    result = piecewise(batch, thresholds, branches)
+    for i in range(3):
+        single = piecewise(PInt(batch.logits[i], 0), thresholds, branches)
+        assert single.lower == result.lower and single.upper == result.upper
+        tf.debugging.assert_near(tf.exp(result.logits[i]), tf.exp(single.logits))
+
+    # Gradients of empty output values remain finite
+    logits = tf.Variable(tf.random.normal((2, 20)))
+    with tf.GradientTape() as tape:
+        y = piecewise(PInt(logits, 0), [10], [(4, 0), lambda y: -y])
+        loss = tf.reduce_sum(
+            tf.exp(y.logits) * tf.cast(tf.range(y.cardinality), tf.float32)
+        )
+    tf.debugging.assert_all_finite(tape.gradient(loss, logits), "gradient")
+
+    try:
+        piecewise(x, [0, 1], [(1, 0), (1, 0)])
+        raise AssertionError("Mismatched branches accepted")
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
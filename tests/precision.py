@@ -0,0 +1,141 @@
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia
+from plia import Krat, PInt, PIntMod, Precision
+from plia.arithmetics import PRECISIONS, log_convolution
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+# Measured error bounds of every precision policy and operation: the maximal absolute error on the probabilities
+# and the maximal absolute error on the log-probabilities of the outcomes more likely than the given
+# log-probability. Only log_convolution rescales blocks, the other operations transform whole PMFs at once and
+# fall back to the EPSILON floor under the rescaled policy
+TRANSFORM_BOUNDS = (1e-6, (-10, 5e-3))
+ERROR_BOUNDS = {
+    "log_convolution": {
+        "float64": (1e-6, (-10, 5e-3)),
+        "float32": (1e-6, (-10, 5e-3)),
+        "float32-rescaled": (1e-6, (-80, 1e-3)),
+    },
+    **{
+        operation: {precision: TRANSFORM_BOUNDS for precision in PRECISIONS}
+        for operation in ["sum", "sum_reduce", "modular", "spectral"]
+    },
+}
+
+
+def reference(l1, l2):
+    a1, a2 = l1.max(), l2.max()
+    p = np.convolve(np.exp(l1 - a1), np.exp(l2 - a2))
+    return np.log(p) + a1 + a2
+
+
+def log_normalize(logits):
+    return logits - np.logaddexp.reduce(logits, axis=-1, keepdims=True)
+
+
+def multi_reference(ls, modulus=None):
+    p = np.ones(1)
+    for l in ls:
+        p = np.convolve(p, np.exp(l - l.max()))
+    if modulus is not None:
+        p = np.pad(p, (0, -len(p) % modulus)).reshape(-1, modulus).sum(axis=0)
+    return np.log(p) + sum(l.max() for l in ls)
+
+
+def long_tailed(rng, cardinality):
+    return log_normalize(
+        -np.linspace(0, 80, cardinality) + rng.normal(0, 0.5, cardinality)
+    )
+
+
+def assert_errors(operation, precision, logp, expected):
+    p_bound, (threshold, log_bound) = ERROR_BOUNDS[operation][precision]
+    p_error = np.abs(np.exp(logp) - np.exp(expected)).max()
+    log_error = np.abs(logp - expected)[expected > threshold].max()
+    print(operation, precision, p_error, log_error)
+    assert p_error < p_bound
+    assert log_error < log_bound
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    # Long tailed PMFs spanning most of the float32 range
+    for card1, card2 in [(100, 10), (5000, 30), (40000, 300), (2**17, 1000)]:
+        l1 = long_tailed(rng, card1)
+        l2 = log_normalize(rng.normal(0, 1, card2))
+        expected = reference(l1, l2)
+
+        p1 = tf.constant(l1[None], dtype=tf.float32)
+        p2 = tf.constant(l2[None], dtype=tf.float32)
+        for precision in PRECISIONS:
+            logp = log_convolution(p1, p2, card1 + card2 - 1, precision=precision)
+            assert_errors("log_convolution", precision, logp.numpy()[0], expected)
+
+    # Sums of many PMFs, Krats, integers modulo n and spectral sums under every policy
+    ls = [long_tailed(rng, card).astype(np.float32) for card in [3000, 500, 40]]
+    krat = np.stack([long_tailed(rng, 2000) for _ in range(8)]).astype(np.float32)
+    ms = [long_tailed(rng, 5000), log_normalize(rng.normal(0, 1, 5000))]
+    ms = [m.astype(np.float32) for m in ms]
+    operations = {
+        "sum": (
+            lambda: plia.sum([PInt(l[None], 0) for l in ls], method="fft"),
+            multi_reference(ls),
+        ),
+        "sum_reduce": (
+            lambda: Krat(krat[None], 0).sum_reduce(),
+            multi_reference(list(krat)),
+        ),
+        "modular": (
+            lambda: PIntMod(ms[0][None]) + PIntMod(ms[1][None]),
+            multi_reference(ms, modulus=5000),
+        ),
+        "spectral": (
+            lambda: (
+                PInt(ls[0][None], 0).to_spectral(4000) + PInt(ls[1][None], 0)
+            ).to_pint(),
+            multi_reference(ls[:2]),
+        ),
+    }
+    for operation, (compute, expected) in operations.items():
+        logps = {}
+        for precision in PRECISIONS:
+            with Precision(precision):
+                logps[precision] = compute().logits.numpy()[0]
+            assert_errors(operation, precision, logps[precision], expected)
+        np.testing.assert_allclose(logps["float32-rescaled"], logps["float32"])
+
+    # The policy of a context applies to all operations inside of it and matches the per call policy
+    x = PInt(tf.random.normal((2, 300)), 0)
+    y = PInt(tf.random.normal((2, 20)), 5)
+    for precision in PRECISIONS:
+        with Precision(precision):
+            z = x + y
+        logp = log_convolution(x.logits, y.logits, z.cardinality, precision=precision)
+        tf.debugging.assert_near(z.logits, logp)
+
+    # Gradients of rescaled blocks remain finite
+    p1 = tf.Variable(tf.constant(l1[None, :5000], dtype=tf.float32))
+    with tf.GradientTape() as tape:
+        logp = log_convolution(p1, p2, 5000 + 999, precision="float32-rescaled")
+        loss = tf.reduce_sum(tf.exp(logp))
+    tf.debugging.assert_all_finite(tape.gradient(loss, p1), "gradient")
+
+    try:
+        Precision("float16")
+        raise AssertionError("Unknown precision policy accepted")
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
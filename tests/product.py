@@ -0,0 +1,80 @@
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia.arithmetics
+from plia import PInt, log_expectation
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def reference(x1, x2):
+    """The PMF of the product by enumerating all pairs of values of two batched probabilistic integers."""
+    probs1, probs2 = tf.exp(x1.logits).numpy(), tf.exp(x2.logits).numpy()
+    values1 = np.arange(x1.lower, x1.upper + 1)
+    values2 = np.arange(x2.lower, x2.upper + 1)
+    products = np.multiply.outer(values1, values2).reshape(-1)
+    pairs = (probs1[..., :, None] * probs2[..., None, :]).reshape(len(probs1), -1)
+    lower = int(products.min())
+    pmf = np.zeros((len(probs1), int(products.max()) - lower + 1))
+    for pmf_i, pairs_i in zip(pmf, pairs):
+        np.add.at(pmf_i, products - lower, pairs_i)
+    return pmf, lower
+
+
+def assert_pmf(x, pmf, lower):
+    upper = lower + pmf.shape[-1] - 1
+    low, high = min(x.lower, lower), max(x.upper, upper)
+    expected = np.pad(pmf, [(0, 0), (lower - low, high - upper)])
+    actual = np.pad(tf.exp(x.logits).numpy(), [(0, 0), (x.lower - low, high - x.upper)])
+    tf.debugging.assert_near(actual, expected, atol=1e-5 * expected.max())
+    assert np.all(actual[expected == 0.0] == 0.0)
+
+
+def main():
+    # Products of negative and strided operands agree with the enumerated pairs
+    width = PInt(tf.random.uniform((4, 10)), 1)
+    height = PInt(tf.random.uniform((4, 6)), -2) * 3
+    area = width * height
+    assert area.stride == 3
+    assert_pmf(area, *reference(width, height))
+
+    x1 = PInt(tf.random.normal((3, 9)), -4)
+    x2 = PInt(tf.random.normal((3, 7)), -3) * -2 + 1
+    assert_pmf(x1 * x2, *reference(x1, x2))
+    assert_pmf(x2 * x2, *reference(x2, x2))
+
+    # Values that are not a product of two values of the operands are impossible
+    x = PInt(tf.zeros((1, 2)), 2)
+    square = x * x
+    assert square.lower == 4 and square.upper == 9
+    assert np.all(np.isneginf(square.logits.numpy()[:, [1, 3, 4]]))
+    assert_pmf(square, *reference(x, x))
+
+    expected = reference(width, height)[0][:, (12 - area.lower)]
+    np.testing.assert_allclose(
+        tf.exp(log_expectation(area == 12)), expected, rtol=1e-5, atol=1e-7
+    )
+
+    # The outer product is summed in blocks of rows above PAIR_BLOCK_LENGTH pairs
+    block_length = plia.arithmetics.PAIR_BLOCK_LENGTH
+    plia.arithmetics.PAIR_BLOCK_LENGTH = 16
+    try:
+        assert_pmf(x1 * x2, *reference(x1, x2))
+        assert_pmf(width * height, *reference(width, height))
+    finally:
+        plia.arithmetics.PAIR_BLOCK_LENGTH = block_length
+
+    price = PInt(tf.random.uniform((2, 2000)), 0)
+    quantity = PInt(tf.random.uniform((2, 1000)), -3)
+    assert_pmf(price * quantity, *reference(price, quantity))
+
+
+if __name__ == "__main__":
+    main()
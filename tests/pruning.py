@@ -0,0 +1,59 @@
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import PInt, Pruning, log_expectation
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def main():
+    TERMS = 20
+
+    probs = np.full([4, 10], 1e-3)
+    probs[:, 3] = 1.0
+    probs = tf.constant(probs, dtype=tf.float32)
+
+    total = PInt(probs, 0, log_input=False)
+    for _ in range(TERMS - 1):
+        total = total + PInt(probs, 0, log_input=False)
+
+    with Pruning(threshold=1e-6) as pruning:
+        pruned = PInt(probs, 0, log_input=False)
+        for _ in range(TERMS - 1):
+            pruned = pruned + PInt(probs, 0, log_input=False)
+
+    log_threshold = np.log(1e-6)
+    assert pruned.cardinality < total.cardinality
+    assert np.all(pruned.logits.numpy() >= log_threshold)
+
+    # The expectations agree up to the discarded mass, weighted by the largest value
+    mass = np.exp(pruning.discarded)
+    assert 0.0 < mass < 1e-3
+    difference = tf.exp(log_expectation(total)) - tf.exp(log_expectation(pruned))
+    assert np.all(np.abs(difference.numpy()) <= 2 * mass * total.upper)
+
+    # A single pruned construction discards exactly the log-mass outside of the kept support
+    with Pruning(threshold=1e-6) as pruning:
+        single = PInt(total.logits, total.lower)
+    start = single.lower - total.lower
+    dropped = tf.concat(
+        [total.logits[..., :start], total.logits[..., start + single.cardinality :]],
+        axis=-1,
+    )
+    discarded = tf.reduce_max(tf.reduce_logsumexp(dropped, axis=-1))
+    np.testing.assert_allclose(pruning.discarded, discarded.numpy(), rtol=1e-5)
+
+    top = total.prune(threshold=None, top_k=32)
+    assert top.cardinality == 32
+    assert np.all(tf.exp(top.pruned).numpy() < 1e-3)
+
+
+if __name__ == "__main__":
+    main()
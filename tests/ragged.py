@@ -0,0 +1,50 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia
+from plia import PInt, RaggedKrat
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def main():
+    pints = [
+        PInt(tf.random.uniform((5, 10)), 0),
+        PInt(tf.random.uniform((5, 3)), -4),
+        PInt(tf.random.uniform((1, 100)), 20),
+        PInt(tf.random.uniform((5, 1)), 7),
+        PInt(tf.random.uniform((5, 17)), -50),
+    ]
+
+    krat = RaggedKrat.from_pints(pints)
+    total = krat.sum_reduce()
+    reference = plia.sum(pints)
+
+    print(krat)
+    print(total, reference)
+    tf.debugging.assert_near(tf.exp(total.logits), tf.exp(reference.logits), atol=1e-6)
+
+    pints = [PInt(tf.random.uniform((5, 2)), i) for i in range(4)]
+    small = RaggedKrat.from_pints(pints).sum_reduce()
+    reference = plia.sum(pints)
+    assert (small.lower, small.upper) == (reference.lower, reference.upper) == (6, 10)
+    tf.debugging.assert_near(tf.exp(small.logits), tf.exp(reference.logits), atol=1e-6)
+
+    # a single large row next to many small ones
+    pints = [PInt(tf.random.uniform((3, 4000)), -10)] + [
+        PInt(tf.random.uniform((3, 2)), 0) for _ in range(50)
+    ]
+    total = RaggedKrat.from_pints(pints).sum_reduce()
+    reference = plia.sum(pints)
+    assert (total.lower, total.upper) == (reference.lower, reference.upper)
+    tf.debugging.assert_near(tf.exp(total.logits), tf.exp(reference.logits), atol=1e-6)
+
+
+if __name__ == "__main__":
+    main()
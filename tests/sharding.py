@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import PInt, Krat, Sharding, Compilation, sum as psum
+from plia.arithmetics import log_convolution
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def queries(x, y, k):
+    return [
+        (x + y).logits,
+        (x + 3).logits,
+        (x % 4).logits,
+        (x // 3).logits,
+        psum([x, y, x]).logits,
+        k.sum_reduce().logits,
+        *[z.logits for z in divmod(x, 3)],
+    ]
+
+
+def main():
+    x = PInt(tf.random.uniform((10, 37)), -5)
+    y = PInt(tf.random.uniform((1, 20)), 3)
+    k = Krat(tf.random.uniform((10, 4, 16)), 0)
+
+    # Sharded kernels, with shards of unequal sizes and broadcast operands, match the unsharded ones
+    expected = queries(x, y, k)
+    for n_workers, min_shard in [(3, 1), (4, 2), (16, 1)]:
+        with Sharding(n_workers, min_shard):
+            for actual, logits in zip(queries(x, y, k), expected):
+                assert actual.shape == logits.shape
+                tf.debugging.assert_near(actual, logits, atol=1e-5)
+
+    # Operands of lower rank are aligned from the right and broadcast rather than split along their first axis
+    a, b = PInt(tf.random.normal((3, 3, 10)), 0), PInt(tf.random.normal((3, 10)), 0)
+    for n_workers in [2, 3]:
+        with Sharding(n_workers):
+            actual = (a + b).logits
+        tf.debugging.assert_near(actual, (a + b).logits, atol=1e-5)
+
+    # Shardings with the same workers share their pool, so entering them again starts no new threads
+    threads = threading.active_count()
+    for _ in range(3):
+        with Sharding(3):
+            (x + y).logits
+    assert threading.active_count() == threads
+
+    # Unbatched operands and a Krat without a batch dimension are not sharded
+    x1, k1 = PInt(tf.random.uniform((37,)), 0), Krat(tf.random.uniform((4, 16)), 0)
+    expected_sum = (x1 + x1).logits
+    with Sharding(4) as sharding:
+        assert sharding.n_shards([x1.logits], 1) == 1
+        assert sharding.n_shards([k1.logits], 2) == 1
+        assert sharding.n_shards([k.logits], 2) == 4
+        tf.debugging.assert_near((x1 + x1).logits, expected_sum, atol=1e-5)
+
+    # The fused divmod is sharded like floor division and modulo
+    shards = []
+    run = Sharding.run
+    Sharding.run = lambda self, *args: shards.append(args) or run(self, *args)
+    try:
+        with Sharding(3):
+            divmod(x, 3)
+            x // 3
+    finally:
+        Sharding.run = run
+    assert len(shards) == 2
+
+    # Sharding composes with compilation
+    with Compilation(), Sharding(3):
+        tf.debugging.assert_near((x + y).logits, expected[0], atol=1e-5)
+
+    # Gradients flow through the shards into sharded and broadcast operands
+    p1 = tf.Variable(tf.random.uniform((6, 30)))
+    p2 = tf.Variable(tf.random.uniform((1, 12)))
+    grads = []
+    for n_workers in [None, 4]:
+        with tf.GradientTape() as tape:
+            if n_workers is None:
+                loss = tf.reduce_sum(tf.exp(log_convolution(p1, p2, 41)) ** 2)
+            else:
+                with Sharding(n_workers, affinity=sorted(os.sched_getaffinity(0))):
+                    loss = tf.reduce_sum(tf.exp(log_convolution(p1, p2, 41)) ** 2)
+        grads.append(tape.gradient(loss, [p1, p2]))
+    for expected_grad, grad in zip(*grads):
+        assert grad.shape == expected_grad.shape
+        tf.debugging.assert_near(grad, expected_grad, atol=1e-5)
+
+
+if __name__ == "__main__":
+    main()
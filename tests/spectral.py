@@ -0,0 +1,75 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import PInt, log_expectation
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def main():
+    xs = [PInt(tf.random.uniform((3, 10)), i - 2) for i in range(8)]
+    xs.append(3 * PInt(tf.random.uniform((3, 4)), 1))
+
+    # A chain of additions stays in the Fourier domain, growing the FFT length once it is outgrown
+    eager = xs[0]
+    spectral = xs[0].to_spectral(32)
+    for x in xs[1:]:
+        eager = eager + x
+        spectral = spectral + x
+    spectral = spectral - 4
+    eager = eager - 4
+
+    assert (spectral.lower, spectral.upper) == (eager.lower, eager.upper)
+    tf.debugging.assert_near(tf.exp(spectral.logits), tf.exp(eager.logits), atol=1e-6)
+
+    # Non-additive operations recover the logits first
+    tf.debugging.assert_near(
+        tf.exp(log_expectation(spectral < 20)),
+        tf.exp(log_expectation(eager < 20)),
+        atol=1e-6,
+    )
+    tf.debugging.assert_near(
+        tf.exp((spectral % 7).logits), tf.exp((eager % 7).logits), atol=1e-6
+    )
+
+    # Operators of a PInt with a spectral operand recover its logits
+    x = xs[1]
+    for actual, expected in [
+        (x + spectral, x + eager),
+        (x - spectral, x - eager),
+        (5 - spectral, 5 - eager),
+        (x * xs[0].to_spectral(32), x * xs[0]),
+    ]:
+        assert (actual.lower, actual.upper) == (expected.lower, expected.upper)
+        tf.debugging.assert_near(
+            tf.exp(actual.logits), tf.exp(expected.logits), atol=1e-6
+        )
+    for actual, expected in [
+        (x < spectral, x < eager),
+        (x <= spectral, x <= eager),
+        (x > spectral - 20, x > eager - 20),
+        (x >= spectral - 20, x >= eager - 20),
+        (x == spectral - 20, x == eager - 20),
+        (x != spectral - 20, x != eager - 20),
+    ]:
+        tf.debugging.assert_near(
+            tf.exp(log_expectation(actual)),
+            tf.exp(log_expectation(expected)),
+            atol=1e-6,
+        )
+
+    # Two spectral operands of different FFT lengths
+    total = xs[0].to_spectral(16) + (xs[1] + xs[2]).to_spectral(64)
+    tf.debugging.assert_near(
+        tf.exp(total.logits), tf.exp((xs[0] + xs[1] + xs[2]).logits), atol=1e-6
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+from plia import PInt, log_expectation
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def main():
+    for x in [
+        PInt(tf.random.uniform((3, 40)), 1000),
+        -3 * PInt(tf.random.uniform((3, 12)), -5),
+    ]:
+        p = tf.exp(tf.cast(x.logits, tf.float64)).numpy()
+        values = np.arange(x.lower, x.upper + 1, dtype=np.float64)
+        mean = (p * values).sum(-1)
+
+        moments = x.moments(3).numpy()
+        for k in range(3):
+            np.testing.assert_allclose(
+                moments[..., k], (p * values ** (k + 1)).sum(-1), rtol=1e-6, atol=1e-4
+            )
+        np.testing.assert_allclose(x.mean(), mean, rtol=1e-6, atol=1e-4)
+        np.testing.assert_allclose(
+            x.variance(), (p * (values - mean[:, None]) ** 2).sum(-1), rtol=1e-4
+        )
+
+        cdf = np.cumsum(p, axis=-1)
+        np.testing.assert_allclose(x.cdf(), cdf, atol=1e-5)
+        np.testing.assert_allclose(x.cdf(x.lower + 5), cdf[..., 5], atol=1e-5)
+        assert np.all(x.cdf(x.lower - 1).numpy() == 0.0)
+
+        for q in [0.1, 0.5, 0.9]:
+            expected = values[np.argmax(cdf >= q, axis=-1)]
+            np.testing.assert_array_equal(x.quantile(q), expected)
+        assert x.quantile([0.1, 0.9]).shape == (3, 2)
+
+        np.testing.assert_array_equal(x.mode(), values[np.argmax(p, axis=-1)])
+
+        statistics = x.describe()
+        np.testing.assert_allclose(statistics["mean"], mean, rtol=1e-6, atol=1e-4)
+        np.testing.assert_allclose(statistics["variance"], x.variance(), rtol=1e-6)
+
+    x = PInt(tf.random.uniform((3, 40)), 1)
+    tf.debugging.assert_near(
+        log_expectation(x), tf.math.log(tf.cast(x.mean(), tf.float32))
+    )
+
+
+if __name__ == "__main__":
+    main()
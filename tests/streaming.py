@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import tracemalloc
+import numpy as np
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia.numpy as pn
+from plia.numpy.streaming import StreamingPInt, streaming_log_convolution
+
+
+def peak_memory(f):
+    """The peak memory in bytes of the NumPy arrays allocated by f."""
+    tracemalloc.start()
+    f()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    # Streaming sums match the in-memory sums, with budgets from a single chunk down to single rows
+    for card1, card2, memory_budget in [
+        (1, 1, 2**20),
+        (10, 7, 2**20),
+        (1000, 3000, 2**20),
+        (1000, 3000, 2**13),
+        (2**12, 2**12 + 1, 2**14),
+    ]:
+        x = pn.PInt(rng.normal(size=card1), rng.integers(-10, 10))
+        y = pn.PInt(rng.normal(size=card2), rng.integers(-10, 10))
+        z = StreamingPInt.from_pint(x, memory_budget) + StreamingPInt.from_pint(
+            y, memory_budget
+        )
+        expected = x + y
+        assert z.lower == expected.lower and z.upper == expected.upper
+        np.testing.assert_allclose(np.exp(z.logits), np.exp(expected.logits), atol=1e-6)
+
+    # The buffers of a streaming sum stay within the memory budget, unlike those of the in-memory sum
+    memory_budget = 2**20
+    x = pn.PInt(rng.normal(size=2**18), 0)
+    y = pn.PInt(rng.normal(size=2**18), 0)
+    streaming_x = StreamingPInt.from_pint(x, memory_budget)
+    streaming_y = StreamingPInt.from_pint(y, memory_budget)
+    streaming_peak = peak_memory(lambda: streaming_x + streaming_y)
+    in_memory_peak = peak_memory(lambda: x + y)
+    assert streaming_peak <= 2 * memory_budget, streaming_peak
+    assert in_memory_peak > 8 * streaming_peak, (in_memory_peak, streaming_peak)
+
+    # Probabilities far below the floor of the in-memory convolutions are kept
+    x = StreamingPInt.from_pint(pn.PInt(np.zeros(10), 0), 2**12)
+    total = x
+    for _ in range(9):
+        total = total + x
+    assert np.isclose(total.logits[0], -10 * np.log(10))
+    assert np.isclose(total.to_pint().logits[-1], -10 * np.log(10))
+
+    # Sums of logits saved to files, with temporary files in a given directory that are removed afterwards
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "logits.npy")
+        np.save(path, pn.PInt(rng.normal(size=500), 0).logits)
+        x = StreamingPInt.from_file(path, 3, 2**14, directory)
+        y = (x + x) + 1
+        assert y.lower == 7 and y.cardinality == 999
+        assert sorted(os.listdir(directory)) != ["logits.npy"]
+        del y
+        assert os.listdir(directory) == ["logits.npy"]
+
+    try:
+        streaming_log_convolution(np.zeros(2**10), np.zeros(2**10), 2**11 - 1, 2**10)
+        raise AssertionError("Too small memory budget accepted")
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
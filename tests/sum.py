@@ -0,0 +1,36 @@
+import os
+import sys
+import tensorflow as tf
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_PATH))
+
+
+import plia
+from plia import PInt
+
+os.environ["TF_FORCE_GPU_ALLOW_GROWTH"] = "true"
+
+
+def main():
+    pints = [
+        PInt(tf.random.uniform((5, 10)), 0),
+        PInt(tf.random.uniform((5, 3)), -4),
+        PInt(tf.random.uniform((1, 100)), 20) * 3,
+        PInt(tf.random.uniform((5, 2)), 1),
+        PInt(tf.random.uniform((5, 17)), -50),
+    ]
+
+    fold = 7
+    for x in pints:
+        fold = fold + x
+
+    for method in [None, "fft", "tree"]:
+        total = plia.sum(pints + [7], method=method)
+        print(method, total, fold)
+        tf.debugging.assert_near(tf.exp(total.logits), tf.exp(fold.logits), atol=1e-6)
+
+
+if __name__ == "__main__":
+    main()